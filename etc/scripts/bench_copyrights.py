@@ -0,0 +1,273 @@
+#!/usr/bin/python2
+#
+# Copyright (c) 2017 nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/nexB/scancode-toolkit/
+# The ScanCode software is licensed under the Apache License version 2.0.
+# Data generated with ScanCode require an acknowledgment.
+# ScanCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with ScanCode or any ScanCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with ScanCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  ScanCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  ScanCode is a free software code scanning tool from nexB Inc. and others.
+#  Visit https://github.com/nexB/scancode-toolkit/ for support and download.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from collections import OrderedDict
+import json
+import os
+from time import time
+
+import click
+click.disable_unicode_literals_warning = True
+
+from commoncode import fileutils
+from cluecode import copyrights
+from textcode import analysis
+
+"""
+Benchmark the copyright detection of cluecode.copyrights.detect_copyrights() on
+a set of files and on synthetic large files and report the time spent in each
+phase of the detection and the throughput.
+Ensure you are in the scancode virtualenv and call: etc/scripts/bench_copyrights.py -h
+"""
+
+# the phases of a copyright detection in sequence
+PHASES = (
+    # extract the text lines of a file
+    'extraction',
+    # select the groups of candidate lines, excluding line preparation
+    'candidates',
+    # prepare the lines for candidates selection and for tokenization
+    'preparation',
+    # tag the tokens
+    'tagging',
+    # chunk the tagged tokens in a parse tree
+    'chunking',
+    # collect and refine the detected copyrights, holders, years and authors
+    'refinement',
+)
+
+
+SYNTHETIC_CODE = '''\
+def compute(value, other):
+    """
+    Return the sum of some values and written by the way.
+    """
+    result = value + other
+    return result
+
+'''
+
+SYNTHETIC_NOTICE = '''\
+# Copyright (c) 2001-2017 nexB Inc. and others. All rights reserved.
+# Copyright (C) 1999 John Doe <john@example.com>
+# Written by Jane Doe and the Example contributors.
+
+'''
+
+
+def create_synthetic_files(target_dir, lines=100000):
+    """
+    Create synthetic large files in `target_dir` with about `lines` lines each
+    and return a list of their locations:
+     - a source code file with a few copyright notices.
+     - a license-heavy file with many copyright notices.
+    """
+    code_lines = SYNTHETIC_CODE.count('\n')
+    notice_lines = SYNTHETIC_NOTICE.count('\n')
+
+    source = os.path.join(target_dir, 'synthetic-source.py')
+    with open(source, 'wb') as out:
+        out.write(SYNTHETIC_NOTICE)
+        blocks = lines // code_lines
+        for i in range(blocks):
+            out.write(SYNTHETIC_CODE)
+            if i and not i % (blocks // 4 or 1):
+                out.write(SYNTHETIC_NOTICE)
+
+    notices = os.path.join(target_dir, 'synthetic-notices.txt')
+    with open(notices, 'wb') as out:
+        for _ in range(lines // (notice_lines + code_lines)):
+            out.write(SYNTHETIC_NOTICE)
+            out.write(SYNTHETIC_CODE)
+
+    return [source, notices]
+
+
+class PhaseTimer(object):
+    """
+    Accumulate the time spent in wrapped functions by phase.
+    """
+
+    def __init__(self):
+        self.timings = OrderedDict((phase, 0.0) for phase in PHASES)
+
+    def wrap(self, phase, func):
+        """
+        Return a wrapper of `func` callable that adds the time spent in `func`
+        to the `phase` timing.
+        """
+        timings = self.timings
+
+        def timed(*args, **kwargs):
+            start = time()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                timings[phase] += time() - start
+        return timed
+
+
+def benchmark(locations):
+    """
+    Run copyright detection on each file of a `locations` list of files and
+    directories and return a mapping of benchmark results.
+    """
+    timer = PhaseTimer()
+    timings = timer.timings
+
+    detector = copyrights.get_detector()
+    # time the sub-steps of candidate_lines and CopyrightDetector.detect by
+    # wrapping their building blocks. These are restored when done.
+    prep_line = copyrights.prep_line
+    copyrights.prep_line = timer.wrap('preparation', prep_line)
+    detector.get_tokens = timer.wrap('preparation', detector.get_tokens)
+    detector.tagger.tag = timer.wrap('tagging', detector.tagger.tag)
+    detector.chunker.parse = timer.wrap('chunking', detector.chunker.parse)
+
+    files = bytes_count = lines_count = detections = 0
+    start = time()
+    try:
+        for location in iter_files(locations):
+            files += 1
+            bytes_count += os.path.getsize(location)
+
+            phase_start = time()
+            lines = list(analysis.text_lines(location, demarkup=True))
+            timings['extraction'] += time() - phase_start
+            lines_count += len(lines)
+
+            # the time spent in preparation is substracted from the time spent
+            # in candidates selection and the time spent in preparation,
+            # tagging and chunking from the time spent in detection
+            prepared = timings['preparation']
+            phase_start = time()
+            groups = list(copyrights.candidate_lines(lines))
+            elapsed = time() - phase_start
+            timings['candidates'] += elapsed - (timings['preparation'] - prepared)
+
+            for numbered_lines in groups:
+                before = timings['preparation'] + timings['tagging'] + timings['chunking']
+                phase_start = time()
+                cp, auth, yr, hold, _start, _end = detector.detect(numbered_lines)
+                elapsed = time() - phase_start
+                after = timings['preparation'] + timings['tagging'] + timings['chunking']
+                timings['refinement'] += elapsed - (after - before)
+                if any([cp, auth, yr, hold]):
+                    detections += 1
+    finally:
+        copyrights.prep_line = prep_line
+        del detector.get_tokens
+        del detector.tagger.tag
+        del detector.chunker.parse
+
+    total = time() - start
+    results = OrderedDict()
+    results['files'] = files
+    results['bytes'] = bytes_count
+    results['lines'] = lines_count
+    results['detections'] = detections
+    results['time'] = total
+    results['timings'] = timings
+    results['lines_per_second'] = total and lines_count / total or 0
+    results['bytes_per_second'] = total and bytes_count / total or 0
+    return results
+
+
+def iter_files(locations):
+    """
+    Yield the locations of the files of a `locations` list of files and
+    directories, sorted for a stable order.
+    """
+    for location in locations:
+        if os.path.isfile(location):
+            yield location
+            continue
+        for top, dirs, files in os.walk(location):
+            dirs.sort()
+            for name in sorted(files):
+                yield os.path.join(top, name)
+
+
+def format_results(results):
+    """
+    Return a human-readable string of the `results` mapping of a benchmark.
+    """
+    total = results['time']
+    out = [
+        'Files: %(files)d, lines: %(lines)d, bytes: %(bytes)d, '
+        'detections: %(detections)d' % results,
+        'Time: %.2fs, %d lines/sec, %d bytes/sec' % (
+            total, results['lines_per_second'], results['bytes_per_second']),
+    ]
+    for phase, timing in results['timings'].items():
+        share = total and timing * 100 / total or 0
+        out.append('  %-12s %8.2fs %5.1f%%' % (phase + ':', timing, share))
+    return '\n'.join(out)
+
+
+@click.command()
+@click.argument('locations', nargs=-1, type=click.Path(exists=True, readable=True))
+@click.option('--synthetic-lines', type=int, default=100000, show_default=True,
+    help='Number of lines of each synthetic large file. Use 0 to skip synthetic files.')
+@click.option('--json', 'json_output', type=click.File('wb', lazy=False),
+    help='Write the benchmark results as JSON to FILE. Use - for stdout.')
+@click.help_option('-h', '--help')
+def cli(locations, synthetic_lines=100000, json_output=None):
+    """
+    Benchmark copyright detection on the files of LOCATIONS files and
+    directories (default to the tests/cluecode/data corpus) and on synthetic
+    large files.
+
+    Report the time spent in each phase of the detection and the throughput.
+    """
+    if not locations:
+        root_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        locations = [os.path.join(root_dir, 'tests', 'cluecode', 'data')]
+
+    all_results = OrderedDict()
+    all_results['corpus'] = benchmark(locations)
+    click.echo('Corpus: ' + ', '.join(locations), err=True)
+    click.echo(format_results(all_results['corpus']), err=True)
+
+    if synthetic_lines:
+        synthetic_dir = fileutils.get_temp_dir(prefix='bench_copyrights')
+        synthetic_files = create_synthetic_files(synthetic_dir, synthetic_lines)
+        for location in synthetic_files:
+            name = os.path.basename(location)
+            all_results[name] = benchmark([location])
+            click.echo('Synthetic: ' + name, err=True)
+            click.echo(format_results(all_results[name]), err=True)
+        fileutils.delete(synthetic_dir)
+
+    if json_output:
+        json.dump(all_results, json_output, indent=2)
+
+
+if __name__ == '__main__':
+    cli()
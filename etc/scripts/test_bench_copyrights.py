@@ -0,0 +1,52 @@
+# Copyright (c) 2017 nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/nexB/scancode-toolkit/
+# The ScanCode software is licensed under the Apache License version 2.0.
+# Data generated with ScanCode require an acknowledgment.
+# ScanCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with ScanCode or any ScanCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with ScanCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  ScanCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  ScanCode is a free software code scanning tool from nexB Inc. and others.
+#  Visit https://github.com/nexB/scancode-toolkit/ for support and download.
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import os
+
+from commoncode.testcase import FileBasedTesting
+
+import bench_copyrights
+
+
+class TestBenchCopyrights(FileBasedTesting):
+    test_data_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), 'tests', 'cluecode', 'data')
+
+    def test_benchmark_reports_phases_timings_and_throughput(self):
+        test_dir = self.get_test_loc('copyrights_basic')
+        results = bench_copyrights.benchmark([test_dir])
+        assert 27 == results['files']
+        assert 39 == results['detections']
+        assert list(bench_copyrights.PHASES) == list(results['timings'])
+        assert results['lines_per_second'] > 0
+        assert results['bytes_per_second'] > 0
+
+    def test_benchmark_on_synthetic_files(self):
+        test_dir = self.get_temp_dir()
+        synthetic_files = bench_copyrights.create_synthetic_files(test_dir, lines=1000)
+        results = bench_copyrights.benchmark(synthetic_files)
+        assert 2 == results['files']
+        assert results['lines'] >= 1900
+        assert results['detections'] > 0
@@ -124,6 +124,7 @@ setup(
     ],
     install_requires=[
         # cluecode
+        'backports.functools_lru_cache >= 1.4',
         # Some nltk version ranges are buggy
         'nltk >= 3.2, < 4.0',
         'publicsuffix2',
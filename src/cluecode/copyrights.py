@@ -25,6 +25,7 @@
 from __future__ import absolute_import
 from __future__ import print_function
 
+from bisect import bisect_right
 from collections import deque
 import logging
 import os
@@ -65,7 +66,7 @@ def detect_copyrights(location):
     (copyrights list, authors list, years list, holders list, start line, end line)
     detected in file at location.
     """
-    detector = CopyrightDetector()
+    detector = get_detector()
     for numbered_lines in candidate_lines(analysis.text_lines(location, demarkup=True)):
         detected = detector.detect(numbered_lines)
         cp, auth, yr, hold, _start, _end = detected
@@ -73,6 +74,20 @@ def detect_copyrights(location):
             yield detected
 
 
+# a CopyrightDetector is costly to create and reused for every detection
+_DETECTOR = None
+
+
+def get_detector():
+    """
+    Return a CopyrightDetector created once per process.
+    """
+    global _DETECTOR
+    if _DETECTOR is None:
+        _DETECTOR = CopyrightDetector()
+    return _DETECTOR
+
+
 def detect(location):
     """
     Return lists of detected copyrights, authors, years and holders
@@ -1263,16 +1278,239 @@ def is_junk(c):
     return c.lower() in junk
 
 
+class RegexpTagger(object):
+    """
+    Tag tokens with the tag of the first of a list of (regex, tag) `patterns`
+    that matches at the start of a token, the same way as NLTK's RegexpTagger.
+
+    Rather than trying each regex in turn for every token, the patterns are
+    combined as alternations in a few regexes such that a token is tagged with
+    one regex match per combined regex. The alternations of a combined regex are
+    tried in sequence, hence the first matching pattern still wins. The tag of
+    each token is also memoized as the same tokens are found over and over.
+    """
+
+    # Python 2 regexes cannot have more than 100 groups
+    max_groups = 99
+
+    # maximum number of memoized token tags
+    max_cache = 100000
+
+    def __init__(self, patterns):
+        # list of (combined regex match function, {group number: tag})
+        self.combined = []
+        alternatives = []
+        tags_by_group = {}
+        groups = 0
+        for regexp, tag in patterns:
+            # a pattern group plus its own groups
+            pattern_groups = re.compile(regexp).groups + 1
+            if groups + pattern_groups > self.max_groups:
+                self._combine(alternatives, tags_by_group)
+                alternatives = []
+                tags_by_group = {}
+                groups = 0
+            tags_by_group[groups + 1] = tag
+            alternatives.append('(' + regexp + ')')
+            groups += pattern_groups
+        if alternatives:
+            self._combine(alternatives, tags_by_group)
+        self.cache = {}
+
+    def _combine(self, alternatives, tags_by_group):
+        combined = re.compile('|'.join(alternatives))
+        self.combined.append((combined.match, tags_by_group))
+
+    def tag_token(self, token):
+        """
+        Return the tag of a `token` string or None.
+        """
+        cache = self.cache
+        try:
+            return cache[token]
+        except KeyError:
+            pass
+
+        tag = None
+        for match, tags_by_group in self.combined:
+            matched = match(token)
+            if matched:
+                # the pattern group is closed last: it is the last matched group
+                tag = tags_by_group[matched.lastindex]
+                break
+
+        if len(cache) >= self.max_cache:
+            cache.clear()
+        cache[token] = tag
+        return tag
+
+    def tag(self, tokens):
+        """
+        Return a list of (token, tag) tuples for a `tokens` sequence of strings.
+        """
+        tag_token = self.tag_token
+        return [(token, tag_token(token)) for token in tokens]
+
+
+class ParseNode(object):
+    """
+    A node of a parse tree with a `label` and a list of `children` that are
+    either (token, tag) tuples or other ParseNodes.
+    """
+    __slots__ = ('label', 'children',)
+
+    def __init__(self, label, children):
+        self.label = label
+        self.children = children
+
+    def __iter__(self):
+        return iter(self.children)
+
+    def __len__(self):
+        return len(self.children)
+
+    def leaves(self):
+        """
+        Return a list of the (token, tag) tuples of this node and its
+        descendants.
+        """
+        leaves = []
+        leaves_extend = leaves.extend
+        leaves_append = leaves.append
+        for child in self.children:
+            if isinstance(child, ParseNode):
+                leaves_extend(child.leaves())
+            else:
+                leaves_append(child)
+        return leaves
+
+    def __repr__(self):
+        children = []
+        for child in self.children:
+            if isinstance(child, ParseNode):
+                children.append(repr(child))
+            else:
+                children.append('%s/%s' % child)
+        return '(%s %s)' % (self.label, ' '.join(children))
+
+
+class ChunkParser(object):
+    """
+    Chunk a sequence of (token, tag) tuples in a tree of ParseNodes using a
+    cascade of chunking stages defined in a `grammar` with the same syntax and
+    semantics as NLTK's RegexpParser. Only chunk rules are supported.
+
+    Each stage is a "LABEL: {<TAG> <OTHER.*>+}" line with a tag pattern. The
+    stages are applied in sequence: each sequence of tags matched by the tag
+    pattern of a stage is replaced by a single node with the stage label, and
+    later stages can match this label as a tag.
+
+    NLTK converts the tags to a string of "<TAG>" and matches each stage as a
+    regex over this string, rebuilding the string and the tree at every stage.
+    Here the whole grammar is compiled once in a regex per stage matching a
+    string with one character per tag: each <TAG.*> of a tag pattern is
+    replaced by a character class of all the tags it matches such that a stage
+    regex has the same semantics as the NLTK one. The `tags` sequence is the
+    set of all the tags that the parsed tokens can have.
+    """
+
+    def __init__(self, grammar, tags, root_label='S'):
+        self.root_label = root_label
+
+        # list of (label, compiled regex finditer) for each stage
+        stages = []
+        labels = []
+        for line in grammar.splitlines():
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            label, _, rule = line.partition(':')
+            label = label.strip()
+            rule = rule.partition('#')[0].strip()
+            if not (label and rule.startswith('{') and rule.endswith('}')):
+                raise ValueError('Unsupported grammar rule: %(line)r' % locals())
+            stages.append((label, rule[1:-1]))
+            labels.append(label)
+
+        # each tag is mapped to a character that is a letter such that it is
+        # never special in a regex
+        all_tags = []
+        for tag in list(tags) + labels:
+            if tag not in all_tags:
+                all_tags.append(tag)
+        self.char_by_tag = {tag: unichr(0x4E00 + i) for i, tag in enumerate(all_tags)}
+        # tags that are not known (and matched by no tag pattern) use this char
+        self.unknown_char = unichr(0x4E00 + len(all_tags))
+
+        self.stages = []
+        for label, tag_pattern in stages:
+            pattern = self.compile_tag_pattern(tag_pattern, all_tags)
+            self.stages.append((label, self.char_by_tag[label], re.compile(pattern).finditer))
+
+    def compile_tag_pattern(self, tag_pattern, all_tags):
+        """
+        Return a regex pattern string over the characters of each tag for an
+        NLTK-like `tag_pattern`.
+        """
+        char_by_tag = self.char_by_tag
+        # whitespace is not significant in tag patterns
+        tag_pattern = re.sub(r'\s', '', tag_pattern)
+        pattern = []
+        for piece in re.split(r'(<[^<>]*>)', tag_pattern):
+            if not piece.startswith('<'):
+                if '<' in piece or '>' in piece:
+                    raise ValueError('Bad tag pattern: %(tag_pattern)r' % locals())
+                pattern.append(piece)
+                continue
+            # a tag regex must match a whole tag
+            tag_match = re.compile(r'(?:%s)\Z' % piece[1:-1]).match
+            chars = u''.join(char_by_tag[t] for t in all_tags if tag_match(t))
+            # a class that matches nothing if no tag is matched
+            pattern.append(chars and u'[%s]' % chars or u'(?!)')
+        return u''.join(pattern)
+
+    def parse(self, tagged_tokens):
+        """
+        Return a root ParseNode for a `tagged_tokens` sequence of (token, tag).
+        """
+        pieces = list(tagged_tokens)
+        char_by_tag = self.char_by_tag
+        unknown_char = self.unknown_char
+        chars = u''.join([char_by_tag.get(tag, unknown_char) for _tok, tag in pieces])
+
+        for label, label_char, finditer in self.stages:
+            new_pieces = []
+            new_chars = []
+            end = 0
+            for matched in finditer(chars):
+                start, mend = matched.span()
+                # empty matches do not create chunks
+                if start == mend:
+                    continue
+                new_pieces.extend(pieces[end:start])
+                new_pieces.append(ParseNode(label, pieces[start:mend]))
+                new_chars.append(chars[end:start])
+                new_chars.append(label_char)
+                end = mend
+
+            if end:
+                new_pieces.extend(pieces[end:])
+                new_chars.append(chars[end:])
+                pieces = new_pieces
+                chars = u''.join(new_chars)
+
+        return ParseNode(self.root_label, pieces)
+
+
 class CopyrightDetector(object):
     """
     Class to detect copyrights and authorship.
     """
 
     def __init__(self):
-        from nltk import RegexpTagger
-        from nltk import RegexpParser
         self.tagger = RegexpTagger(patterns)
-        self.chunker = RegexpParser(grammar, trace=0)
+        tags = [tag for _pattern, tag in patterns]
+        self.chunker = ChunkParser(grammar, tags)
 
     @classmethod
     def as_str(cls, node, ignores=()):
@@ -1294,7 +1532,6 @@ class CopyrightDetector(object):
         Return a sequence of tuples (copyrights, authors, years, holders)
         detected in a sequence of numbered line tuples.
         """
-        from nltk.tree import Tree
         numbered_lines = list(numbered_lines)
         numbers = [n for n, _l in numbered_lines]
         start_line = min(numbers)
@@ -1332,9 +1569,9 @@ class CopyrightDetector(object):
             node collecting all holders.
             """
             for copyhold in detected_copyright:
-                if not isinstance(copyhold, Tree):
+                if not isinstance(copyhold, ParseNode):
                     continue
-                copyhold_label = copyhold.label()
+                copyhold_label = copyhold.label
                 logger.debug('node: ' + str(copyhold) + ' label: ' + copyhold_label)
                 if 'NAME' in copyhold_label or 'COMPANY' in copyhold_label:
                     logger.debug('node is NAME/CO')
@@ -1351,9 +1588,9 @@ class CopyrightDetector(object):
             node collecting all years.
             """
             for copyyear in detected_copyright:
-                if not isinstance(copyyear, Tree):
+                if not isinstance(copyyear, ParseNode):
                     continue
-                copyyear_label = copyyear.label()
+                copyyear_label = copyyear.label
                 logger.debug('node: ' + str(copyyear) + ' label: ' + copyyear_label)
                 if 'YR-RANGE' in copyyear_label :
                     logger.debug('node is YEAR')
@@ -1364,9 +1601,9 @@ class CopyrightDetector(object):
 
         # then walk the parse tree, collecting copyrights, years and authors
         for tree_node in tree:
-            if isinstance(tree_node, Tree):
+            if isinstance(tree_node, ParseNode):
                 node_text = CopyrightDetector_as_str(tree_node)
-                tree_node_label = tree_node.label()
+                tree_node_label = tree_node.label
                 if 'COPYRIGHT' in tree_node_label:
                     if node_text and node_text.strip():
                         refined = refine_copyright(node_text)
@@ -1458,6 +1695,52 @@ def is_all_rights_reserved(chars_only_line):
     return chars_only_line and chars_only_line.endswith(('rightreserved', 'rightsreserved'))
 
 
+# A regex to find the lines that may be candidate lines in a whole text at once,
+# before any line preparation. This matches a superset of the candidate lines:
+# years without their surrounding punctuation, lowercased statement markers and
+# also "&#xa9" as well as any non-ASCII character and "<s" Debian tags because
+# prepare_text_line() may replace these or remove these and create a marker.
+_possible_candidate_markers = re.compile(
+    r'(' +
+    r'19[6-9][0-9]|20[0-9][0-9]' +
+    r'|&#xa9|<s|[^\x00-\x7f]|' +
+    '|'.join(re.escape(marker.lower()) for marker in copyrights_hint.statement_markers) +
+    r')',
+    re.IGNORECASE).search
+
+
+def possible_candidate_lines(lines):
+    """
+    Return a set of the zero-based indexes of the lines in a `lines` list of
+    text lines that may be candidate lines. All the lines are scanned at once
+    as a single text and each line is checked with is_candidate() only if this
+    line is in this set.
+    """
+    lines_starts = []
+    lines_starts_append = lines_starts.append
+    start = 0
+    for line in lines:
+        lines_starts_append(start)
+        start += len(line) + 1
+
+    text = '\n'.join(lines)
+    last_line = len(lines) - 1
+    search = _possible_candidate_markers
+    possible = set()
+    start = 0
+    while True:
+        match = search(text, start)
+        if not match:
+            break
+        line_index = bisect_right(lines_starts, match.start()) - 1
+        possible.add(line_index)
+        if line_index == last_line:
+            break
+        # one match per line is enough: search again from the next line
+        start = lines_starts[line_index + 1]
+    return possible
+
+
 def candidate_lines(lines):
     """
     Yield lists of candidate lines where each list element is a tuple of
@@ -1470,7 +1753,12 @@ def candidate_lines(lines):
     candidates_append = candidates.append
     candidates_clear = candidates.clear
 
+    lines = list(lines)
+    possible_candidates = possible_candidate_lines(lines)
+
     previous = None
+    # the chars only line of the previous line or candidate line, or None if
+    # not yet computed
     previous_chars_only_line = None
     # used as a state and line counter
     in_copyright = 0
@@ -1479,13 +1767,24 @@ def candidate_lines(lines):
             logger.debug('candidate_lines: ' + repr(line))
         # the first line number is ONE, not zero
         numbered_line = (line_number + 1, line)
-        prepped_line, chars_only_line = prep_line(line)
-        if is_candidate(prepped_line):
+
+        # lines are only prepared if they can be candidate or when needed
+        if line_number in possible_candidates:
+            prepped_line, chars_only_line = prep_line(line)
+            candidate = is_candidate(prepped_line)
+        else:
+            chars_only_line = None
+            candidate = False
+
+        if candidate:
             # the state is now "in copyright"
             in_copyright = 2
-            # we keep one line before a candidate line if any
+            # we keep one line before a candidate line if any and not empty
             if previous:
-                candidates_append(previous)
+                if previous_chars_only_line is None:
+                    _, previous_chars_only_line = prep_line(previous[1])
+                if previous_chars_only_line:
+                    candidates_append(previous)
                 previous = None
                 previous_chars_only_line = None
             # we keep the candidate line and yield if we reached the end
@@ -1501,6 +1800,8 @@ def candidate_lines(lines):
                 previous_chars_only_line = None
         else:
             if in_copyright:
+                if chars_only_line is None:
+                    _, chars_only_line = prep_line(line)
                 # if the previous line was a candidate
                 # then we keep one line after that candidate line
                 if chars_only_line:
@@ -1521,14 +1822,11 @@ def candidate_lines(lines):
                 if candidates:
                     yield list(candidates)
                     candidates_clear()
-                # and we keep track of this line as "previous" if not empty
-                if chars_only_line:
-                    previous = numbered_line
-                    previous_chars_only_line = chars_only_line
-
-                else:
-                    previous = None
-                    previous_chars_only_line = None
+                # and we keep track of this line as "previous": it is kept only
+                # if it is not empty, which is checked only if the next line is
+                # a candidate
+                previous = numbered_line
+                previous_chars_only_line = chars_only_line
     # finally
     if candidates:
         yield list(candidates)
@@ -25,8 +25,16 @@
 from __future__ import absolute_import
 from __future__ import print_function
 
-import string
+from collections import OrderedDict
+import mmap
+import os
 import re
+import string
+
+try:
+    from functools import lru_cache
+except ImportError:
+    from backports.functools_lru_cache import lru_cache
 
 import url as urlpy
 import ipaddress
@@ -58,13 +66,31 @@ Find patterns in text lines such as a emails and URLs.
 Optionally apply filters to pattern matches.
 """
 
+# maximum number of cached values of each of the URL parsing and host
+# classification functions: the same hosts and URLs are found over and over
+# across files and these are costly to parse and classify.
+CACHE_SIZE = 10000
 
-def find(location, patterns):
+
+def cache_info():
+    """
+    Return a mapping of {function name: CacheInfo cache statistics} for the
+    cached URL parsing and host classification functions.
+    """
+    cached = (canonical_url, url_host_domain, is_good_host,)
+    return OrderedDict((func.__name__, func.cache_info()) for func in cached)
+
+
+def find(location, patterns, prescreens=None):
     """
     Yield match and matched lines for patterns found in file at location as a
     tuple of (key, found text, text line). Pattern is list of tuples (key,
     compiled regex).
 
+    `prescreens` is an optional mapping of {key: compiled regex}: the pattern of
+    a key is only matched in a line if its prescreen regex is found in this
+    line.
+
     Note: the location can be a list of lines for testing convenience.
     """
     if TRACE:
@@ -72,9 +98,14 @@ def find(location, patterns):
         loc = pformat(location)
         logger_debug('find(location=%(loc)r,\n  patterns=%(patterns)r)' % locals())
 
+    prescreens = prescreens or {}
+    patterns = [(key, pattern, prescreens.get(key)) for key, pattern in patterns]
+
     for i, line in enumerate(analysis.text_lines(location)):
         lineno = i + 1
-        for key, pattern in patterns:
+        for key, pattern, prescreen in patterns:
+            if prescreen and not prescreen(line):
+                continue
             for match in pattern.findall(line):
 
                 if TRACE:
@@ -83,6 +114,87 @@ def find(location, patterns):
                 yield key, unicode(match), line, lineno
 
 
+def find_clues(location, finders):
+    """
+    Return a mapping of {key: list of (found text, line number)} for a
+    `finders` list of tuples of (key, compiled regex, filters, literals) found
+    in file at location. The text lines are read once and all the regexes are
+    matched in a single pass over these lines. The matches of each regex are
+    then processed with their own sequence of filters.
+
+    `literals` is a sequence of strings such that a regex cannot match a text
+    that does not contain one of these or None. The file bytes are first
+    searched for these literals: the text lines are not read at all if no
+    regex can match in the file. Each regex is also matched only in the lines
+    that contain one of its literals.
+
+    Note: the location can be a list of lines for testing convenience.
+    """
+    matches_by_key = OrderedDict((key, []) for key, _regex, _filters, _literals in finders)
+
+    if isinstance(location, basestring):
+        finders = [(key, regex, filters, literals)
+                   for key, regex, filters, literals in finders
+                   if not literals or may_contain_literals(location, literals)]
+
+    if finders:
+        patterns = [(key, regex) for key, regex, _filters, _literals in finders]
+        prescreens = dict((key, literals_regex(literals).search)
+                          for key, _regex, _filters, literals in finders if literals)
+        for match in find(location, patterns, prescreens):
+            matches_by_key[match[0]].append(match)
+
+    filters_by_key = dict((key, filters) for key, _regex, filters, _literals in finders)
+    clues = OrderedDict()
+    for key, matches in matches_by_key.items():
+        if matches:
+            matches = apply_filters(matches, *filters_by_key[key])
+        clues[key] = [(unicode(match), lineno) for _key, match, _line, lineno in matches]
+    return clues
+
+
+def literals_regex(literals):
+    """
+    Return a compiled regex matching any of a `literals` sequence of strings in
+    text lines, ignoring case.
+    """
+    return re.compile('|'.join(re.escape(lit) for lit in literals), re.UNICODE | re.I)
+
+
+def literals_bytes_regex(literals):
+    """
+    Return a compiled regex matching any of a `literals` sequence of ASCII
+    strings in the bytes of a file, ignoring case. The literals are matched
+    either as plain ASCII or as UTF-16-LE "wide" strings as found in binaries.
+    """
+    alternatives = []
+    for lit in literals:
+        alternatives.append(re.escape(lit))
+        alternatives.append('\\x00'.join(re.escape(c) for c in lit))
+    return re.compile('|'.join(alternatives), re.I)
+
+
+def may_contain_literals(location, literals):
+    """
+    Return True if the bytes of the file at `location` contain any of a
+    `literals` sequence of ASCII strings or if this cannot be known without
+    extracting its text such as for PDFs.
+    """
+    if not os.path.isfile(location):
+        return True
+    if not os.path.getsize(location):
+        return False
+    with open(location, 'rb') as f:
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            # PDF text is compressed and extracted from the PDF structure
+            if '%PDF' in data[:1024]:
+                return True
+            return bool(literals_bytes_regex(literals).search(data))
+        finally:
+            data.close()
+
+
 def unique_filter(matches):
     """
     Iterate over matches and yield unique matches.
@@ -136,19 +248,27 @@ def emails_regex():
     return re.compile(r'\b[A-Z0-9._%-]+@[A-Z0-9.-]+\.[A-Z]{2,4}\b', re.IGNORECASE)
 
 
-def find_emails(location, unique=True):
+# an email always contains this literal
+EMAILS_LITERALS = ('@',)
+
+
+def emails_finder(unique=True):
     """
-    Yield emails found in file at location.
-    Only return unique items if unique is True.
+    Return a finder tuple of (key, compiled regex, filters, literals) for emails
+    for use with find_clues(). Only return unique items if unique is True.
     """
-    patterns = [('emails', emails_regex(),)]
-    matches = find(location, patterns)
-
     filters = (junk_email_domains_filter,)
     if unique:
         filters += (unique_filter,)
-    matches = apply_filters(matches, *filters)
-    for _key, email, _line, lineno in matches:
+    return 'emails', emails_regex(), filters, EMAILS_LITERALS
+
+
+def find_emails(location, unique=True):
+    """
+    Yield emails found in file at location.
+    Only return unique items if unique is True.
+    """
+    for email, lineno in find_clues(location, [emails_finder(unique)])['emails']:
         yield email, lineno
 
 
@@ -204,13 +324,15 @@ def urls_regex():
 INVALID_URLS_PATTERN = '((?:' + schemes + ')://([$%*/_])+)'
 
 
-def find_urls(location, unique=True):
+# a url always contains one of these literals, ignoring case
+URLS_LITERALS = ('://', 'www.', 'ftp.', 'git@',)
+
+
+def urls_finder(unique=True):
     """
-    Yield urls found in file at location.
-    Only return unique items if unique is True.
+    Return a finder tuple of (key, compiled regex, filters, literals) for urls
+    for use with find_clues(). Only return unique items if unique is True.
     """
-    patterns = [('urls', urls_regex(),)]
-    matches = find(location, patterns)
     # the order of filters IS important
     filters = (
         verbatim_crlf_url_cleaner,
@@ -225,10 +347,16 @@ def find_urls(location, unique=True):
     )
     if unique:
         filters += (unique_filter,)
+    return 'urls', urls_regex(), filters, URLS_LITERALS
+
 
-    matches = apply_filters(matches, *filters)
-    for _key, url, _line, lineno in matches:
-        yield unicode(url), lineno
+def find_urls(location, unique=True):
+    """
+    Yield urls found in file at location.
+    Only return unique items if unique is True.
+    """
+    for url, lineno in find_clues(location, [urls_finder(unique)])['urls']:
+        yield url, lineno
 
 
 EMPTY_URLS = set(['https', 'http', 'ftp', 'www', ])
@@ -342,6 +470,7 @@ def user_pass_cleaning_filter(matches):
         yield key, match, line, lineno
 
 
+@lru_cache(maxsize=CACHE_SIZE)
 def canonical_url(uri):
     """
     Return the canonical representation of a given URI.
@@ -441,6 +570,7 @@ def is_private_ip(ip):
         return private
 
 
+@lru_cache(maxsize=CACHE_SIZE)
 def is_good_host(host):
     """
     Return True if the host is not some local or uninteresting host.
@@ -464,6 +594,7 @@ def is_good_host(host):
     return good_host
 
 
+@lru_cache(maxsize=CACHE_SIZE)
 def url_host_domain(url):
     """
     Return a tuple of the (host, domain) of a URL or None. Assumes that the
@@ -516,15 +647,24 @@ def junk_urls_filter(matches):
         yield key, match, line, lineno
 
 
+def pattern_finder(pattern, key=None, unique=False):
+    """
+    Return a finder tuple of (key, compiled regex, filters, literals) for a
+    regex `pattern` text for use with find_clues(). Only return unique items if
+    unique is True.
+    """
+    pattern = re.compile(pattern, re.UNICODE | re.I)
+    filters = ()
+    if unique:
+        filters += (unique_filter,)
+    return key, pattern, filters, None
+
+
 def find_pattern(location, pattern, unique=False):
     """
     Find regex pattern in the text lines of file at location.
     Return all match groups joined as one unicode string.
     Only return unique items if unique is True.
     """
-    pattern = re.compile(pattern, re.UNICODE | re.I)
-    matches = find(location, [(None, pattern,)])
-    if unique:
-        matches = unique_filter(matches)
-    for _key, match , _line, lineno in matches:
+    for match, lineno in find_clues(location, [pattern_finder(pattern, unique=unique)])[None]:
         yield match, lineno
@@ -24,19 +24,17 @@
 
 from __future__ import absolute_import, print_function
 
-from functools import partial
 from hashlib import md5
+import os
 from os.path import exists
 from os.path import getmtime
-from os.path import getsize
 from os.path import join
 
 import yg.lockfile  # NOQA
 
-from commoncode.fileutils import resource_iter
 from commoncode.fileutils import create_dir
-from commoncode import ignore
 
+from scancode_config import __version__ as scancode_version
 from scancode_config import scancode_cache_dir
 from scancode_config import scancode_src_dir
 from scancode_config import SCANCODE_DEV_MODE
@@ -45,6 +43,12 @@ from scancode_config import SCANCODE_DEV_MODE
 An on-disk persistent cache of LicenseIndex. The index is pickled and invalidated if
 there are any changes in the code or licenses text or rules. Loading and dumping the
 cached index is safe to use across multiple processes using lock files.
+
+The cache validity is checked in two ways:
+ - a cheap manifest of directory modification times is always checked.
+ - a more costly content stamp of the licenses and rules data and of the code is
+   embedded in the cached index. It is checked when the manifest is stale or when
+   a consistency check is requested.
 """
 
 LICENSE_INDEX_LOCK_TIMEOUT = 60 * 4
@@ -54,14 +58,16 @@ _LICENSES_INDEX = None
 
 
 def get_index(cache_dir=scancode_cache_dir, check_consistency=SCANCODE_DEV_MODE,
-              return_value=True):
+              return_value=True, processes=0):
     """
     Return and eventually cache an index built from an iterable of rules.
-    Build the index from the built-in rules dataset.
+    Build the index from the built-in rules dataset using up to `processes`
+    number of processes.
     """
     global _LICENSES_INDEX
     if not _LICENSES_INDEX:
-        _LICENSES_INDEX = get_cached_index(cache_dir, check_consistency)
+        _LICENSES_INDEX = get_cached_index(cache_dir, check_consistency,
+                                           processes=processes)
     if return_value:
         return _LICENSES_INDEX
 
@@ -89,15 +95,19 @@ def get_cached_index(cache_dir=scancode_cache_dir,
                      # used for testing only
                      timeout=LICENSE_INDEX_LOCK_TIMEOUT,
                      tree_base_dir=scancode_src_dir,
-                     licenses_data_dir=None, rules_data_dir=None,):
+                     licenses_data_dir=None, rules_data_dir=None,
+                     processes=0):
     """
     Return a LicenseIndex: either load a cached index or build and cache the
-    index.
+    index. Use up to `processes` number of processes to build the index.
     - If the cache does not exist, a new index is built an cached.
-    - If `check_consistency` is True, the cache is checked for consistency and
-      rebuilt if inconsistent or stale.
-    - If `check_consistency` is False, the cache is NOT checked for consistency
-      If the cache files exist but ARE stale, the cache WILL NOT be rebuilt
+    - The cache is always checked for staleness using a cheap manifest of the
+      source and data directories modification times. If the manifest is stale,
+      the cache content stamp is checked and the index is rebuilt only if the
+      code or data content changed.
+    - If `check_consistency` is True, the cache content stamp is always checked
+      even if the manifest is current. This also detects files modified in
+      place, such as rules edited in a development checkout.
     """
     from licensedcode.index import LicenseIndex
     from licensedcode.models import licenses_data_dir as ldd
@@ -106,33 +116,33 @@ def get_cached_index(cache_dir=scancode_cache_dir,
 
     licenses_data_dir = licenses_data_dir or ldd
     rules_data_dir = rules_data_dir or rdd
+    data_dirs = licenses_data_dir, rules_data_dir
 
     lock_file, checksum_file, cache_file = get_license_cache_paths(cache_dir)
 
-    has_cache = exists(cache_file)
-    has_tree_checksum = exists(checksum_file)
+    current_manifest = tree_manifest(tree_base_dir, data_dirs)
 
-    # bypass check if no consistency check is needed
-    if has_cache and has_tree_checksum and not check_consistency:
-        return load_index(cache_file)
+    # bypass the content check if the manifest is current
+    if not check_consistency and exists(cache_file) and exists(checksum_file):
+        with open(checksum_file, 'rb') as etcs:
+            existing_manifest = etcs.read()
+        if current_manifest == existing_manifest:
+            return load_index(cache_file)
 
-    # here, we have no cache or we want a validity check: lock, check
-    # and build or rebuild as needed
+    # here, we have no cache, a stale manifest or we want a content check:
+    # lock, check and build or rebuild as needed
     try:
         # acquire lock and wait until timeout to get a lock or die
         with yg.lockfile.FileLock(lock_file, timeout=timeout):
-            current_checksum = None
+            current_stamp = content_stamp(tree_base_dir, data_dirs)
+
             # is the current cache consistent or stale?
-            if has_cache and has_tree_checksum:
-                # if we have a saved cached index
-                # load saved tree_checksum and compare with current tree_checksum
-                with open(checksum_file, 'rb') as etcs:
-                    existing_checksum = etcs.read()
-                current_checksum = tree_checksum(tree_base_dir=tree_base_dir)
-                if current_checksum == existing_checksum:
-                    # The cache is consistent with the latest code and data
-                    # load and return
-                    return load_index(cache_file)
+            if exists(cache_file) and current_stamp == load_stamp(cache_file):
+                # The cache is consistent with the latest code and data: save
+                # the current manifest, then load and return
+                with open(checksum_file, 'wb') as ctcs:
+                    ctcs.write(current_manifest)
+                return load_index(cache_file)
 
             # Here, the cache is not consistent with the latest code and
             # data: It is either stale or non-existing: we need to
@@ -141,15 +151,16 @@ def get_cached_index(cache_dir=scancode_cache_dir,
                 licenses_data_dir=licenses_data_dir,
                 rules_data_dir=rules_data_dir)
 
-            idx = LicenseIndex(rules)
+            idx = LicenseIndex(rules, processes=processes)
 
+            # the content stamp is embedded at the start of the cache file
             with open(cache_file, 'wb') as ifc:
+                ifc.write(current_stamp)
                 ifc.write(idx.dumps())
 
-            # save the new checksums tree
+            # save the new manifest
             with open(checksum_file, 'wb') as ctcs:
-                ctcs.write(current_checksum
-                           or tree_checksum(tree_base_dir=tree_base_dir))
+                ctcs.write(current_manifest)
 
             return idx
 
@@ -158,6 +169,10 @@ def get_cached_index(cache_dir=scancode_cache_dir,
         raise
 
 
+# length of the hex digest content stamp embedded in a cached index
+STAMP_LENGTH = 32
+
+
 def load_index(cache_file):
     """
     Return a LicenseIndex loaded from cache.
@@ -165,31 +180,80 @@ def load_index(cache_file):
     from licensedcode.index import LicenseIndex
     with open(cache_file, 'rb') as ifc:
         # Note: weird but read() + loads() is much (twice++???) faster than load()
-        return LicenseIndex.loads(ifc.read())
+        return LicenseIndex.loads(ifc.read()[STAMP_LENGTH:])
+
+
+def load_stamp(cache_file):
+    """
+    Return the content stamp embedded in a cached index.
+    """
+    with open(cache_file, 'rb') as ifc:
+        return ifc.read(STAMP_LENGTH)
+
+
+def _ignored(name):
+    """
+    Return True if a file `name` should be ignored for cache consistency:
+    compiled code and editors temp files do not matter.
+    """
+    return name.endswith(('.pyc', '~', '.swp',))
+
+
+def _walk_code(tree_base_dir, data_dirs):
+    """
+    Yield (directory, file names) for every directory of the `tree_base_dir`
+    tree, skipping the `data_dirs` directories.
+    """
+    for top, dirs, files in os.walk(tree_base_dir):
+        # do not walk data dirs
+        dirs[:] = [d for d in dirs if join(top, d) not in data_dirs]
+        yield top, files
 
 
-_ignored_from_hash = partial(
-    ignore.is_ignored,
-    ignores={'*.pyc': 'pyc files',
-             '*~': 'temp gedit files',
-             '*.swp': 'vi swap files'},
-    unignores={}
-)
+def tree_manifest(tree_base_dir=scancode_src_dir, data_dirs=()):
+    """
+    Return a manifest string listing the last modified time stamps of every
+    directory of the `tree_base_dir` tree and of each `data_dirs` directory.
+    The purpose is to detect cheaply if there has been any file added, removed
+    or renamed in the source code or data directories and use this as a proxy
+    to verify the cache consistency.
 
+    The `data_dirs` directories are not walked: they contain many files and
+    are expected to have no sub-directories.
 
-def tree_checksum(tree_base_dir=scancode_src_dir, _ignored=_ignored_from_hash):
+    NOTE: this is not fool proof: a file modified in place does not change its
+    parent directory modification time. The content_stamp() is used for this.
     """
-    Return a checksum computed from a file tree using the file paths,
-    size and last modified time stamps.
-    The purpose is to detect is there has been any modification to
-    source code or data files and use this as a proxy to verify the
-    cache consistency.
+    data_dirs = set(data_dirs)
+    dirs = set(top for top, _files in _walk_code(tree_base_dir, data_dirs))
+    dirs.update(data_dirs)
+    manifest = [d + ':' + repr(getmtime(d)) for d in dirs]
+    manifest.append(str(scancode_version))
+    return '\n'.join(sorted(manifest))
 
-    NOTE: this is not 100% fool proof but good enough in practice.
+
+def content_stamp(tree_base_dir=scancode_src_dir, data_dirs=()):
+    """
+    Return a content stamp computed from the content of the Python source code
+    files of the `tree_base_dir` tree and of every file in the `data_dirs`
+    directories. The purpose is to detect if there has been any modification to
+    the source code or data files used to build the index, regardless of any
+    file modified time stamp change.
     """
-    resources = resource_iter(tree_base_dir, ignored=_ignored, with_dirs=False)
-    hashable = (pth + str(getmtime(pth)) + str(getsize(pth)) for pth in resources)
-    return md5(''.join(sorted(hashable))).hexdigest()
+    data_dirs = set(data_dirs)
+    code_files = [join(top, name)
+                  for top, files in _walk_code(tree_base_dir, data_dirs)
+                  for name in files if name.endswith('.py')]
+    data_files = [join(data_dir, name)
+                  for data_dir in data_dirs
+                  for name in os.listdir(data_dir) if not _ignored(name)]
+
+    stamp = md5(str(scancode_version))
+    for pth in sorted(code_files) + sorted(data_files):
+        stamp.update(pth)
+        with open(pth, 'rb') as f:
+            stamp.update(f.read())
+    return stamp.hexdigest()
 
 
 def get_license_cache_paths(cache_dir=scancode_cache_dir):
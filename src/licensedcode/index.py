@@ -30,13 +30,19 @@ from __future__ import print_function
 from array import array
 from collections import Counter
 from collections import defaultdict
+from collections import OrderedDict
 import cPickle
 from functools import partial
+from hashlib import md5
+from itertools import imap
 from itertools import izip
 from operator import itemgetter
+from os.path import getsize
 import sys
 from time import time
 
+from intbitset import intbitset
+
 # import early
 from scancode_config import scancode_cache_dir
 
@@ -46,9 +52,11 @@ from licensedcode.frequent_tokens import global_tokens_by_ranks
 from licensedcode import match
 from licensedcode import match_aho
 from licensedcode import match_hash
+from licensedcode import match_lsh
 from licensedcode import match_seq
 from licensedcode import match_set
 from licensedcode import query
+from licensedcode.spans import Span
 from licensedcode import tokenize
 
 """
@@ -127,6 +135,300 @@ MAX_TOKENS = (2 ** 15) - 1
 # if 4, ~ 1/4 of all tokens will be treated as junk
 PROPORTION_OF_JUNK = 2
 
+# Feature switch to enable or not the MinHash/LSH pre-selection of the sequence
+# matching candidates of long query runs
+USE_LSH_CANDIDATES = False
+
+# minimum length of a query run to use the LSH candidates pre-selection
+LSH_MIN_QUERY_RUN_LENGTH = 200
+
+# number of rules sent at once to a process when indexing in parallel
+INDEXING_CHUNKSIZE = 100
+
+# maximum number of query runs sequence matches kept in a QueryRunMatchesCache
+QUERY_RUN_CACHE_SIZE = 5000
+
+# maximum number of query strings matches kept by LicenseIndex.match_strings()
+QUERY_STRING_CACHE_SIZE = 10000
+
+
+def _tokenize_rule(rule):
+    """
+    Return a tuple of (list of token strings, length, minimum_coverage,
+    relevance) for a `rule`. The rule attributes computed as a side effect of
+    tokenization are returned such that they can be set back on the rule when
+    tokenizing in a child process.
+    """
+    tokens = list(rule.tokens())
+    return tokens, rule.length, rule.minimum_coverage, rule.relevance
+
+
+def _build_rule_structures(args):
+    """
+    Return a tuple of (high postings items, (low tids set, high tids set), (low
+    tids multiset items, high tids multiset items)) given an `args` tuple of
+    (sequence of rule token ids, len_junk, len_good).
+
+    Mappings are returned as lists of (key, value) items: the mappings proper
+    are built by the caller with `_as_postings` and `_as_multiset` such that
+    they are identical when built in this or in a child process.
+    """
+    rule_token_ids, len_junk, len_good = args
+
+    # TODO: this could be optimized with a group_by
+    postings = defaultdict(list)
+    for pos, tid in enumerate(rule_token_ids):
+        if tid >= len_junk:
+            postings[tid].append(pos)
+    # OPTIMIZED: for speed and memory: convert postings to arrays
+    postings = [(tid, array('h', value)) for tid, value in postings.items()]
+
+    rlow_set, rhigh_set, rlow_mset, rhigh_mset = match_set.index_token_sets(rule_token_ids, len_junk, len_good)
+    return postings, (rlow_set, rhigh_set), (rlow_mset.items(), rhigh_mset.items())
+
+
+def _as_postings(items):
+    """
+    Return a postings mapping of {tid: array of positions} from a list of items.
+    """
+    postings = dict(items)
+    # OPTIMIZED: for speed, sparsify dict
+    sparsify(postings)
+    return postings
+
+
+def _as_multiset(items):
+    """
+    Return a token ids multiset from a list of items.
+    """
+    mset = defaultdict(int, items)
+    # sparify for speed
+    sparsify(mset)
+    return mset
+
+
+class MatchesCache(object):
+    """
+    A bounded least-recently-used cache of lists of matches.
+
+    Hits and misses are counted to help tune the cache size.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.hits = 0
+        self.misses = 0
+        # mapping of key -> cached matches data
+        self.matches_by_key = OrderedDict()
+
+    def _get(self, key):
+        """
+        Return the matches data cached for `key` or None.
+        """
+        cached = self.matches_by_key.pop(key, None)
+        if cached is None:
+            self.misses += 1
+            return
+        self.hits += 1
+        # reinsert as most recently used
+        self.matches_by_key[key] = cached
+        return cached
+
+    def _put(self, key, cached):
+        """
+        Cache the `cached` matches data for `key`.
+        """
+        matches_by_key = self.matches_by_key
+        matches_by_key[key] = cached
+        if len(matches_by_key) > self.size:
+            matches_by_key.popitem(last=False)
+
+    def clear(self):
+        self.hits = 0
+        self.misses = 0
+        self.matches_by_key.clear()
+
+    def __getstate__(self):
+        # cached matches are not pickled with an index
+        return (self.size,)
+
+    def __setstate__(self, state):
+        self.__init__(*state)
+
+
+class QueryRunMatchesCache(MatchesCache):
+    """
+    A bounded least-recently-used cache of the sequence matches of query runs.
+
+    The same license notice is often found in many files of a codebase: the
+    matches of a query run are cached such that an identical query run found
+    in another file or at another position is not matched again. Query runs
+    are identical if they have the same token ids and the same matchable
+    positions relative to their start. Cached matches are stored relative to
+    the query run start and translated to the start of the query run they are
+    reused for.
+    """
+
+    def __init__(self, size=QUERY_RUN_CACHE_SIZE):
+        MatchesCache.__init__(self, size)
+
+    @staticmethod
+    def key(query_run):
+        """
+        Return a cache key for a `query_run`.
+        """
+        start = query_run.start
+        matchables = intbitset([pos - start for pos in query_run.matchables])
+        digest = md5(array(b'h', query_run.tokens).tostring())
+        digest.update(matchables.fastdump())
+        return digest.digest()
+
+    def get(self, key, query, start):
+        """
+        Return a list of new LicenseMatch for `query` from the matches cached
+        for `key` translated to a query run `start` position or None if there
+        are no cached matches.
+        """
+        cached = self._get(key)
+        if cached is None:
+            return
+        return [match.LicenseMatch(
+                    rule, qspan.shift(start), ispan, hispan, query_run_start + start,
+                    matcher=matcher, query=query)
+                for rule, qspan, ispan, hispan, query_run_start, matcher in cached]
+
+    def put(self, key, matches, start):
+        """
+        Cache a list of LicenseMatch `matches` for `key` found in a query run
+        starting at the `start` position.
+        """
+        # Spans are immutable and can be shared by the matches of many queries
+        self._put(key, [
+            (m.rule, m.qspan.shift(-start), m.ispan, m.hispan,
+             m.query_run_start - start, m.matcher)
+            for m in matches])
+
+
+class QueryStringMatchesCache(MatchesCache):
+    """
+    A bounded least-recently-used cache of the matches of short query strings.
+
+    The query of a short string is small: it is cached with the matches such
+    that the matches returned from the cache can be scored and have a matched
+    text.
+    """
+
+    def __init__(self, size=QUERY_STRING_CACHE_SIZE):
+        MatchesCache.__init__(self, size)
+
+    def get(self, key):
+        """
+        Return a list of new LicenseMatch from the matches cached for `key` or
+        None if there are no cached matches.
+        """
+        cached = self._get(key)
+        if cached is None:
+            return
+        query, cached_matches = cached
+        return [match.LicenseMatch(
+                    rule, qspan, ispan, hispan, query_run_start,
+                    matcher=matcher, start_line=start_line, end_line=end_line,
+                    query=query)
+                for rule, qspan, ispan, hispan, query_run_start, matcher, start_line, end_line
+                in cached_matches]
+
+    def put(self, key, matches):
+        """
+        Cache a list of LicenseMatch `matches` for `key`.
+        """
+        query = matches[0].query if matches else None
+        self._put(key, (query, [
+            (m.rule, m.qspan, m.ispan, m.hispan, m.query_run_start, m.matcher,
+             m.start_line, m.end_line)
+            for m in matches]))
+
+
+class MatchStats(object):
+    """
+    Counters and timers of the license matching phases accumulated across the
+    queries matched with an index.
+
+    Counters track how many query runs, candidates, sequence matching calls and
+    matches are processed by each phase and how many matches are discarded by
+    each refinement filter. Timers track the time spent in each phase in
+    seconds.
+    """
+    # matching phases in the order of LicenseIndex.match()
+    phases = (
+        'hash',
+        'negative',
+        'exact',
+        'query_run_hash',
+        'candidates',
+        'seq',
+        'refine',
+    )
+
+    def __init__(self):
+        # mapping of {counter name: count}
+        self.counts = Counter()
+        # mapping of {phase name: seconds}
+        self.timings = defaultdict(float)
+
+    def count(self, name, value=1):
+        """
+        Add `value` to the `name` counter.
+        """
+        self.counts[name] += value
+
+    def time(self, phase, start):
+        """
+        Add the time elapsed since `start` to the `phase` timer and return the
+        current time.
+        """
+        now = time()
+        self.timings[phase] += now - start
+        return now
+
+    def to_dict(self, since=None):
+        """
+        Return an ordered mapping of {name: value} for the counters and the
+        phase timers as "<phase>_time" names. If `since` is a mapping returned
+        by an earlier call, return the difference since this earlier call.
+        """
+        stats = OrderedDict()
+        timings = self.timings
+        for phase in self.phases:
+            stats[phase + '_time'] = timings[phase]
+        for name in sorted(self.counts):
+            stats[name] = self.counts[name]
+        if since:
+            for name, value in since.items():
+                stats[name] = stats.get(name, 0) - value
+        return stats
+
+    def clear(self):
+        self.counts.clear()
+        self.timings.clear()
+
+    def __getstate__(self):
+        # stats are not pickled with an index
+        return ()
+
+    def __setstate__(self, state):
+        self.__init__()
+
+
+def _trace_phase(phase, start):
+    """
+    Print the duration of an indexing `phase` started at `start` time and
+    return the current time. Used for indexing performance tracing.
+    """
+    now = time()
+    duration = now - start
+    print('LicenseIndex: %(phase)s in %(duration)f seconds.' % locals())
+    return now
+
 
 class LicenseIndex(object):
     """
@@ -151,6 +453,9 @@ class LicenseIndex(object):
         'tids_sets_by_rid',
         'tids_msets_by_rid',
 
+        'thresholds_unique_by_rid',
+        'thresholds_by_rid',
+
         'rid_by_hash',
         'rules_automaton',
         'negative_automaton',
@@ -161,12 +466,24 @@ class LicenseIndex(object):
         'false_positive_rids',
         'largest_false_positive_length',
 
+        'required_tokens',
+
+        'lsh_index',
+
         'optimized',
+
+        'query_run_matches_cache',
+        'query_string_matches_cache',
+        'match_stats',
     )
 
-    def __init__(self, rules=None, _ranked_tokens=global_tokens_by_ranks):
+    def __init__(self, rules=None, _ranked_tokens=global_tokens_by_ranks, processes=0):
         """
         Initialize the index with an iterable of Rule objects.
+
+        Use up to `processes` number of processes to build the index in
+        parallel. The index is built serially if `processes` is one or less.
+        The resulting index is the same regardless of the number of processes.
         """
         # total number of unique known tokens
         self.len_tokens = 0
@@ -204,6 +521,11 @@ class LicenseIndex(object):
         # (low_tids_mset, high_tids_mset)
         self.tids_msets_by_rid = []
 
+        # mapping of rule_id -> Thresholds tuple of integers precomputed for
+        # unique tokens (sets) and for all tokens occurrences (multisets)
+        self.thresholds_unique_by_rid = []
+        self.thresholds_by_rid = []
+
         # mapping of hash -> single rid : duplicated rules are not allowed
         self.rid_by_hash = {}
 
@@ -220,17 +542,34 @@ class LicenseIndex(object):
         # length of the largest false_positive rule
         self.largest_false_positive_length = 0
 
+        # set of token strings such that a query must contain at least one of
+        # these to possibly match any rule
+        self.required_tokens = frozenset()
+
+        # MinHashLSH index of the rules high tokens sets used to pre-select the
+        # sequence matching candidates of long query runs
+        self.lsh_index = None
+
         # if True the index has been optimized and becomes read only:
         # no new rules can be added
         self.optimized = False
 
+        # sequence matches of the query runs matched with this index
+        self.query_run_matches_cache = QueryRunMatchesCache()
+
+        # matches of the short strings matched with match_strings()
+        self.query_string_matches_cache = QueryStringMatchesCache()
+
+        # counters and timers of the matching phases
+        self.match_stats = MatchStats()
+
         if rules:
             if TRACE_INDEXING_PERF:
                 start = time()
                 print('LicenseIndex: building index.')
 
             # index all and optimize
-            self._add_rules(rules, _ranked_tokens)
+            self._add_rules(rules, _ranked_tokens, processes=processes)
 
             if TRACE_INDEXING_PERF:
                 duration = time() - start
@@ -238,14 +577,44 @@ class LicenseIndex(object):
                 print('LicenseIndex: built index with %(len_rules)d rules in %(duration)f seconds.' % locals())
                 self._print_index_stats()
 
-    def _add_rules(self, rules, _ranked_tokens=global_tokens_by_ranks):
+    def _add_rules(self, rules, _ranked_tokens=global_tokens_by_ranks, processes=0):
         """
         Add a list of Rule objects to the index and constructs optimized and
         immutable index structures.
+
+        Use up to `processes` number of processes for the parallelizable parts
+        of the indexing: rules tokenization and per-rule postings and token sets
+        construction. Build serially if `processes` is one or less.
         """
         if self.optimized:
             raise Exception('Index has been optimized and cannot be updated.')
 
+        pool = None
+        if processes > 1:
+            from scancode.pool import get_pool
+            pool = get_pool(processes=processes)
+            # preserve the rules order: this is essential as the rule ids are
+            # assigned based on this order
+            mapper = partial(pool.imap, chunksize=INDEXING_CHUNKSIZE)
+        else:
+            mapper = imap
+
+        try:
+            self._build_index(rules, _ranked_tokens, mapper)
+        finally:
+            if pool:
+                pool.close()
+                pool.join()
+
+    def _build_index(self, rules, _ranked_tokens, mapper):
+        """
+        Build the index structures for a list of Rule objects. `mapper` is a
+        callable with the same signature and semantics as `imap` used to
+        process rules in sequence or in parallel.
+        """
+        if TRACE_INDEXING_PERF:
+            phase_start = time()
+
         # this assigns the rule ids implicitly: this is the index in the list
         self.rules_by_rid = list(rules)
 
@@ -258,8 +627,15 @@ class LicenseIndex(object):
         # This is used only during indexing
         frequencies_by_token = Counter()
 
-        for rid, rul in enumerate(self.rules_by_rid):
-            rul_tokens = list(rul.tokens())
+        tokenized_rules = mapper(_tokenize_rule, self.rules_by_rid)
+        for rid, (rul, tokenized) in enumerate(izip(self.rules_by_rid, tokenized_rules)):
+            rul_tokens, length, minimum_coverage, relevance = tokenized
+            # these are computed as a side effect of tokenization, possibly in
+            # another process: set them back on this rule
+            rul.length = length
+            rul.minimum_coverage = minimum_coverage
+            rul.relevance = relevance
+
             token_strings_by_rid.append(rul_tokens)
             frequencies_by_token.update(rul_tokens)
             # assign the rid to the rule object for sanity
@@ -281,6 +657,9 @@ class LicenseIndex(object):
                 # regular rules are matched using a common approach
                 self.regular_rids.add(rid)
 
+        if TRACE_INDEXING_PERF:
+            phase_start = _trace_phase('rules tokenization', phase_start)
+
         # Create the tokens lookup structure at once. Note that tokens ids are
         # assigned randomly here at first by unzipping: we get the frequencies
         # and tokens->id at once this way
@@ -304,6 +683,9 @@ class LicenseIndex(object):
         len_junk, dictionary, tokens_by_tid, tids_by_rid = renumbered
         self.len_good = len_good = len_tokens - len_junk
 
+        if TRACE_INDEXING_PERF:
+            phase_start = _trace_phase('token ids renumbering', phase_start)
+
         #######################################################################
         # build index structures
         #######################################################################
@@ -315,6 +697,8 @@ class LicenseIndex(object):
         self.high_postings_by_rid = [None for _ in range(len_rules)]
         self.tids_sets_by_rid = [None for _ in range(len_rules)]
         self.tids_msets_by_rid = [None for _ in range(len_rules)]
+        self.thresholds_unique_by_rid = [None for _ in range(len_rules)]
+        self.thresholds_by_rid = [None for _ in range(len_rules)]
 
         # track all duplicate rules: fail and report dupes at once at the end
         dupe_rules_by_hash = defaultdict(list)
@@ -323,6 +707,12 @@ class LicenseIndex(object):
         negative_automaton_add = partial(match_aho.add_sequence, automaton=self.negative_automaton)
         rules_automaton_add = partial(match_aho.add_sequence, automaton=self.rules_automaton)
 
+        # postings and sets are built for non-negative rules, in rid order
+        rules_structures = mapper(_build_rule_structures, (
+            (rule_token_ids, len_junk, len_good)
+            for rid, rule_token_ids in enumerate(tids_by_rid)
+            if not self.rules_by_rid[rid].negative))
+
         # build by-rule index structures over the token ids seq of each rule
         for rid, rule_token_ids in enumerate(tids_by_rid):
             rule = self.rules_by_rid[rid]
@@ -338,21 +728,12 @@ class LicenseIndex(object):
                 # update hashes index
                 self.rid_by_hash[rule_hash] = rid
 
-                # update high postings index: positions by high tids
-                # TODO: this could be optimized with a group_by
-                postings = defaultdict(list)
-                for pos, tid in enumerate(rule_token_ids):
-                    if tid >= len_junk:
-                        postings[tid].append(pos)
-                # OPTIMIZED: for speed and memory: convert postings to arrays
-                postings = {tid: array('h', value) for tid, value in postings.items()}
-                # OPTIMIZED: for speed, sparsify dict
-                sparsify(postings)
-                self.high_postings_by_rid[rid] = postings
-
+                # update high postings index: positions by high tids and
                 # build high and low tids sets and multisets
-                rlow_set, rhigh_set, rlow_mset, rhigh_mset = match_set.index_token_sets(rule_token_ids, len_junk, len_good)
-                self.tids_sets_by_rid[rid] = rlow_set, rhigh_set
+                postings, tids_sets, tids_msets = next(rules_structures)
+                self.high_postings_by_rid[rid] = _as_postings(postings)
+                self.tids_sets_by_rid[rid] = rlow_set, rhigh_set = tids_sets
+                rlow_mset, rhigh_mset = map(_as_multiset, tids_msets)
                 self.tids_msets_by_rid[rid] = rlow_mset, rhigh_mset
 
                 # populate automaton with the whole rule tokens sequence
@@ -371,6 +752,13 @@ class LicenseIndex(object):
                 rule.low_length = match_set.tids_multiset_counter(rlow_mset)
                 rule.high_length = match_set.tids_multiset_counter(rhigh_mset)
                 assert rule.length == rule.low_length + rule.high_length
+                # note: thresholds_unique() is computed first as thresholds()
+                # may update the rule minimum_coverage
+                self.thresholds_unique_by_rid[rid] = rule.thresholds_unique()
+                self.thresholds_by_rid[rid] = rule.thresholds()
+
+        if TRACE_INDEXING_PERF:
+            phase_start = _trace_phase('postings, sets and hashes', phase_start)
 
         # # finalize automatons
         self.negative_automaton.make_automaton()
@@ -379,6 +767,17 @@ class LicenseIndex(object):
         # sparser dicts for faster lookup
         sparsify(self.rid_by_hash)
 
+        if TRACE_INDEXING_PERF:
+            phase_start = _trace_phase('automatons', phase_start)
+
+        self.required_tokens = self._required_tokens()
+
+        if USE_LSH_CANDIDATES:
+            self.lsh_index = self._build_lsh_index()
+
+            if TRACE_INDEXING_PERF:
+                phase_start = _trace_phase('LSH index', phase_start)
+
         dupe_rules = [rules for rules in dupe_rules_by_hash.values() if len(rules) > 1]
         if dupe_rules:
             dupe_rule_paths = [['file://' + rule.text_file for rule in rules] for rules in dupe_rules]
@@ -387,6 +786,53 @@ class LicenseIndex(object):
 
         self.optimized = True
 
+    def _build_lsh_index(self):
+        """
+        Return a new MinHashLSH index of the rules high tokens sets.
+        """
+        lsh_index = match_lsh.MinHashLSH(self.len_tokens)
+        for rid in sorted(self.regular_rids | self.small_rids):
+            _rlow_set, rhigh_set = self.tids_sets_by_rid[rid]
+            if rhigh_set:
+                lsh_index.add(rid, rhigh_set)
+        lsh_index.optimize()
+        return lsh_index
+
+    def get_lsh_index(self):
+        """
+        Return the MinHashLSH index of this index, building it on first use if
+        it was not built with the index (e.g. USE_LSH_CANDIDATES was False).
+        """
+        if self.lsh_index is None:
+            self.lsh_index = self._build_lsh_index()
+        return self.lsh_index
+
+    def _required_tokens(self):
+        """
+        Return a set of token strings such that a query must contain at least
+        one of these tokens to possibly match any non-negative rule.
+
+        A query that has none of these tokens cannot match:
+         - a rule with high tokens matched exactly or by hash: the query would
+           contain all its tokens, including its high tokens.
+         - a rule with high tokens matched as a sequence: the matched blocks
+           and candidates are always built from high tokens.
+         - a rule with only junk tokens matched exactly or by hash: the query
+           would contain all its tokens, including its rarest token.
+        """
+        len_junk = self.len_junk
+        tokens_by_tid = self.tokens_by_tid
+        # every high token
+        required = set(tokens_by_tid[len_junk:])
+        # and the rarest token of each rule that has only junk tokens
+        for rid, rule_token_ids in enumerate(self.tids_by_rid):
+            if rid in self.negative_rids or not rule_token_ids:
+                continue
+            rarest = max(rule_token_ids)
+            if rarest < len_junk:
+                required.add(tokens_by_tid[rarest])
+        return frozenset(required)
+
     def debug_matches(self, matches, message, location=None, query_string=None, with_text=False, query=None):
         if TRACE or TRACE_NEGATIVE:
             logger_debug(message + ':', len(matches))
@@ -423,11 +869,126 @@ class LicenseIndex(object):
         if not location and not query_string:
             return []
 
-        qry = query.build_query(location, query_string, self)
+        if location and getsize(location) > query.QUERY_WINDOW_SIZE:
+            return self._match_windows(location, min_score, detect_negative)
+
+        qry = query.build_query(location, query_string, self, prefilter=True)
         if not qry:
             logger_debug('#match: No query returned for:', location)
             return []
 
+        return self._match_query(qry, min_score, detect_negative)
+
+    def match_strings(self, query_strings, min_score=0):
+        """
+        Return a list of lists of LicenseMatch, one list for each string of a
+        `query_strings` iterable, in the same order. Only include matches with
+        scores greater or equal to `min_score`.
+
+        This is designed to match many short strings such as the license
+        fields of package manifests where the same strings (e.g. "MIT") are
+        found over and over: each distinct string is matched only once and its
+        matches are cached for the next calls.
+        """
+        cache = self.query_string_matches_cache
+        results = []
+        for query_string in query_strings:
+            if not query_string:
+                results.append([])
+                continue
+            key = query_string, min_score
+            matches = cache.get(key)
+            if matches is None:
+                matches = self.match(query_string=query_string, min_score=min_score)
+                cache.put(key, matches)
+            results.append(matches)
+        return results
+
+    def _match_windows(self, location, min_score=0, detect_negative=True,
+                       window_size=query.QUERY_WINDOW_SIZE,
+                       overlap=query.QUERY_WINDOW_OVERLAP):
+        """
+        Return a sequence of LicenseMatch by matching the large file at
+        `location` in overlapping windows of bounded size such that the memory
+        used does not depend on the file size. Only include matches with scores
+        greater or equal to `min_score`. See query.query_windows() for the
+        `window_size` and `overlap` arguments.
+
+        The matches of each window are translated to absolute lines and positions
+        as if the whole file was matched at once. A match is kept only from the
+        window that owns the line where it starts. The kept matches of all the
+        windows are then merged and filtered together.
+        """
+        # a stand-in query for the whole file with only the unknowns needed to
+        # score the kept matches
+        file_query = query.Query(location=location, idx=self, _test_mode=True)
+        unknowns_by_pos = file_query.unknowns_by_pos
+        unknowns = []
+        # absolute end positions of kept matches that are the last position of
+        # their window: the count of unknowns after these positions is taken
+        # from the next window where they are carried
+        unknowns_pending = set()
+        # mapping of the absolute start and end positions of kept matches -> line
+        line_by_pos = {}
+
+        matches = []
+        windows = query.query_windows(location, self, window_size, overlap, prefilter=True)
+        for qry, start_line, start_pos, own_start, own_end in windows:
+            window_unknowns_by_pos = qry.unknowns_by_pos
+            last_pos = len(qry.tokens) - 1
+            for pos in list(unknowns_pending):
+                if start_pos <= pos < start_pos + last_pos:
+                    unknowns_pending.remove(pos)
+                    unknowns_by_pos[pos] = window_unknowns_by_pos[pos - start_pos]
+                    unknowns.append(pos)
+
+            window_matches = self._match_query(qry, min_score, detect_negative)
+            line_offset = start_line - 1
+            kept = [m for m in window_matches
+                    if own_start <= m.start_line + line_offset
+                    and (own_end is None or m.start_line + line_offset <= own_end)]
+            if TRACE: logger_debug('#match_windows: window at line:', start_line, 'matches:', len(window_matches), 'kept:', len(kept))
+
+            for m in kept:
+                for pos in m.qspan & qry.unknowns_span:
+                    unknowns.append(pos + start_pos)
+                    unknowns_by_pos[pos + start_pos] = window_unknowns_by_pos[pos]
+                if m.qend == last_pos:
+                    unknowns_pending.add(m.qend + start_pos)
+
+                qspan = m.qspan.shift(start_pos)
+                line_by_pos[qspan.start] = m.start_line + line_offset
+                line_by_pos[qspan.end] = m.end_line + line_offset
+                matches.append(match.LicenseMatch(
+                    rule=m.rule,
+                    qspan=qspan,
+                    ispan=m.ispan,
+                    hispan=m.hispan,
+                    query_run_start=m.query_run_start + start_pos,
+                    matcher=m.matcher,
+                    query=file_query))
+
+        file_query.unknowns_span = Span(unknowns)
+
+        # the matches of each window are refined in this window: merge and
+        # filter the matches of a license spread across windows
+        matches = match.merge_matches(matches, max_dist=MAX_DIST // 2)
+        matches, _discarded = match.filter_contained_matches(matches)
+        matches.sort()
+        match.set_lines(matches, line_by_pos)
+        return matches
+
+    def _match_query(self, qry, min_score=0, detect_negative=True):
+        """
+        Return a sequence of LicenseMatch by matching the `qry` Query against the
+        index. Only include matches with scores greater or equal to `min_score`.
+        """
+        location = qry.location
+        query_string = qry.query_string
+
+        stats = self.match_stats
+        stats.count('queries')
+
         #######################################################################
         # Whole file matching: hash and exact matching
         #######################################################################
@@ -437,8 +998,11 @@ class LicenseIndex(object):
             return []
 
         # hash
+        start = time()
         hash_matches = match_hash.hash_match(self, whole_query_run)
+        start = stats.time('hash', start)
         if hash_matches:
+            stats.count('hash_matches', len(hash_matches))
             if TRACE: self.debug_matches(hash_matches, '#match FINAL Hash matched', location, query_string)
             match.set_lines(hash_matches, qry.line_by_pos)
             return hash_matches
@@ -451,13 +1015,18 @@ class LicenseIndex(object):
             negative_matches = self.negative_match(whole_query_run)
             for neg in negative_matches:
                 whole_query_run.subtract(neg.qspan)
+            stats.count('negative_matches', len(negative_matches))
+            start = stats.time('negative', start)
 
         # exact matches
         if TRACE_EXACT: logger_debug('#match: EXACT')
         exact_matches = match_aho.exact_match(self, whole_query_run, self.rules_automaton)
         if TRACE_EXACT: self.debug_matches(exact_matches, '  #match: EXACT matches#:', location, query_string)
+        stats.count('exact_matches', len(exact_matches))
+        start = stats.time('exact', start)
 
-        exact_matches, exact_discarded = match.refine_matches(exact_matches, self, query=qry, filter_false_positive=False, merge=False)
+        exact_matches, exact_discarded = match.refine_matches(exact_matches, self, query=qry, filter_false_positive=False, merge=False, stats=stats)
+        start = stats.time('refine', start)
 
         if TRACE_EXACT: self.debug_matches(exact_matches, '   #match: ===> exact matches refined')
         if TRACE_EXACT: self.debug_matches(exact_discarded, '   #match: ===> exact matches discarded')
@@ -479,35 +1048,60 @@ class LicenseIndex(object):
 
             # FIXME: we should exclude small and "weak" rules from the subset entirely
             # they are unlikely to be matchable with a seq match
-            rules_subset = (self.regular_rids | self.small_rids)
+            rules_subset = intbitset(self.regular_rids | self.small_rids)
+            query_run_matches_cache = self.query_run_matches_cache
 
             for qrnum, query_run in enumerate(qry.query_runs, 1):
                 if TRACE_QUERY_RUN_SIMPLE:
                     logger_debug('#match: ===> processing query run #:', qrnum)
                     logger_debug('  #match:query_run:', query_run)
 
+                stats.count('query_runs')
                 if not query_run.is_matchable(include_low=True):
                     if TRACE: logger_debug('#match: query_run NOT MATCHABLE')
                     continue
 
                 # hash match
                 #########################
+                start = time()
                 hash_matches = match_hash.hash_match(self, query_run)
+                start = stats.time('query_run_hash', start)
                 if hash_matches:
                     if TRACE: self.debug_matches(hash_matches, '  #match Query run matches (hash)', location, query_string)
+                    stats.count('query_run_hash_matches', len(hash_matches))
                     matches.extend(hash_matches)
                     continue
 
-                # FIXME: why do not we aho match again here? This would avoid
-                # going into the costly set and seq re-match that may not be needed at all
-                # alternatively we should consider aho matches to excludes them from candidates
+                # NOTE: exact matches found on the whole query are not subtracted
+                # from the query run before sequence matching and a query run
+                # entirely matched exactly is still matched: a smaller rule
+                # matched exactly is often part of a larger rule that is only
+                # matched approximately and that would not be matched anymore.
+
+                # reuse the matches of an identical query run matched earlier
+                #########################################
+                cache_key = query_run_matches_cache.key(query_run)
+                run_matches = query_run_matches_cache.get(cache_key, qry, query_run.start)
+                if run_matches is not None:
+                    if TRACE: self.debug_matches(run_matches, '  #match Query run matches (cached)', location, query_string)
+                    matches.extend(run_matches)
+                    continue
 
                 # query run match proper using sequence matching
                 #########################################
                 if TRACE: logger_debug('  #match: Query run MATCHING proper....')
 
+                start = time()
                 run_matches = []
-                candidates = match_set.compute_candidates(query_run, self, rules_subset=rules_subset, top=40)
+                run_rules_subset = rules_subset
+                if USE_LSH_CANDIDATES and len(query_run) >= LSH_MIN_QUERY_RUN_LENGTH:
+                    high_tids = match_lsh.query_run_high_tids(query_run)
+                    run_rules_subset = rules_subset & self.get_lsh_index().candidates(high_tids)
+                    if TRACE_CANDIDATES: logger_debug('      #match: query_run: number of LSH candidates #', len(run_rules_subset))
+
+                candidates = match_set.compute_candidates(query_run, self, rules_subset=run_rules_subset, top=40)
+                stats.count('candidates', len(candidates))
+                start = stats.time('candidates', start)
 
                 if TRACE_CANDIDATES: logger_debug('      #match: query_run: number of candidates for seq match #', len(candidates))
 
@@ -518,6 +1112,7 @@ class LicenseIndex(object):
                     start_offset = 0
                     while True:
                         rule_matches = match_seq.match_sequence(self, candidate, query_run, start_offset=start_offset)
+                        stats.count('seq_calls')
                         if TRACE_QUERY_RUN and rule_matches:
                             self.debug_matches(rule_matches, '           #match: query_run: seq matches for candidate', with_text=True, query=qry)
                         if not rule_matches:
@@ -527,7 +1122,8 @@ class LicenseIndex(object):
                             run_matches.extend(rule_matches)
 
                             if matches_end + 1 < query_run.end:
-                                start_offset = matches_end + 1
+                                # the offset is relative to the query run start
+                                start_offset = matches_end + 1 - query_run.start
                                 continue
                             else:
                                 break
@@ -536,6 +1132,9 @@ class LicenseIndex(object):
                 if TRACE_QUERY_RUN: self.debug_matches(run_matches, '    #match: ===> Query run matches', location, query_string, with_text=True, query=qry)
 
                 run_matches = match.merge_matches(run_matches, max_dist=MAX_DIST)
+                stats.count('seq_matches', len(run_matches))
+                stats.time('seq', start)
+                query_run_matches_cache.put(cache_key, run_matches, query_run.start)
                 matches.extend(run_matches)
 
                 if TRACE: self.debug_matches(run_matches, '     #match: Query run matches merged', location, query_string)
@@ -547,7 +1146,9 @@ class LicenseIndex(object):
             logger_debug('!!!!!!!!!!!!!!!!!!!!REFINING!!!!!!!!!!!!!!!!!!!!!!!!!!!!')
             self.debug_matches(matches, '#match: ALL matches from all query runs', location, query_string)
 
-            matches, whole_discarded = match.refine_matches(matches, idx=self, query=qry, min_score=min_score, max_dist=MAX_DIST // 2, filter_false_positive=True)
+            start = time()
+            matches, whole_discarded = match.refine_matches(matches, idx=self, query=qry, min_score=min_score, max_dist=MAX_DIST // 2, filter_false_positive=True, stats=stats)
+            stats.time('refine', start)
             if TRACE_MATCHES_DISCARD:
                 discarded.extend(whole_discarded)
             matches.sort()
@@ -590,6 +1191,9 @@ class LicenseIndex(object):
         'tids_sets_by_rid',
         'tids_msets_by_rid',
 
+        'thresholds_unique_by_rid',
+        'thresholds_by_rid',
+
         'regular_rids',
         'negative_rids',
         'small_rids',
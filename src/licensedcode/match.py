@@ -342,9 +342,9 @@ class LicenseMatch(object):
 
         combined = LicenseMatch(
             rule=self.rule,
-            qspan=Span(self.qspan | other.qspan),
-            ispan=Span(self.ispan | other.ispan),
-            hispan=Span(self.hispan | other.hispan),
+            qspan=self.qspan | other.qspan,
+            ispan=self.ispan | other.ispan,
+            hispan=self.hispan | other.hispan,
             query_run_start=min(self.query_run_start, other.query_run_start),
             matcher=newmatcher,
             query=self.query)
@@ -610,9 +610,14 @@ def filter_contained_matches(matches):
             if TRACE_FILTER_CONTAINS: logger_debug('---> filter_contained_matches: current: i=', i, current_match)
             if TRACE_FILTER_CONTAINS: logger_debug('---> filter_contained_matches: next:    j=', j, next_match)
 
-            # TODO: is this really correct?: we could break/shortcircuit rather than continue
-            # since continuing looking next matches will yield no new findings
-            # stop when no overlap: Touching and overlapping matches have a zero distance.
+            # Matches are sorted by query start: if next starts after the end
+            # of current (without touching), then any other next match also
+            # starts after current, so none can overlap or touch current.
+            if next_match.qstart > current_match.qend + 1:
+                if TRACE_FILTER_CONTAINS: logger_debug('    ---> ###filter_contained_matches: next starts after current: NO OVERLAP POSSIBLE, breaking')
+                break
+
+            # skip when no overlap: Touching and overlapping matches have a zero distance.
             if current_match.qdistance_to(next_match):
                 if TRACE_FILTER_CONTAINS: logger_debug('    ---> ###filter_contained_matches: matches have a distance: NO OVERLAP POSSIBLE -->', 'qdist:', current_match.qdistance_to(next_match))
                 j += 1
@@ -958,11 +963,19 @@ def filter_false_positive_matches(matches):
     return kept, discarded
 
 
-def refine_matches(matches, idx, query=None, min_score=0, max_dist=MAX_DIST, filter_false_positive=True, merge=True):
+def refine_matches(matches, idx, query=None, min_score=0, max_dist=MAX_DIST, filter_false_positive=True, merge=True, stats=None):
     """
     Return two sequences of matches: one contains refined good matches, and the
     other contains matches that were filtered out.
+
+    If `stats` is provided, the count of matches discarded by each filter is
+    added to this index.MatchStats.
     """
+    if stats:
+        count = stats.count
+    else:
+        def count(name, value=1): pass
+
     if TRACE: logger_debug()
     if TRACE: logger_debug(' #####refine_matches: STARTING matches#', len(matches))
     if TRACE_REFINE: map(logger_debug, matches)
@@ -977,6 +990,7 @@ def refine_matches(matches, idx, query=None, min_score=0, max_dist=MAX_DIST, fil
     # and not 10's of loops!!!
 
     matches, discarded = filter_rule_min_coverage(matches)
+    count('discarded_min_coverage', len(discarded))
     all_discarded.extend(discarded)
     if TRACE: logger_debug('   #####refine_matches: NOT UNDER MIN COVERAGE #', len(matches))
     if TRACE_REFINE: map(logger_debug, matches)
@@ -984,6 +998,7 @@ def refine_matches(matches, idx, query=None, min_score=0, max_dist=MAX_DIST, fil
     if TRACE_REFINE: map(logger_debug, discarded)
 
     matches, discarded = filter_spurious_single_token(matches, query)
+    count('discarded_single_token', len(discarded))
     all_discarded.extend(discarded)
     if TRACE: logger_debug('   #####refine_matches: NOT SINGLE TOKEN #', len(matches))
     if TRACE_REFINE: map(logger_debug, matches)
@@ -991,6 +1006,7 @@ def refine_matches(matches, idx, query=None, min_score=0, max_dist=MAX_DIST, fil
     if TRACE_REFINE: map(logger_debug, discarded)
 
     matches, discarded = filter_short_matches(matches)
+    count('discarded_short', len(discarded))
     all_discarded.extend(discarded)
     if TRACE: logger_debug('   #####refine_matches: NOT SHORT #', len(matches))
     if TRACE_REFINE: map(logger_debug, matches)
@@ -998,6 +1014,7 @@ def refine_matches(matches, idx, query=None, min_score=0, max_dist=MAX_DIST, fil
     if TRACE_REFINE: map(logger_debug, discarded)
 
     matches, discarded = filter_spurious_matches(matches)
+    count('discarded_spurious', len(discarded))
     all_discarded.extend(discarded)
     if TRACE: logger_debug('   #####refine_matches: NOT SPURIOUS#', len(matches))
     if TRACE_REFINE: map(logger_debug, matches)
@@ -1009,6 +1026,7 @@ def refine_matches(matches, idx, query=None, min_score=0, max_dist=MAX_DIST, fil
     if TRACE_REFINE: map(logger_debug, matches)
 
     matches, discarded = filter_contained_matches(matches)
+    count('discarded_contained', len(discarded))
     all_discarded.extend(discarded)
     logger_debug('   ##### refine_matches: NOT FILTERED matches#:', len(matches))
     if TRACE_REFINE: map(logger_debug, matches)
@@ -1017,6 +1035,7 @@ def refine_matches(matches, idx, query=None, min_score=0, max_dist=MAX_DIST, fil
 
     if filter_false_positive:
         matches, discarded = filter_false_positive_matches(matches)
+        count('discarded_false_positive', len(discarded))
         all_discarded.extend(discarded)
         if TRACE: logger_debug('   #####refine_matches: NOT FALSE POS #', len(matches))
         if TRACE_REFINE: map(logger_debug, matches)
@@ -1025,6 +1044,7 @@ def refine_matches(matches, idx, query=None, min_score=0, max_dist=MAX_DIST, fil
 
     if min_score:
         matches, discarded = filter_low_score(matches, min_score=min_score)
+        count('discarded_low_score', len(discarded))
         all_discarded.extend(discarded)
         if TRACE: logger_debug('   #####refine_matches: NOT LOW SCORE #', len(matches))
         if TRACE_REFINE: map(logger_debug, matches)
@@ -1062,94 +1082,125 @@ def get_full_matched_text(
     enclose an unmatched token sequence in [] square brackets.
     Punctuation is not highlighted.
     """
-    assert location or query_string
-    assert idx
-    dictionary_get = idx.dictionary.get
+    text_tokens = MatchedTextTokens(
+        location, query_string, idx, [(match.start_line, match.end_line)])
+    return text_tokens.matched_text(
+        match, whole_lines, highlight_matched, highlight_not_matched)
 
-    import attr
-
-    @attr.s(slots=True)
-    class Token(object):
-        value = attr.ib()
-        line_num = attr.ib()
-        pos = attr.ib(default=-1)
-        # False if this is punctuation
-        is_text = attr.ib(default=False)
-        is_included = attr.ib(default=False)
-        is_matched = attr.ib(default=False)
-        is_known = attr.ib(default=False)
-
-    def _tokenize(location, query_string):
-        """Yield Tokens with pos and line number."""
-        _pos = -1
-        for _line_num, _line in enumerate(query.query_lines(location, query_string, strip=False), 1):
-            for _is_text, _token in tokenize.matched_query_text_tokenizer(_line):
-                _known = _is_text and dictionary_get(_token.lower()) is not None
-                _tok = Token(value=_token, line_num=_line_num, is_text=_is_text, is_known=_known)
-                if _known:
-                    _pos += 1
-                    _tok.pos = _pos
-                yield _tok
-
-    def _in_matched_lines(tokens, _start_line, _end_line):
-        """Yield tokens that are within matched start and end lines."""
-        for _tok in tokens:
-            if _tok.line_num < _start_line:
-                continue
-            if _tok.line_num > _end_line:
-                break
-            yield _tok
-
-    def _tag_tokens_as_matched(tokens, qspan):
-        """Tag tokens within qspan as matched."""
-        for _tok in tokens:
-            if _tok.pos != -1 and _tok.is_known and _tok.pos in qspan:
-                _tok.is_matched = True
-            yield _tok
-
-    def _tag_tokens_as_included_in_whole_lines(tokens, _start_line, _end_line):
-        """Tag tokens within start and end lines as as_included."""
-        for _tok in tokens:
-            if _start_line <= _tok.line_num <= _end_line:
-                _tok.is_included = True
-            yield _tok
-
-    def _tag_tokens_as_included_in_matched_range(tokens, _start, _end):
-        """Tag tokens within start and end positions as as_included."""
-        started = False
-        finished = False
-        for _tok in tokens:
-            if not started and _tok.pos == _start:
-                started = True
-
-            if started and not finished:
-                _tok.is_included = True
-
-            yield _tok
-
-            if _tok.pos == _end:
-                finished = True
 
-    # Create and process a stream of Tokens
-    tokenized = _tokenize(location, query_string)
-    in_matched_lines = _in_matched_lines(tokenized, match.start_line, match.end_line)
-    matched = _tag_tokens_as_matched(in_matched_lines, match.qspan)
-    if whole_lines:
-        as_included = _tag_tokens_as_included_in_whole_lines(matched, match.start_line, match.end_line)
-    else:
-        as_included = _tag_tokens_as_included_in_matched_range(matched, match.qspan.start, match.qspan.end)
-    tokens = (t for t in as_included if t.is_included)
+def get_full_matched_texts(
+        matches, location=None, query_string=None, idx=None,
+        whole_lines=False, highlight_matched=u'%s', highlight_not_matched=u'[%s]'):
+    """
+    Yield one unicode full matched text string for each LicenseMatch of a
+    `matches` sequence, given a query file at `location` or a `query_string`
+    and an `idx` LicenseIndex. All the matches must be for the same query.
 
-    # Finally yield strings with eventual highlightings
-    for token in tokens:
-        if token.is_text:
-            if token.is_matched:
-                yield highlight_matched % token.value
+    This is the same as calling get_full_matched_text() for each match, except
+    that the query text is read and tokenized only once for all the matches.
+    """
+    if not matches:
+        return
+    text_tokens = MatchedTextTokens(
+        location, query_string, idx, [(m.start_line, m.end_line) for m in matches])
+    for match in matches:
+        yield u''.join(text_tokens.matched_text(
+            match, whole_lines, highlight_matched, highlight_not_matched))
+
+
+class MatchedTextTokens(object):
+    """
+    The tokens and non-tokens (such as punctuations and spaces) of the lines of
+    a query text given a query file at `location` or a `query_string` and an
+    `idx` LicenseIndex, tokenized once to collect the full matched text of the
+    matches to this query.
+
+    Only the lines of a `line_ranges` sequence of (start_line, end_line) are
+    kept and the query text is read only up to the last of these lines.
+    """
+    __slots__ = (
+        'tokens_by_line',
+    )
+
+    def __init__(self, location=None, query_string=None, idx=None, line_ranges=()):
+        assert location or query_string
+        assert idx
+        dictionary_get = idx.dictionary.get
+
+        kept_lines = set()
+        for start_line, end_line in line_ranges:
+            kept_lines.update(xrange(start_line, end_line + 1))
+        last_line = kept_lines and max(kept_lines) or 0
+
+        # mapping of line number -> list of (value, is_text, pos) tuples for
+        # every token or non-token of the kept lines where pos is -1 for
+        # non-tokens and unknown tokens. Lines start at one.
+        self.tokens_by_line = tokens_by_line = {}
+
+        pos = -1
+        lines = query.query_lines(location, query_string, strip=False)
+        for line_num, line in enumerate(lines, 1):
+            if line_num > last_line:
+                break
+            keep = line_num in kept_lines
+            line_tokens = []
+            for is_text, token in tokenize.matched_query_text_tokenizer(line):
+                if is_text and dictionary_get(token.lower()) is not None:
+                    pos += 1
+                    if keep:
+                        line_tokens.append((token, is_text, pos))
+                elif keep:
+                    line_tokens.append((token, is_text, -1))
+            if keep:
+                tokens_by_line[line_num] = line_tokens
+
+    def matched_text(self, match, whole_lines=False,
+                     highlight_matched=u'%s', highlight_not_matched=u'[%s]'):
+        """
+        Yield unicode strings corresponding to the full matched query text for
+        a `match` LicenseMatch. See get_full_matched_text() for details.
+        """
+        # only consider the tokens within the matched lines
+        tokens_by_line = self.tokens_by_line
+        tokens = []
+        for line_num in xrange(max(match.start_line, 1), match.end_line + 1):
+            line_tokens = tokens_by_line.get(line_num)
+            if line_tokens is None:
+                # past the last line of the query text
+                break
+            tokens.extend(line_tokens)
+        if not tokens:
+            return
+
+        start = 0
+        end = len(tokens)
+        if not whole_lines:
+            # only consider the tokens from the first to the last matched
+            # positions
+            qspan = match.qspan
+            qstart = qspan.start
+            qend = qspan.end
+            start = None
+            for i, (_value, _is_text, pos) in enumerate(tokens):
+                if pos == qstart:
+                    start = i
+                if pos == qend:
+                    end = i + 1
+                    break
+            if start is None:
+                return
+
+        matched_positions = set(match.qspan)
+        # Finally yield strings with eventual highlightings
+        for value, is_text, pos in tokens[start:end]:
+            if is_text:
+                if pos in matched_positions:
+                    yield highlight_matched % value
+                else:
+                    yield highlight_not_matched % value
             else:
-                yield highlight_not_matched % token.value
-        else:
-            # punctuation
-            yield token.value
+                # punctuation
+                yield value
 
 
 ########################################################################
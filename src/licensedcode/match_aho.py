@@ -25,6 +25,7 @@
 from __future__ import print_function, absolute_import, division
 
 from array import array
+import sys
 
 import ahocorasick
 
@@ -63,13 +64,38 @@ def get_automaton():
     return ahocorasick.Automaton(ahocorasick.STORE_ANY)
 
 
+def encode_tids(tids):
+    """
+    Return a byte string encoding a sequence of integer token ids `tids` where
+    each token id is encoded as the UTF-8 bytes of a single code point.
+
+    UTF-8 is self-synchronizing: the first byte of an encoded token id cannot be
+    mistaken for any other byte of another token id. Therefore the bytes-based
+    automaton can only match whole sequences of token ids.
+
+    For example:
+    >>> encode_tids([1, 200, 3000])
+    '\\x01\\xc3\\x88\\xe0\\xae\\xb8'
+    >>> encode_tids([])
+    ''
+    """
+    # this is the same as u''.join(map(unichr, tids)).encode('utf-8'), only
+    # faster as the conversion is done in bulk by the array and codecs modules
+    return array(b'I', tids).tostring().decode(_utf32).encode('utf-8')
+
+
+# array('I') is made of native 32 bits integers that can be decoded as UTF-32
+_utf32 = sys.byteorder == 'little' and 'utf-32-le' or 'utf-32-be'
+assert array(b'I').itemsize == 4
+
+
 def add_sequence(automaton, tids, rid, start=0):
     """
     Add the `tids` sequence of token ids for the `rid` Rule id starting at `start`
     position to the an Aho-Corasick `automaton`.
     """
     end = len(tids) - 1
-    tokens = array('h', tids).tostring()
+    tokens = encode_tids(tids)
     existing = automaton.get(tokens, None)
     # the value for a trie key is a set of tuples (rule id, start position, end position)
     value = rid, start, start + end
@@ -101,39 +127,33 @@ def exact_match(idx, query_run, automaton):
     query_run_matchables = query_run.matchables
     query = query_run.query
 
-    qtokens_as_str = array('h', qtokens).tostring()
+    qtokens_as_str = encode_tids(qtokens)
     matches = []
 
+    # The automaton returns the end of a match as a byte offset in the encoded
+    # tokens string: track the corresponding token position incrementally since
+    # matches are returned by increasing end offsets.
+    previous_qend = -1
+    real_qend = -1
+
     # iterate over matched strings: the matched value is (rule id, index start pos, index end pos)
     for qend, matched_rule_segments in automaton.iter(qtokens_as_str):
 
+        if qend != previous_qend:
+            # count the tokens between the previous and current match ends
+            real_qend += len(qtokens_as_str[previous_qend + 1:qend + 1].decode('utf-8'))
+            previous_qend = qend
+
         for rid, istart, iend in matched_rule_segments:
             rule = rules_by_rid[rid]
             if TRACE_DEEP: logger_debug('   #exact_AHO: found match to rule:', rule.identifier)
 
-            ################################
-            # FIXME: use a trie of ints or a trie or Unicode characters to avoid this shenaningan
-            ################################
-            # Since the Tries stores bytes and we have two bytes per tokenid, the
-            # real end must be adjusted
-            real_qend = (qend - 1) / 2
-            # ... and there is now a real possibility of a false match.
-            # For instance say we have these tokens :
-            #   gpl encoded as 0012 and lgpl encoded as 1200 and mit as 2600
-            # And if we scan this "mit lgpl" we get this encoding 2600 1200.
-            # The automaton will find a matched string  of 0012 to gpl in the middle
-            # matching falsely so we check that the corrected end qposition
-            # must be always an integer.
-            real_qend_int = int(real_qend)
-            if real_qend != real_qend_int:
-                if TRACE: logger_debug('   #exact_AHO: real_qend != int(real_qend), discarding rule match:', rule.identifier)
-                continue
-
             match_len = iend + 1 - istart
             matcher = match_len == rule.length and MATCH_AHO_EXACT or MATCH_AHO_FRAG
 
-            real_qend = real_qend_int
-            qposses = range(qbegin + real_qend - match_len + 1, qbegin + real_qend + 1)
+            match_qend = qbegin + real_qend
+            match_qstart = match_qend - match_len + 1
+            qposses = xrange(match_qstart, match_qend + 1)
 
             if any(p not in query_run_matchables for p in qposses):
                 if TRACE: logger_debug(
@@ -142,8 +162,8 @@ def exact_match(idx, query_run, automaton):
                     rule.identifier)
                 continue
 
-            qspan = Span(qposses)
-            ispan = Span(range(istart, iend + 1))
+            qspan = Span(match_qstart, match_qend)
+            ispan = Span(istart, iend)
 
             itokens = idx.tids_by_rid[rid]
             hispan = Span(p for p in ispan if itokens[p] >= len_junk)
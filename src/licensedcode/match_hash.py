@@ -85,8 +85,8 @@ def hash_match(idx, query_run):
         itokens = idx.tids_by_rid[rid]
         len_junk = idx.len_junk
         logger_debug('match_hash: Match:', rule.identifier)
-        qspan = Span(range(query_run.start, query_run.end + 1))
-        ispan = Span(range(0, rule.length))
+        qspan = Span(query_run.start, query_run.end)
+        ispan = Span(0, rule.length - 1)
         hispan = Span(p for p in ispan if itokens[p] >= len_junk)
         match = LicenseMatch(rule, qspan, ispan, hispan, query_run.start, matcher=MATCH_HASH, query=query_run.query)
         matches.append(match)
@@ -0,0 +1,196 @@
+#
+# Copyright (c) 2017 nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/nexB/scancode-toolkit/
+# The ScanCode software is licensed under the Apache License version 2.0.
+# Data generated with ScanCode require an acknowledgment.
+# ScanCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with ScanCode or any ScanCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with ScanCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  ScanCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  ScanCode is a free software code scanning tool from nexB Inc. and others.
+#  Visit https://github.com/nexB/scancode-toolkit/ for support and download.
+
+from __future__ import absolute_import
+from __future__ import division
+from __future__ import print_function
+
+from array import array
+from collections import defaultdict
+from itertools import imap
+from random import Random
+
+from intbitset import intbitset
+
+from commoncode.dict_utils import sparsify
+
+"""
+Candidate rules selection using MinHash signatures and Locality Sensitive
+Hashing (LSH).
+
+This is an optional pre-filter used before the token sets candidates ranking of
+match_set.compute_candidates() for long query runs: rather than comparing the
+token sets of a query run with the token sets of every rule, we only compare
+them with the rules that share at least one LSH bucket with the query run.
+
+The "shingles" of a rule or query run are its unique high token ids: each high
+token is a 1-shingle. Low tokens are too common to tell rules apart and
+candidates are only worth ranking if they share some high tokens with a query
+run. Longer shingles are not used as they are easily broken by the small edits
+found in modified license texts.
+
+A MinHash signature is a list of `bands * rows` minimum values of the high token
+ids of a rule, each computed after a different random permutation of all the
+token ids. The probability that two sets have the same minimum value for a
+permutation is their Jaccard similarity. The signature is split in `bands` bands
+of `rows` values and each band is hashed in a bucket: two sets share a bucket
+with a probability that is high above a similarity of about (1/bands)^(1/rows)
+and low below.
+
+A rule found in a long query run shares only a few of the high tokens of this
+whole run: the signatures are computed for overlapping windows of the query run
+high tokens instead, such that a window about as long as a rule is similar to
+this rule.
+
+Computing the signatures of a query run costs the same regardless of the number
+of rules and each bucket lookup is a dictionary lookup: the cost of candidates
+selection does not grow with the number of rules but only with the number of
+rules actually returned.
+
+Note that a rule with very few high tokens is rarely similar enough to a window
+to be returned: these rules are still matched exactly with the automaton.
+"""
+
+# Set to True for tracing
+TRACE = False
+
+
+def logger_debug(*args): pass
+
+
+if TRACE:
+    import logging
+    import sys
+
+    logger = logging.getLogger(__name__)
+    # logging.basicConfig(level=logging.DEBUG, stream=sys.stdout)
+    logging.basicConfig(stream=sys.stdout)
+    logger.setLevel(logging.DEBUG)
+
+    def logger_debug(*args):
+        return logger.debug(' '.join(isinstance(a, basestring) and a or repr(a) for a in args))
+
+
+# number of bands and rows per band of a signature: a rule and a query run
+# sharing about 25% of their high tokens are likely to share a bucket.
+LSH_BANDS = 16
+LSH_ROWS = 2
+
+# number of high tokens of the windows of a query run that are compared with
+# the rules: a rule contained in a long query run has few tokens in common with
+# this whole run but many with a window of a similar length.
+LSH_WINDOW = 50
+
+# seed of the random permutations of token ids such that the signatures of the
+# same rules are the same across index builds
+LSH_SEED = 42
+
+
+class MinHashLSH(object):
+    """
+    An index of MinHash signatures of rule high token ids sets in LSH buckets.
+    """
+
+    def __init__(self, len_tokens, bands=LSH_BANDS, rows=LSH_ROWS, seed=LSH_SEED):
+        self.bands = bands
+        self.rows = rows
+
+        # list of random permutations of the token ids as arrays where the
+        # index is a token id and the value its permuted value
+        random = Random(seed)
+        self.permutations = []
+        for _ in range(bands * rows):
+            permutation = range(len_tokens)
+            random.shuffle(permutation)
+            self.permutations.append(array(b'h', permutation))
+
+        # list of one mapping per band of {band values tuple: [rid, ...]}
+        self.buckets = [defaultdict(list) for _ in range(bands)]
+
+        # set of the indexed rids
+        self.rids = intbitset()
+
+    def signature(self, tids):
+        """
+        Return a MinHash signature list for a non-empty `tids` token ids set.
+        """
+        return [min(imap(permutation.__getitem__, tids))
+                for permutation in self.permutations]
+
+    def bands_keys(self, tids):
+        """
+        Yield a (band number, band values tuple) for each band of the signature
+        of a non-empty `tids` token ids set.
+        """
+        signature = self.signature(tids)
+        rows = self.rows
+        for band in range(self.bands):
+            start = band * rows
+            yield band, tuple(signature[start:start + rows])
+
+    def add(self, rid, tids):
+        """
+        Add the rule with `rid` and a non-empty `tids` high token ids set.
+        """
+        buckets = self.buckets
+        for band, key in self.bands_keys(tids):
+            buckets[band][key].append(rid)
+        self.rids.add(rid)
+
+    def optimize(self):
+        """
+        Finalize this index once all the rules have been added.
+        """
+        self.buckets = [dict(bucket) for bucket in self.buckets]
+        for bucket in self.buckets:
+            # sparser dicts for faster lookup
+            sparsify(bucket)
+
+    def candidates(self, tids, window=LSH_WINDOW):
+        """
+        Return an intbitset of the indexed rids that share at least one bucket with
+        the high token ids set of any window of `window` consecutive tids of a
+        `tids` high token ids sequence. Consecutive windows overlap by half.
+        """
+        rids = intbitset()
+        buckets = self.buckets
+        step = max(1, window // 2)
+        for start in range(0, max(1, len(tids) - step), step):
+            window_tids = set(tids[start:start + window])
+            if not window_tids:
+                continue
+            for band, key in self.bands_keys(window_tids):
+                band_rids = buckets[band].get(key)
+                if band_rids:
+                    rids.update(band_rids)
+        if TRACE: logger_debug('MinHashLSH.candidates:', len(rids))
+        return rids
+
+
+def query_run_high_tids(query_run):
+    """
+    Return a list of the high matchable token ids of a `query_run` in sequence.
+    """
+    high_matchables = query_run.high_matchables
+    return [tid for pos, tid in query_run.tokens_with_pos() if pos in high_matchables]
@@ -78,7 +78,6 @@ def match_sequence(idx, candidate, query_run, start_offset=0):
 
     matches = []
     qstart = qbegin
-    qlen = len(query_run)
 
     # match as long as long we find alignments and have high matchable tokens
     # this allows to find repeated instances of the same rule in the query run
@@ -87,6 +86,7 @@ def match_sequence(idx, candidate, query_run, start_offset=0):
     while qstart <= qfinish:
         if not query_run_matchables:
             break
+        qlen = qfinish - qstart + 1
         block_matches = match_blocks(qtokens, itokens, qstart, qlen, high_postings, len_junk, query_run_matchables)
         if not block_matches:
             break
@@ -101,10 +101,9 @@ def match_sequence(idx, candidate, query_run, start_offset=0):
         # create one match for each matching block: this not entirely correct
         # but this will be sorted out at LicenseMatch merging and filtering time
         for qpos, ipos, mlen in block_matches:
-            qspan = Span(range(qpos, qpos + mlen))
-            iposses = range(ipos, ipos + mlen)
-            hispan = Span(p for p in iposses if itokens[p] >= len_junk)
-            ispan = Span(iposses)
+            qspan = Span(qpos, qpos + mlen - 1)
+            hispan = Span(p for p in xrange(ipos, ipos + mlen) if itokens[p] >= len_junk)
+            ispan = Span(ipos, ipos + mlen - 1)
             match = LicenseMatch(rule, qspan, ispan, hispan, qbegin, matcher=MATCH_SEQ, query=query)
             if TRACE2:
                 qt, it = get_texts(
@@ -33,8 +33,6 @@ from intbitset import intbitset
 
 from commoncode.dict_utils import sparsify
 
-from licensedcode.models import Rule
-
 """
 Approximate matching strategies using token sets and multisets.
 
@@ -254,23 +252,31 @@ def compute_candidates(query_run, idx, rules_subset, top=30):
     qlow, qhigh = qlows, qhighs
     sets_by_rid = idx.tids_sets_by_rid
     intersector, counter = tids_sets_intersector, tids_set_counter
-    thresholds_getter = Rule.thresholds_unique
+    thresholds_by_rid = idx.thresholds_unique_by_rid
 
     # perform two steps of matching:
     # step one with sets and step two multisets for refinements
     for step in 'sets', 'multisets':
         if TRACE_ULTRA_DEEP: logger_debug('compute_candidates: STEP:', step)
         sortable_candidates = []
+        is_sets_step = step == 'sets'
 
         for rid, rule, _intersection in candidates:
             ilow, ihigh = sets_by_rid[rid]
+            thresholds = thresholds_by_rid[rid]
+            # most rules do not share enough high tokens with a query run: skip
+            # these early using only the precomputed integer thresholds
+            if is_sets_step:
+                high_inter_len = len(qhigh & ihigh)
+                if not high_inter_len or high_inter_len < thresholds.min_high:
+                    continue
+
             if TRACE_ULTRA_DEEP:
                 logger_debug('candidate: qlow:', [(idx.tokens_by_tid[tid], val) for tid, val in enumerate(qlow)])
                 logger_debug('candidate: ilow:', [(idx.tokens_by_tid[tid], val) for tid, val in enumerate(ilow)])
                 logger_debug('candidate: qhigh:', [(idx.tokens_by_tid[tid], val) for tid, val in enumerate(qhigh, idx.len_junk)])
                 logger_debug('candidate: ihigh:', [(idx.tokens_by_tid[tid], val) for tid, val in enumerate(ihigh, idx.len_junk)])
 
-            thresholds = thresholds_getter(rule)
             if TRACE_DEEP:
                 compared = compare_sets(qhigh, qlow, ihigh, ilow, thresholds, intersector, counter, rule, idx)
             else:
@@ -299,7 +305,7 @@ def compute_candidates(query_run, idx, rules_subset, top=30):
         qlow, qhigh = qlowms, qhighms
         sets_by_rid = idx.tids_msets_by_rid
         intersector, counter = tids_multisets_intersector, tids_multiset_counter
-        thresholds_getter = Rule.thresholds
+        thresholds_by_rid = idx.thresholds_by_rid
 
     if TRACE and candidates:
         logger_debug('compute_candidates: FINAL top candidates:', len(candidates))
@@ -308,7 +314,8 @@ def compute_candidates(query_run, idx, rules_subset, top=30):
 
     # discard false positive rules from candidates: we never want to run
     # a sequence match on these
-    candidates = [(rid, rule, inter) for (rid, rule, inter) in candidates if not rule.false_positive]
+    false_positive_rids = idx.false_positive_rids
+    candidates = [(rid, rule, inter) for (rid, rule, inter) in candidates if rid not in false_positive_rids]
 
     return candidates
 
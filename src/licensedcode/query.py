@@ -26,7 +26,9 @@
 from __future__ import absolute_import
 from __future__ import print_function
 
+from bisect import bisect_left
 from collections import defaultdict
+from itertools import chain
 
 from intbitset import intbitset
 
@@ -35,6 +37,7 @@ import typecode
 from licensedcode.spans import Span
 from licensedcode.tokenize import query_lines
 from licensedcode.tokenize import query_tokenizer
+from licensedcode.tokenize import query_multilines_tokenizer
 
 """
 Build license queries from scanned files to feed the detection pipeline.
@@ -98,9 +101,20 @@ if TRACE:
         return logger.debug(' '.join(isinstance(a, basestring) and a or repr(a) for a in args))
 
 
-def build_query(location=None, query_string=None, idx=None):
+# Maximum size in characters of the text of a query window. Files larger than
+# this size in bytes are tokenized and matched in windows of bounded size.
+QUERY_WINDOW_SIZE = 10 * 1024 * 1024
+
+# Number of lines shared by two consecutive query windows. Licenses shorter
+# than half this number of lines are always found whole in one window.
+QUERY_WINDOW_OVERLAP = 4000
+
+
+def build_query(location=None, query_string=None, idx=None, prefilter=False):
     """
     Return a Query built from location or query string given an index.
+    If `prefilter` is True, the Query is left empty if no rule of the index can
+    possibly match it.
     """
     if location:
         T = typecode.get_type(location)
@@ -110,17 +124,91 @@ def build_query(location=None, query_string=None, idx=None):
         if T.is_binary:
             # for binaries we want to avoid a large number of query runs as the
             # license context is often very sparse or absent
-            qry = Query(location=location, idx=idx, line_threshold=1000)
+            qry = Query(location=location, idx=idx, line_threshold=1000, prefilter=prefilter)
         else:
             # for text
-            qry = Query(location=location, idx=idx, line_threshold=80)
+            qry = Query(location=location, idx=idx, line_threshold=80, prefilter=prefilter)
     else:
         # a string is always considered text
-        qry = Query(query_string=query_string, idx=idx)
+        qry = Query(query_string=query_string, idx=idx, prefilter=prefilter)
 
     return qry
 
 
+def query_windows(location, idx, window_size=QUERY_WINDOW_SIZE,
+                  overlap=QUERY_WINDOW_OVERLAP, prefilter=False):
+    """
+    Yield tuples of (Query, start_line, start_pos, own_start_line,
+    own_end_line) for each window of the file at `location` given an `idx`
+    index. The file lines are read and tokenized lazily, one window at a time.
+
+    Each window Query is built from consecutive lines whose text is up to about
+    `window_size` characters. Consecutive windows overlap by up to `overlap`
+    lines. Line numbers and positions of a window Query are relative to the
+    window: `start_line` is the absolute number of the first line of the window
+    and `start_pos` is the absolute position of its first known token, such
+    that absolute positions match a Query built from the whole file.
+
+    The overlapping lines are split between two consecutive windows: a window
+    "owns" the lines from `own_start_line` to `own_end_line` (None for the last
+    window) and a match should be kept only from the window that owns the line
+    where this match starts. A match shorter than half the `overlap` lines that
+    starts in a window owned lines is always entirely contained in this window.
+
+    If `prefilter` is True, the Query of a window is left empty if no rule of
+    the index can possibly match it. See build_query().
+    """
+    T = typecode.get_type(location)
+    if not T.contains_text:
+        return
+    # see build_query() for these thresholds
+    line_threshold = 1000 if T.is_binary else 80
+
+    start_line = 1
+    start_pos = 0
+    own_start_line = 1
+
+    window = []
+    window_append = window.append
+    size = 0
+
+    for line in query_lines(location, strip=False):
+        window_append(line)
+        size += len(line)
+        if size < window_size:
+            continue
+
+        # the window is full: lines at the end will be shared with the next
+        carried = min(overlap, len(window) // 2)
+        own_end_line = start_line + len(window) - 1 - carried // 2
+        qry = Query(location=window, idx=idx, line_threshold=line_threshold, prefilter=prefilter)
+        yield qry, start_line, start_pos, own_start_line, own_end_line
+
+        # relative line number of the first carried line and the count of
+        # known tokens before this line
+        first_carried_line = len(window) - carried + 1
+        if qry.tokens or not prefilter:
+            start_pos += bisect_left(qry.line_by_pos, first_carried_line)
+        else:
+            # a prefiltered query has no positions: count the known tokens
+            dictionary = idx.dictionary
+            start_pos += sum(1 for token in query_multilines_tokenizer(window[:first_carried_line - 1])
+                             if token in dictionary)
+        start_line += len(window) - carried
+        own_start_line = own_end_line + 1
+
+        window = window[len(window) - carried:]
+        window_append = window.append
+        size = sum(len(l) for l in window)
+        del qry
+
+    # a window without new lines is still needed for the carried lines that
+    # are not owned by the previous window
+    if window:
+        qry = Query(location=window, idx=idx, line_threshold=line_threshold, prefilter=prefilter)
+        yield qry, start_line, start_pos, own_start_line, None
+
+
 class Query(object):
     """
     A query represent a whole file or string being scanned for licenses. It holds
@@ -147,13 +235,17 @@ class Query(object):
     )
 
     def __init__(self, location=None, query_string=None, idx=None,
-                 line_threshold=4, _test_mode=False, tokenizer=query_tokenizer):
+                 line_threshold=4, _test_mode=False, tokenizer=query_tokenizer,
+                 prefilter=False):
         """
         Initialize the query from a file `location` or `query_string` string for an
         `idx` LicenseIndex.
 
         Break query in runs when there are at least `line_threshold` empty lines or
         junk-only lines.
+
+        If `prefilter` is True, the query is left empty without further processing
+        when its text has none of the `idx` required tokens: no rule can match.
         """
         assert (location or query_string) and idx
 
@@ -184,7 +276,7 @@ class Query(object):
         if _test_mode:
             return
 
-        self.tokenize_and_build_runs(self.tokens_by_line(tokenizer=tokenizer), line_threshold=line_threshold)
+        self.tokenize_and_build_runs(self.tokens_by_line(tokenizer=tokenizer, prefilter=prefilter), line_threshold=line_threshold)
 
         # sets of integers initialized after query tokenization
         len_junk = idx.len_junk
@@ -227,11 +319,14 @@ class Query(object):
             for _ in range(unknowns[pos]):
                 yield None
 
-    def tokens_by_line(self, tokenizer=query_tokenizer):
+    def tokens_by_line(self, tokenizer=query_tokenizer, prefilter=False):
         """
         Yield one sequence of tokens for each line in this query.
         Populate the query `line_by_pos`, `unknowns_by_pos`, `unknowns_by_pos` and
         `shorts_and_digits_pos` as a side effect.
+
+        If `prefilter` is True, do not yield anything if the query text has none
+        of the index required tokens.
         """
         # bind frequently called functions to local scope
         line_by_pos_append = self.line_by_pos.append
@@ -241,36 +336,53 @@ class Query(object):
         self_shorts_and_digits_pos_add = self.shorts_and_digits_pos.add
         dic_get = self.idx.dictionary.get
 
-        # note: positions start at zero
-        # this is the absolute position, including the unknown tokens
-        abs_pos = -1
-        # lines start at one
-        line_start = 1
+        lines = query_lines(self.location, self.query_string)
+        if tokenizer is query_tokenizer:
+            # tokenize the whole text at once
+            tokens = query_multilines_tokenizer(lines)
+            if prefilter and self.idx.required_tokens.isdisjoint(tokens):
+                # no rule can match: skip the costly processing of each token
+                self.unknowns_span = Span()
+                return
+        else:
+            tokens = chain.from_iterable(
+                chain(tokenizer(line), ['\n']) for line in lines)
 
+        # note: positions start at zero
         # this is a relative position, excluding the unknown tokens
         known_pos = -1
 
+        # lines start at one
+        lnum = 1
+
         started = False
-        for lnum, line  in enumerate(query_lines(self.location, self.query_string), line_start):
-            line_tokens = []
-            line_tokens_append = line_tokens.append
-            for abs_pos, token in enumerate(tokenizer(line), abs_pos + 1):
-                tid = dic_get(token)
-                if tid is not None:
-                    known_pos += 1
-                    started = True
-                    line_by_pos_append(lnum)
-                    if len(token) == 1 or token.isdigit():
-                        self_shorts_and_digits_pos_add(known_pos)
+        line_tokens = []
+        line_tokens_append = line_tokens.append
+        for token in tokens:
+            tid = dic_get(token)
+            if tid is not None:
+                known_pos += 1
+                started = True
+                line_by_pos_append(lnum)
+                if len(token) == 1 or token.isdigit():
+                    self_shorts_and_digits_pos_add(known_pos)
+
+            elif token == '\n':
+                # end of line
+                yield line_tokens
+                lnum += 1
+                line_tokens = []
+                line_tokens_append = line_tokens.append
+                continue
+
+            else:
+                # we have not yet started
+                if not started:
+                    self_unknowns_by_pos[-1] += 1
                 else:
-                    # we have not yet started
-                    if not started:
-                        self_unknowns_by_pos[-1] += 1
-                    else:
-                        self_unknowns_by_pos[known_pos] += 1
-                        unknowns_pos_add(known_pos)
-                line_tokens_append(tid)
-            yield line_tokens
+                    self_unknowns_by_pos[known_pos] += 1
+                    unknowns_pos_add(known_pos)
+            line_tokens_append(tid)
 
         # finally create a Span of positions followed by unknwons, used
         # for intersection with the query span for scoring matches
@@ -298,7 +410,7 @@ class Query(object):
         pos = 0
 
         # bind frequently called functions to local scope
-        tokens_append = self.tokens.append
+        tokens_extend = self.tokens.extend
         query_runs_append = self.query_runs.append
 
         for tokens in tokens_by_line:
@@ -312,27 +424,16 @@ class Query(object):
             if len(query_run) == 0:
                 query_run.start = pos
 
-            if not tokens:
+            known_tokens = [tid for tid in tokens if tid is not None]
+            if not known_tokens:
                 empty_lines += 1
                 continue
 
-            line_has_known_tokens = False
-            line_has_good_tokens = False
-
-            for token_id in tokens:
-                if token_id is not None:
-                    tokens_append(token_id)
-                    line_has_known_tokens = True
-                    if token_id >= len_junk:
-                        line_has_good_tokens = True
-                    query_run.end = pos
-                    pos += 1
-
-            if not line_has_known_tokens:
-                empty_lines += 1
-                continue
+            tokens_extend(known_tokens)
+            pos += len(known_tokens)
+            query_run.end = pos - 1
 
-            if line_has_good_tokens:
+            if max(known_tokens) >= len_junk:
                 empty_lines = 0
             else:
                 empty_lines += 1
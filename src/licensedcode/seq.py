@@ -122,7 +122,7 @@ def match_blocks(a, b, starta, lena, b2j, len_junk, matchables=frozenset()):
     # need to look at and append partial results to matching_blocks in a loop.
     # The matches are sorted at the end.
 
-    queue = [(starta, lena, 0, len(b))]
+    queue = [(starta, starta + lena, 0, len(b))]
     queue_append = queue.append
     queue_pop = queue.pop
     matching_blocks = []
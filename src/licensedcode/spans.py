@@ -31,17 +31,24 @@ from __future__ import absolute_import
 from __future__ import division
 from __future__ import print_function
 
+from bisect import bisect_right
 from collections import Set
+from itertools import chain
 from itertools import count
 from itertools import groupby
+from sys import maxint
 
 from intbitset import intbitset
 
 """
-Ranges and intervals of integers using bitmaps.
+Ranges and intervals of integers using bitmaps or run-length intervals.
 Used as a compact and faster data structure for token and position sets.
 """
 
+# Maximum number of (start, end) intervals of a run-length Span. Spans with
+# more intervals than this are stored as an intbitset instead.
+MAX_RANGES = 16
+
 
 class Span(Set):
     """
@@ -49,6 +56,13 @@ class Span(Set):
     A Span is hashable and not meant to be modified once created, like a frozenset.
     It is equivalent to a sparse closed interval.
     Originally derived and heavily modified from Whoosh Span.
+
+    A Span is stored either as a short tuple of sorted, non-touching and
+    non-overlapping (start, end) closed intervals or as an intbitset. The
+    run-length representation is used automatically for contiguous or nearly
+    contiguous spans (the common case for matched token positions) and avoids
+    materializing every position. An intbitset is used for sparse spans and is
+    otherwise only built on demand.
     """
 
     def __init__(self, *args):
@@ -99,56 +113,176 @@ class Span(Set):
         True
         >>> hash(Span([5, 6, 7, 8, 9, 10 ,11, 12])) == hash(Span(5, 12))
         True
+
+        Contiguous spans use run-length intervals and sparse spans a bitset, but
+        both behave the same:
+        >>> Span(5, 12)._ranges
+        ((5, 12),)
+        >>> Span([1, 3, 5])._ranges is None
+        True
+        >>> Span([1, 3, 5]) | Span(2) == Span(1, 3) | Span(5)
+        True
+        >>> Span(3, 2) == Span()
+        True
+        >>> len(Span(3, 2))
+        0
         """
+        # either a tuple of (start, end) intervals or None for a bitset Span
+        self._ranges = None
+        # an intbitset, always set for a bitset Span and built lazily for a
+        # run-length Span
+        self._bitset = None
+        # the length of a run-length Span
+        self._len = 0
+
         len_args = len(args)
 
         if len_args == 0:
-            self._set = intbitset()
+            self._ranges = ()
 
         elif len_args == 1:
             # args0 is a single int or an iterable of ints
-            if isinstance(args[0], (int, long)):
-                self._set = intbitset(args)
+            arg = args[0]
+            if isinstance(arg, (int, long)):
+                self._ranges = ((arg, arg),)
+                self._len = 1
+            elif isinstance(arg, Span):
+                self._ranges = arg._ranges
+                self._bitset = arg._bitset
+                self._len = arg._len
+            elif isinstance(arg, intbitset):
+                # copy: the caller may later modify its bitset
+                self._set_bitset(intbitset(arg))
             else:
                 # some sequence or iterable
-                self._set = intbitset(list(args[0]))
+                self._set_bitset(intbitset(list(arg)))
 
         elif len_args == 2:
             # args0 and args1 describe a start and end closed range
-            self._set = intbitset(range(args[0], args[1] + 1))
+            start, end = args
+            if start <= end:
+                self._ranges = ((start, end),)
+                self._len = end - start + 1
+            else:
+                self._ranges = ()
 
         else:
             # args0 is a single int or args is an iterable of ints
             # args is an iterable of ints
-            self._set = intbitset(list(args))
+            self._set_bitset(intbitset(list(args)))
+
+    def _set_bitset(self, bitset):
+        """
+        Initialize this span from an intbitset, using a run-length
+        representation if the bitset is contiguous.
+        """
+        self._bitset = bitset
+        if bitset:
+            start = bitset[0]
+            end = bitset[-1]
+            length = len(bitset)
+            if length == end - start + 1:
+                self._ranges = ((start, end),)
+                self._len = length
+        else:
+            self._ranges = ()
+
+    @classmethod
+    def _from_bitset(cls, bitset):
+        """
+        Return a new Span built from an intbitset owned by this Span and that
+        is therefore not copied.
+        """
+        span = cls()
+        span._ranges = None
+        span._set_bitset(bitset)
+        return span
+
+    @classmethod
+    def _from_ranges(cls, ranges):
+        """
+        Return a new Span built from a list of sorted, non-touching and
+        non-overlapping (start, end) intervals.
+        """
+        span = cls()
+        if len(ranges) <= MAX_RANGES:
+            span._ranges = tuple(ranges)
+            span._len = sum(end - start + 1 for start, end in ranges)
+        else:
+            span._ranges = None
+            span._bitset = intbitset(list(chain.from_iterable(
+                xrange(start, end + 1) for start, end in ranges)))
+        return span
+
+    @property
+    def _set(self):
+        """
+        Return an intbitset of the integers of this span.
+        """
+        bitset = self._bitset
+        if bitset is None:
+            bitset = self._bitset = intbitset(list(self))
+        return bitset
 
     @classmethod
     def _from_iterable(cls, it):
         return cls(list(it))
 
     def __len__(self):
-        return len(self._set)
+        if self._ranges is not None:
+            return self._len
+        return len(self._bitset)
 
     def __iter__(self):
-        return iter(self._set)
+        ranges = self._ranges
+        if ranges is None:
+            return iter(self._bitset)
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            return iter(xrange(start, end + 1))
+        return chain.from_iterable(xrange(start, end + 1) for start, end in ranges)
 
     def __hash__(self):
-        return hash(tuple(self._set))
+        return hash(tuple(self))
 
     def __eq__(self, other):
+        if not isinstance(other, Span):
+            return False
+        if self._ranges is not None and other._ranges is not None:
+            return self._ranges == other._ranges
         return self._set == other._set
 
     def __and__(self, *others):
-        return Span(self._set.intersection(*(o._set for o in others)))
+        if self._ranges is not None and all(o._ranges is not None for o in others):
+            ranges = self._ranges
+            for other in others:
+                ranges = intersect_ranges(ranges, other._ranges)
+            return Span._from_ranges(ranges)
+        return Span._from_bitset(self._set.intersection(*(o._set for o in others)))
 
     def __or__(self, *others):
-        return Span(self._set.union(*(o._set for o in others)))
+        if self._ranges is not None and all(o._ranges is not None for o in others):
+            return Span._from_ranges(union_ranges(
+                chain(self._ranges, *(o._ranges for o in others))))
+        return Span._from_bitset(self._set.union(*(o._set for o in others)))
 
     def union(self, *others):
         return self.__or__(*others)
 
     def difference(self, other):
-        return self._set.difference(other._set)
+        """
+        Return a new Span with the items of this span that are not in the
+        other span.
+
+        For example:
+        >>> Span(1, 10).difference(Span(3, 4) | Span(8, 12))
+        Span(1, 2)|Span(5, 7)
+        >>> Span([1, 3, 5]).difference(Span(3))
+        Span(1)|Span(5)
+        """
+        if self._ranges is not None and other._ranges is not None:
+            return Span._from_ranges(difference_ranges(self._ranges, other._ranges))
+        return Span._from_bitset(self._set.difference(other._set))
 
     def __repr__(self):
         """
@@ -192,12 +326,20 @@ class Span(Set):
         True
         >>> set([9]) in Span([4, 8])
         False
+        >>> Span(6, 7) | Span(10) in Span(1, 7) | Span(9, 12)
+        True
+        >>> Span(6, 8) in Span(1, 7) | Span(9, 12)
+        False
         """
         if isinstance(other, Span):
-            return self._set.issuperset(other._set)
+            return self.issuperset(other)
+
+        ranges = self._ranges
 
         if isinstance(other, (int, long)):
-            return self._set.__contains__(other)
+            if ranges is not None:
+                return contains_int(ranges, other)
+            return self._bitset.__contains__(other)
 
         if isinstance(other, (set, frozenset)):
             return self._set.issuperset(intbitset(other))
@@ -206,22 +348,40 @@ class Span(Set):
             return self._set.issuperset(other)
 
     def issubset(self, other):
-        return self._set.issubset(other._set)
+        return other.issuperset(self)
 
     def issuperset(self, other):
+        ranges = self._ranges
+        other_ranges = other._ranges
+        if ranges is not None and other_ranges is not None:
+            for start, end in other_ranges:
+                i = bisect_right(ranges, (start, maxint)) - 1
+                if i < 0 or ranges[i][1] < end:
+                    return False
+            return True
         return self._set.issuperset(other._set)
 
     @property
     def start(self):
-        if not self._set:
+        ranges = self._ranges
+        if ranges is not None:
+            if not ranges:
+                raise TypeError('Empty Span has no start.')
+            return ranges[0][0]
+        if not self._bitset:
             raise TypeError('Empty Span has no start.')
-        return self._set[0]
+        return self._bitset[0]
 
     @property
     def end(self):
-        if not self._set:
+        ranges = self._ranges
+        if ranges is not None:
+            if not ranges:
+                raise TypeError('Empty Span has no end.')
+            return ranges[-1][1]
+        if not self._bitset:
             raise TypeError('Empty Span has no end.')
-        return self._set[-1]
+        return self._bitset[-1]
 
     @classmethod
     def sort(cls, spans):
@@ -276,7 +436,7 @@ class Span(Set):
         >>> Span([0]).magnitude()
         1
         """
-        if not self._set:
+        if not self:
             return 0
         return self.end - self.start + 1
 
@@ -297,7 +457,7 @@ class Span(Set):
         >>> Span().density()
         0
         """
-        if not self._set:
+        if not self:
             return 0
         return len(self) / self.magnitude()
 
@@ -318,19 +478,25 @@ class Span(Set):
         1
         >>> Span([4, 5]).overlap(Span([6, 7]))
         0
+        >>> (Span(1, 4) | Span(8, 12)).overlap(Span(3, 9))
+        4
         """
-        return len(self & other)
+        if self._ranges is not None and other._ranges is not None:
+            return sum(end - start + 1 for start, end
+                       in intersect_ranges(self._ranges, other._ranges))
+        return len(self._set & other._set)
 
     def resemblance(self, other):
         """
         Return a resemblance coefficient as a float between 0 and 1.
         0 means the spans are completely different and 1 identical.
         """
-        if self._set.isdisjoint(other._set):
+        overlap = self.overlap(other)
+        if not overlap:
             return 0
-        if self._set == other._set:
+        if self == other:
             return 1
-        resemblance = self.overlap(other) / len(self | other)
+        resemblance = overlap / len(self | other)
         return resemblance
 
     def containment(self, other):
@@ -340,11 +506,12 @@ class Span(Set):
             - 1 means the other span is entirely contained in this span.
             - 0 means that the other span is not contained at all this span.
         """
-        if self._set.isdisjoint(other._set):
+        overlap = self.overlap(other)
+        if not overlap:
             return 0
-        if self._set == other._set:
+        if self == other:
             return 1
-        containment = self.overlap(other) / len(other)
+        containment = overlap / len(other)
         return containment
 
     def surround(self, other):
@@ -412,12 +579,33 @@ class Span(Set):
         >>> Span([1, 2]).distance_to(Span(range(4, 52)))
         2
         """
-        if self.overlap(other) or self.touch(other):
+        # check first the start and end: computing the overlap is costly and
+        # there can be no overlap when one span is entirely before the other
+        if self.is_before(other):
+            distance = other.start - self.end
+        elif other.is_before(self):
+            distance = self.start - other.end
+        elif self.overlap(other):
             return 0
-        elif self.is_before(other):
-            return other.start - self.end
         else:
             return self.start - other.end
+        # touching spans have a zero distance
+        return 0 if distance == 1 else distance
+
+    def shift(self, offset):
+        """
+        Return a new Span with all the items of this span shifted by `offset`.
+
+        For example:
+        >>> Span(1, 3).shift(10)
+        Span(11, 13)
+        >>> Span([1, 3, 5]).shift(-1)
+        Span(0)|Span(2)|Span(4)
+        """
+        if self._ranges is not None:
+            return Span._from_ranges(
+                [(start + offset, end + offset) for start, end in self._ranges])
+        return Span([i + offset for i in self._bitset])
 
     @staticmethod
     def from_ints(ints):
@@ -456,4 +644,100 @@ class Span(Set):
         >>> span.subspans()
         [Span(12), Span(15, 17), Span(24), Span(35), Span(58), Span(63, 64)]
         """
+        if self._ranges is not None:
+            return [Span(start, end) for start, end in self._ranges]
         return Span.from_ints(self)
+
+
+def union_ranges(ranges):
+    """
+    Return a list of sorted, non-touching and non-overlapping (start, end)
+    closed intervals covering all the items of an iterable of `ranges`
+    intervals.
+
+    For example:
+    >>> union_ranges([(5, 7), (1, 2), (3, 3), (10, 12), (11, 15)])
+    [(1, 3), (5, 7), (10, 15)]
+    """
+    merged = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1] + 1:
+            if end > merged[-1][1]:
+                merged[-1] = merged[-1][0], end
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def intersect_ranges(ranges1, ranges2):
+    """
+    Return a list of (start, end) closed intervals of the items common to two
+    sequences of sorted, non-touching and non-overlapping intervals.
+
+    For example:
+    >>> intersect_ranges([(1, 5), (8, 12)], [(3, 9), (12, 14)])
+    [(3, 5), (8, 9), (12, 12)]
+    """
+    intersection = []
+    i = j = 0
+    len1 = len(ranges1)
+    len2 = len(ranges2)
+    while i < len1 and j < len2:
+        start1, end1 = ranges1[i]
+        start2, end2 = ranges2[j]
+        start = start1 if start1 > start2 else start2
+        end = end1 if end1 < end2 else end2
+        if start <= end:
+            intersection.append((start, end))
+        if end1 < end2:
+            i += 1
+        else:
+            j += 1
+    return intersection
+
+
+def difference_ranges(ranges1, ranges2):
+    """
+    Return a list of (start, end) closed intervals of the items of `ranges1`
+    that are not in `ranges2`, two sequences of sorted, non-touching and
+    non-overlapping intervals.
+
+    For example:
+    >>> difference_ranges([(1, 10), (15, 20)], [(3, 4), (8, 16)])
+    [(1, 2), (5, 7), (17, 20)]
+    """
+    difference = []
+    j = 0
+    len2 = len(ranges2)
+    for start, end in ranges1:
+        # skip the intervals entirely before this interval
+        while j < len2 and ranges2[j][1] < start:
+            j += 1
+        k = j
+        while start <= end:
+            if k >= len2 or ranges2[k][0] > end:
+                difference.append((start, end))
+                break
+            start2, end2 = ranges2[k]
+            if start2 > start:
+                difference.append((start, start2 - 1))
+            start = end2 + 1
+            k += 1
+    return difference
+
+
+def contains_int(ranges, i):
+    """
+    Return True if the `i` int is in one of a sequence of sorted (start, end)
+    closed intervals.
+
+    For example:
+    >>> contains_int([(1, 2), (5, 7)], 6)
+    True
+    >>> contains_int([(1, 2), (5, 7)], 3)
+    False
+    >>> contains_int([(1, 2), (5, 7)], 0)
+    False
+    """
+    pos = bisect_right(ranges, (i, maxint)) - 1
+    return pos >= 0 and ranges[pos][1] >= i
@@ -45,8 +45,6 @@ def query_lines(location=None, query_string=None, strip=True):
     Return an iterable of text lines given a file at `location` or a
     `query string`. Include empty lines.
     """
-    # TODO: OPTIMIZE: tokenizing line by line may be rather slow
-    # we could instead get lines and tokens at once in a batch?
     lines = []
     if location:
         lines = text_lines(location, demarkup=False)
@@ -81,6 +79,42 @@ def query_tokenizer(text, lower=True):
     return (token for token in word_splitter(text) if token)
 
 
+# Split on whitespace and punctuations as query_pattern, but also return each new
+# line as a token: this is used to tokenize a whole text at once while keeping
+# track of the lines boundaries.
+tokens_and_new_lines = re.compile(query_pattern + '|\n', re.UNICODE).findall
+
+
+def query_multilines_tokenizer(lines, lower=True):
+    """
+    Return a list of tokens from an iterable of unicode text `lines` where the
+    end of each line is marked with a new line '\\n' token.
+
+    This returns the same tokens as calling query_tokenizer() on each line but
+    the whole text is lowercased and tokenized at once in a single pass.
+
+    For example:
+    >>> query_multilines_tokenizer(['Some Text', '', '  with GPL2+ ', '!'])
+    [u'some', u'text', u'\\n', u'\\n', u'with', u'gpl2+', u'\\n', u'\\n']
+    >>> query_multilines_tokenizer([])
+    []
+    """
+    lines = list(lines)
+    if not lines:
+        return []
+
+    new_line = isinstance(lines[0], bytes) and b'\n' or '\n'
+    lines.append('')
+    text = new_line.join(lines)
+    if text.count(new_line) != len(lines) - 1:
+        # some lines contain new lines: these are not tokens and are word
+        # separators as any other whitespace
+        text = new_line.join(line.replace(new_line, ' ') for line in lines)
+
+    text = lower and text.lower() or text
+    return tokens_and_new_lines(text)
+
+
 # Alternate pattern which is the opposite of query_pattern used for
 # matched text collection
 not_query_pattern = '[\W\s\+]+[\W\s]?'
@@ -88,6 +122,7 @@ not_query_pattern = '[\W\s\+]+[\W\s]?'
 # collect tokens and non-token texts in two different groups
 _text_capture_pattern = '(?P<token>' + query_pattern + ')' + '|' + '(?P<punct>' + not_query_pattern + ')'
 tokens_and_non_tokens = re.compile(_text_capture_pattern, re.UNICODE).finditer
+tokens_and_non_tokens_findall = re.compile(_text_capture_pattern, re.UNICODE).findall
 
 
 def matched_query_text_tokenizer(text):
@@ -101,14 +136,11 @@ def matched_query_text_tokenizer(text):
     """
     if not text:
         return
-    for match in tokens_and_non_tokens(text):
-        if not match:
-            continue
-        mgd = match.groupdict()
-        token = mgd.get('token')
-        punct = mgd.get('punct')
-        if token or punct:
-            yield (True, token) if token else (False, punct)
+    for token, punct in tokens_and_non_tokens_findall(text):
+        if token:
+            yield True, token
+        elif punct:
+            yield False, punct
 
 
 # Template-aware splitter, keeping a templated part {{anything}} as a token.
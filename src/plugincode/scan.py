@@ -78,6 +78,11 @@ class ScanPlugin(BasePlugin):
         This callable (typically a bare function) should carry as little state
         as possible as it may be executed through multiprocessing.
 
+        Several plugins may return the same callable when it computes the
+        results of all of them at once: it is then called only once for a
+        Resource and its timing is reported under the plugins names joined
+        with a "+".
+
         Subclasses must override.
         """
         raise NotImplementedError
@@ -28,6 +28,8 @@ from __future__ import print_function
 from __future__ import unicode_literals
 
 from collections import OrderedDict
+from itertools import izip
+from itertools import repeat
 from os.path import getsize
 
 from commoncode.filetype import get_last_modified_date
@@ -69,8 +71,41 @@ def get_emails(location, **kwargs):
     mappings for emails detected in the file at `location`.
     """
     from cluecode.finder import find_emails
+    return dict(emails=_email_results(find_emails(location)))
+
+
+def get_urls(location, **kwargs):
+    """
+    Return a mapping with a single 'urls' key with a value that is a list of
+    mappings for urls detected in the file at `location`.
+    """
+    from cluecode.finder import find_urls
+    return dict(urls=_url_results(find_urls(location)))
+
+
+def get_emails_and_urls(location, **kwargs):
+    """
+    Return a mapping with an 'emails' and a 'urls' key with a value that is a
+    list of mappings for emails and urls detected in the file at `location` in
+    a single pass over the file text.
+    """
+    from cluecode.finder import emails_finder
+    from cluecode.finder import find_clues
+    from cluecode.finder import urls_finder
+    clues = find_clues(location, [emails_finder(), urls_finder()])
+    return dict(
+        emails=_email_results(clues['emails']),
+        urls=_url_results(clues['urls']),
+    )
+
+
+def _email_results(emails):
+    """
+    Return a list of email mappings from an `emails` iterable of (email, line
+    number).
+    """
     results = []
-    for email, line_num  in find_emails(location):
+    for email, line_num in emails:
         if not email:
             continue
         result = OrderedDict()
@@ -78,25 +113,23 @@ def get_emails(location, **kwargs):
         result['email'] = email
         result['start_line'] = line_num
         result['end_line'] = line_num
-    return dict(emails=results)
+    return results
 
 
-def get_urls(location, **kwargs):
+def _url_results(urls):
     """
-    Return a mapping with a single 'urls' key with a value that is a list of
-    mappings for urls detected in the file at `location`.
+    Return a list of url mappings from a `urls` iterable of (url, line number).
     """
-    from cluecode.finder import find_urls
     results = []
-    for urls, line_num  in find_urls(location):
-        if not urls:
+    for url, line_num in urls:
+        if not url:
             continue
         result = OrderedDict()
         results.append(result)
-        result['url'] = urls
+        result['url'] = url
         result['start_line'] = line_num
         result['end_line'] = line_num
-    return dict(urls=results)
+    return results
 
 
 DEJACODE_LICENSE_URL = 'https://enterprise.dejacode.com/urn/urn:dje:license:{}'
@@ -105,7 +138,7 @@ SPDX_LICENSE_URL = 'https://spdx.org/licenses/{}'
 
 def get_licenses(location, min_score=0, include_text=False, diag=False,
                  license_url_template=DEJACODE_LICENSE_URL,
-                 cache_dir=None,
+                 cache_dir=None, timing=False,
                  **kwargs):
     """
     Return a mapping with a single 'licenses' key with a value that is list of
@@ -119,6 +152,10 @@ def get_licenses(location, min_score=0, include_text=False, diag=False,
 
     If `diag` is True, additional license match details are returned with the
     matched_rule key of the returned mapping.
+
+    If `timing` is True, the returned mapping has an extra 'scan_stats' key
+    with a mapping of license matching statistics for this file: query run
+    cache hits and misses and the counters and timers of each matching phase.
     """
     from scancode_config import SCANCODE_DEV_MODE
     if not cache_dir:
@@ -126,15 +163,27 @@ def get_licenses(location, min_score=0, include_text=False, diag=False,
 
     from licensedcode.cache import get_index
     from licensedcode.cache import get_licenses_db
+    from licensedcode.match import get_full_matched_texts
 
     idx = get_index(cache_dir, SCANCODE_DEV_MODE)
     licenses = get_licenses_db()
 
-    results = []
-    for match in idx.match(location=location, min_score=min_score):
-        if include_text:
-            matched_text = match.matched_text(whole_lines=False)
+    if timing:
+        query_run_cache = idx.query_run_matches_cache
+        cache_hits = query_run_cache.hits
+        cache_misses = query_run_cache.misses
+        match_stats = idx.match_stats.to_dict()
 
+    matches = idx.match(location=location, min_score=min_score)
+    if include_text:
+        # collect the matched texts of all the matches at once
+        matched_texts = get_full_matched_texts(
+            matches, location=location, idx=idx, whole_lines=False)
+    else:
+        matched_texts = repeat(None)
+
+    results = []
+    for match, matched_text in izip(matches, matched_texts):
         for license_key in match.rule.licenses:
             lic = licenses.get(license_key)
             result = OrderedDict()
@@ -172,6 +221,14 @@ def get_licenses(location, min_score=0, include_text=False, diag=False,
             if include_text:
                 result['matched_text'] = matched_text
 
+    if timing:
+        scan_stats = OrderedDict()
+        scan_stats['licenses:query_run_cache_hits'] = query_run_cache.hits - cache_hits
+        scan_stats['licenses:query_run_cache_misses'] = query_run_cache.misses - cache_misses
+        for name, value in idx.match_stats.to_dict(since=match_stats).items():
+            scan_stats['licenses:' + name] = value
+        return dict(licenses=results, scan_stats=scan_stats)
+
     return dict(licenses=results)
 
 
@@ -892,7 +892,15 @@ def run_scanners(scan_plugins, codebase, processes, timeout, timing,
     scan_sorter = lambda s: (s.sort_order, s.name)
     for scanner in sorted(scan_plugins, key=scan_sorter):
         func = scanner.get_scanner(**kwargs)
-        scanners.append(Scanner(name=scanner.name, function=func))
+        # several plugins may return the same function that computes all their
+        # results at once: run it only once under their combined names
+        for i, existing in enumerate(scanners):
+            if existing.function == func:
+                name = existing.name + '+' + scanner.name
+                scanners[i] = Scanner(name=name, function=func)
+                break
+        else:
+            scanners.append(Scanner(name=scanner.name, function=func))
 
     if TRACE_DEEP: logger_debug('run_scanners: scanners:', scanners)
     if not scanners:
@@ -939,6 +947,8 @@ def scan_codebase(codebase, scanners, processes=1, timeout=DEFAULT_TIMEOUT,
     If `with_timing` is True, each Resource is updated with per-scanner
     execution time (as a float in seconds). This is added to the `scan_timings`
     mapping of each Resource as {scanner.name: execution time}.
+    Additional scanners stats are summed for the whole codebase in a
+    'scan_stats' mapping of the codebase summary.
 
     Provide optional progress feedback in the UI using the `progress_manager`
     callable that accepts an iterable of tuple of (location, rid, scan_errors,
@@ -984,7 +994,7 @@ def scan_codebase(codebase, scanners, processes=1, timeout=DEFAULT_TIMEOUT,
 
         while True:
             try:
-                location, rid, scan_errors, scan_time, scan_result, scan_timings = scans.next()
+                location, rid, scan_errors, scan_time, scan_result, scan_timings, scan_stats = scans.next()
 
                 if TRACE_DEEP:
                     logger_debug(
@@ -1010,6 +1020,12 @@ def scan_codebase(codebase, scanners, processes=1, timeout=DEFAULT_TIMEOUT,
                     if scan_timings:
                         resource.scan_timings.update(scan_timings)
 
+                if with_timing and scan_stats:
+                    # scanners stats are summed for the whole codebase
+                    codebase_stats = codebase.summary.setdefault('scan_stats', OrderedDict())
+                    for name, value in scan_stats.items():
+                        codebase_stats[name] = codebase_stats.get(name, 0) + value
+
                 # NOTE: here we effectively single threaded the saving a
                 # Resource to the cache! .... not sure this is a good or bad
                 # thing for scale. Likely not
@@ -1041,7 +1057,7 @@ def scan_codebase(codebase, scanners, processes=1, timeout=DEFAULT_TIMEOUT,
 def scan_resource(location_rid, scanners, timeout=DEFAULT_TIMEOUT,
                   with_timing=False, with_threading=True):
     """
-    Return a tuple of (location, rid, scan_errors, scan_time, scan_results, timings)
+    Return a tuple of (location, rid, scan_errors, scan_time, scan_results, timings, stats)
     by running the `scanners` Scanner objects for the file or directory resource
     with id `rid` at `location` provided as a `location_rid` tuple of (location,
     rid) for up to `timeout` seconds.
@@ -1055,6 +1071,9 @@ def scan_resource(location_rid, scanners, timeout=DEFAULT_TIMEOUT,
     - `timings` is a mapping of scan {scanner.name: execution time in seconds}
       tracking the execution duration each each scan individually.
       `timings` is empty unless `with_timing` is True.
+    - `stats` is a mapping of {stat name: count} of additional statistics
+      returned by the scanners as a 'scan_stats' mapping.
+      `stats` is empty unless `with_timing` is True.
 
     All these values MUST be serializable/pickable because of the way multi-
     processing/threading works.
@@ -1064,6 +1083,7 @@ def scan_resource(location_rid, scanners, timeout=DEFAULT_TIMEOUT,
     results = OrderedDict()
     scan_errors = []
     timings = OrderedDict() if with_timing else None
+    stats = OrderedDict() if with_timing else None
 
     if not with_threading:
         interruptor = fake_interruptible
@@ -1083,6 +1103,10 @@ def scan_resource(location_rid, scanners, timeout=DEFAULT_TIMEOUT,
                 scan_errors.append(msg)
             # the return value of a scanner fun MUST be a mapping
             if values_mapping:
+                # a scanner can return additional stats when timing
+                scanner_stats = values_mapping.pop('scan_stats', None)
+                if with_timing and scanner_stats:
+                    stats.update(scanner_stats)
                 results.update(values_mapping)
 
         except Exception:
@@ -1094,7 +1118,7 @@ def scan_resource(location_rid, scanners, timeout=DEFAULT_TIMEOUT,
 
     scan_time = time() - scan_time
 
-    return location, rid, scan_errors, scan_time, results, timings
+    return location, rid, scan_errors, scan_time, results, timings, stats
 
 
 def display_summary(codebase, scan_names, processes, verbose):
@@ -1206,6 +1230,15 @@ def display_summary(codebase, scan_names, processes, verbose):
         if value > 0.1:
             echo_stderr('  %(name)s: %(value).2fs' % locals())
 
+    scan_stats = codebase.summary.get('scan_stats')
+    if scan_stats:
+        echo_stderr('Scanners stats:')
+        for name, value, in scan_stats.items():
+            if isinstance(value, float):
+                echo_stderr('  %(name)s: %(value).2fs' % locals())
+            else:
+                echo_stderr('  %(name)s: %(value)d' % locals())
+
     # TODO: if timing was requested display top per-scan/per-file stats?
 
 
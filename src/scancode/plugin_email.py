@@ -54,6 +54,11 @@ class EmailScanner(ScanPlugin):
     def is_enabled(self, email, **kwargs):
         return email
 
-    def get_scanner(self, **kwargs):
+    def get_scanner(self, url=False, **kwargs):
+        if url:
+            # find emails and urls in a single pass over the file text: the
+            # urls scanner returns this same function and it runs only once
+            from scancode.api import get_emails_and_urls
+            return get_emails_and_urls
         from scancode.api import get_emails
         return get_emails
@@ -45,10 +45,11 @@ def reindex_licenses(ctx, param, value):
         return
 
     # TODO: check for temp file configuration and use that for the cache!!!
+    from multiprocessing import cpu_count
     from licensedcode.cache import get_cached_index
     import click
     click.echo('Checking and rebuilding the license index...')
-    get_cached_index(check_consistency=True,)
+    get_cached_index(check_consistency=True, processes=cpu_count())
     click.echo('Done.')
     ctx.exit(0)
 
@@ -107,21 +108,22 @@ class LicenseScanner(ScanPlugin):
     def is_enabled(self, license, **kwargs):  # NOQA
         return license
 
-    def setup(self, cache_dir, **kwargs):
+    def setup(self, cache_dir, processes=0, **kwargs):
         """
         This is a cache warmup such that child process inherit from this.
         """
         from scancode_config import SCANCODE_DEV_MODE
         from licensedcode.cache import get_index
         get_index(cache_dir, check_consistency=SCANCODE_DEV_MODE,
-                  return_value=False)
+                  return_value=False, processes=processes)
 
     def get_scanner(self, license_score=0, license_text=False,
                     license_url_template=DEJACODE_LICENSE_URL,
-                    license_diag=False, cache_dir=None, **kwargs):
+                    license_diag=False, cache_dir=None, timing=False,
+                    **kwargs):
 
         from scancode.api import get_licenses
         return partial(get_licenses, min_score=license_score,
                        include_text=license_text, diag=license_diag,
                        license_url_template=license_url_template,
-                       cache_dir=cache_dir)
+                       cache_dir=cache_dir, timing=timing)
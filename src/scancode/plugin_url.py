@@ -55,6 +55,11 @@ class UrlScanner(ScanPlugin):
     def is_enabled(self, url, **kwargs):
         return url
 
-    def get_scanner(self, **kwargs):
+    def get_scanner(self, email=False, **kwargs):
+        if email:
+            # find emails and urls in a single pass over the file text: the
+            # emails scanner returns this same function and it runs only once
+            from scancode.api import get_emails_and_urls
+            return get_emails_and_urls
         from scancode.api import get_urls
         return get_urls
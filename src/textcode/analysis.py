@@ -26,6 +26,7 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
 
+from codecs import utf_8_decode
 import unicodedata
 
 import chardet
@@ -174,17 +175,105 @@ def remove_verbatim_cr_lf_tab_chars(s):
     return s.replace('\\r', ' ').replace('\\n', ' ').replace('\\t', ' ')
 
 
+# size in bytes of the chunks of a text file that are read and decoded at once
+TEXT_CHUNK_SIZE = 8 * 1024 * 1024
+
+
 def unicode_text_lines(location):
     """
     Return an iterable over unicode text lines from a text file at location.
-    Open the file as binary with universal new lines then try to decode each
-    line as Unicode.
+    Read the file as binary with universal new lines then decode each line as
+    Unicode.
+
+    The file is read and decoded by large chunks of whole lines rather than
+    line by line: each line is decoded as UTF-8 or as Latin-1 if it is not
+    valid UTF-8, the same way as as_unicode() does for a line.
     """
     T = typecode.get_type(location)
     if T.contains_text:
-        with open(location, 'rbU') as f:
-            for line in f:
-                yield remove_verbatim_cr_lf_tab_chars(as_unicode(line))
+        with open(location, 'rb') as f:
+            for chunk in text_chunks(f):
+                text = remove_verbatim_cr_lf_tab_chars(decode_text(chunk))
+                lines = text.split('\n')
+                # a chunk ends with a new line except at the end of the file
+                last = lines.pop()
+                for line in lines:
+                    yield line + '\n'
+                if last:
+                    yield last
+
+
+def text_chunks(f, chunk_size=TEXT_CHUNK_SIZE):
+    """
+    Yield byte strings of whole lines read from the `f` binary file object by
+    chunks of about `chunk_size` bytes. Line endings are normalized to LF the
+    same way as when reading a file with universal new lines: CRLF and CR are
+    replaced by LF.
+    """
+    # the normalized pieces of a partial last line: these are joined only
+    # once a new line is found such that a long line is not copied over and
+    # over
+    partial = []
+    # a CR at the end could be the first half of a CRLF
+    trailing_cr = False
+    while True:
+        data = f.read(chunk_size)
+        if not data:
+            break
+        if trailing_cr:
+            data = b'\r' + data
+        trailing_cr = data.endswith(b'\r')
+        if trailing_cr:
+            data = data[:-1]
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        # keep a partial last line for the next chunk
+        last_lf = data.rfind(b'\n')
+        if last_lf == -1:
+            partial.append(data)
+            continue
+        last_lf += 1
+        partial.append(data[:last_lf])
+        yield b''.join(partial)
+        partial = [data[last_lf:]]
+
+    if trailing_cr:
+        partial.append(b'\n')
+    remainder = b''.join(partial)
+    if remainder:
+        yield remainder
+
+
+def decode_text(data):
+    """
+    Return a unicode string decoded from a `data` byte string of text lines
+    with LF line endings. Each line is decoded as UTF-8 or as Latin-1 if it is
+    not valid UTF-8. The runs of valid UTF-8 lines are decoded at once.
+    """
+    try:
+        return data.decode('utf-8')
+    except UnicodeDecodeError:
+        pass
+
+    decoded = []
+    start = 0
+    end = len(data)
+    while start < end:
+        try:
+            decoded.append(utf_8_decode(buffer(data, start), 'strict', True)[0])
+            break
+        except UnicodeDecodeError as e:
+            error = start + e.start
+        # decode the valid UTF-8 lines before the line with an error at once,
+        # then this line as Latin-1 and continue after this line
+        line_start = data.rfind(b'\n', start, error)
+        line_start = start if line_start == -1 else line_start + 1
+        line_end = data.find(b'\n', error)
+        line_end = end if line_end == -1 else line_end + 1
+        if line_start > start:
+            decoded.append(utf_8_decode(buffer(data, start, line_start - start), 'strict', True)[0])
+        decoded.append(data[line_start:line_end].decode('latin-1'))
+        start = line_end
+    return ''.join(decoded)
 
 
 def unicode_text(location):
@@ -26,8 +26,10 @@ from __future__ import absolute_import
 from __future__ import print_function
 from __future__ import unicode_literals
 
+from collections import OrderedDict
 import contextlib
 from io import BytesIO
+import os
 
 from pdfminer.converter import TextConverter
 from pdfminer.layout import LAParams
@@ -39,10 +41,39 @@ from pdfminer.pdfpage import PDFPage
 from pdfminer.pdfparser import PDFParser
 
 
+# Cache of the most recently extracted pdfs text as
+# {(location, max_pages): ((size, mtime), lines)}. A file is scanned by several
+# scanners in sequence (licenses, copyrights, emails and urls) that each need the
+# text: with this cache a pdf is parsed only once.
+_text_lines_cache = OrderedDict()
+TEXT_LINES_CACHE_SIZE = 8
+
+
 def get_text_lines(location, max_pages=5):
     """
     Return a list of unicode text lines extracted from a pdf file at
     `location`. May raise exceptions. Extract up to `max_pages` pages.
+    The lines of the most recently extracted pdfs are cached in memory.
+    """
+    stat = os.stat(location)
+    stat_key = stat.st_size, stat.st_mtime
+    cache_key = location, max_pages
+    cached = _text_lines_cache.pop(cache_key, None)
+    if cached and cached[0] == stat_key:
+        lines = cached[1]
+    else:
+        lines = _get_text_lines(location, max_pages)
+
+    _text_lines_cache[cache_key] = stat_key, lines
+    if len(_text_lines_cache) > TEXT_LINES_CACHE_SIZE:
+        _text_lines_cache.popitem(last=False)
+    return list(lines)
+
+
+def _get_text_lines(location, max_pages=5):
+    """
+    Return a list of text lines extracted from a pdf file at `location`. May
+    raise exceptions. Extract up to `max_pages` pages.
     """
     extracted_text = BytesIO()
     laparams = LAParams()
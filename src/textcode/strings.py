@@ -25,6 +25,8 @@
 from __future__ import absolute_import
 from __future__ import print_function
 
+import mmap
+import os
 import re
 import string
 
@@ -51,25 +53,110 @@ https://github.com/TakahiroHaruyama/openioc_scan/blob/d7e8c5962f77f55f9a5d34dbfd
 MIN_LEN = 3
 
 
-def strings_from_file(location, buff_size=1024 * 1024, ascii=False, clean=True, min_len=MIN_LEN):
+def strings_from_file(location, buff_size=1024 * 1024, ascii=False, clean=True,
+                      min_len=MIN_LEN, max_bytes=None):
     """
     Yield unicode strings made only of ASCII characters found in file at location.
-    Process the file in chunks (to limit memory usage). If ascii is True, strings
-    are converted to plain ASCII "str or byte" strings instead of unicode.
+    Process the file in windows of buff_size bytes (to limit memory usage). If
+    ascii is True, strings are converted to plain ASCII "str or byte" strings
+    instead of unicode. If max_bytes is provided, stop after extracting about
+    max_bytes bytes of strings.
     """
     min_len = MIN_LEN
+    strings = strings_with_offsets_from_file(
+        location, window_size=buff_size, clean=clean, min_len=min_len,
+        max_bytes=max_bytes)
+    for _offset, s in strings:
+        if ascii:
+            s = toascii(s)
+            s = s.strip()
+            if not s or len(s) < min_len:
+                continue
+        yield s
+
+
+def strings_with_offsets_from_file(location, window_size=1024 * 1024, clean=True,
+                                   min_len=MIN_LEN, max_bytes=None):
+    """
+    Yield tuples of (offset, unicode string) for strings made only of ASCII
+    characters found in file at location. The offset is the byte offset of the
+    first character of the string in the file, after cleaning if clean is True.
+    For a UTF-16-LE-encoded (wide) string, this is the offset of the first
+    two-byte character.
+
+    The file is memory-mapped and scanned in windows of window_size bytes. A
+    string found at the end of a window may continue in the next one: it is not
+    returned until it is scanned again as a whole in the next window, such that
+    strings spanning window boundaries are neither split nor lost.
+
+    If max_bytes is provided, stop after extracting strings totaling at least
+    max_bytes bytes. This limits the work done on very large binaries.
+    """
     with open(location, 'rb') as f:
-        while 1:
-            buf = f.read(buff_size)
-            if not buf:
+        size = os.fstat(f.fileno()).st_size
+        if not size:
+            return
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            strings = _strings_with_offsets(mapped, size, window_size, max_bytes)
+            for offset, char_size, s in strings:
+                if clean:
+                    for ss in clean_string(s, min_len=min_len):
+                        yield offset + s.find(ss) * char_size, ss
+                else:
+                    yield offset, s
+        finally:
+            mapped.close()
+
+
+def _strings_with_offsets(data, size, window_size, max_bytes=None):
+    """
+    Yield tuples of (offset, character size in bytes, unicode string) for
+    strings extracted from the `data` mmap or string of `size` bytes, scanning
+    windows of window_size bytes.
+    """
+    # a match ending in the last few bytes of a window could be longer: it
+    # could continue in the next window or a wide string could have lost its
+    # trailing null byte. Such a match is scanned again from its start in the
+    # next window. The margin is the length of the shortest wide string.
+    margin = 2 * MIN_LEN
+    window_size = max(window_size, margin * 2)
+    extracted = 0
+    start = 0
+    end = min(window_size, size)
+    while start < size:
+        is_last = end >= size
+        safe_end = end if is_last else end - margin
+        resume = None
+        for match in ascii_strings(data, start, end):
+            mstart, mend = match.span()
+            if mend > safe_end and not is_last:
+                resume = mstart
                 break
-            for s in strings_from_string(buf, clean=clean, min_len=min_len):
-                if ascii:
-                    s = toascii(s)
-                    s = s.strip()
-                    if not s or len(s) < min_len:
-                        continue
-                yield s
+            if match.lastindex == 1:
+                yield mstart, 1, match.group().decode('ascii')
+            else:
+                s = decode(match.group())
+                if s:
+                    yield mstart, 2, s
+            start = mend
+            if max_bytes:
+                extracted += mend - mstart
+                if extracted >= max_bytes:
+                    return
+
+        if is_last:
+            break
+
+        if resume is None:
+            start = max(start, safe_end)
+        elif resume == start:
+            # a single string fills the whole window: grow the window
+            end = min(end + window_size, size)
+            continue
+        else:
+            start = resume
+        end = min(start + window_size, size)
 
 
 # Extracted text is digit, letters, punctuation and white spaces
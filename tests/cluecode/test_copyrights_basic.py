@@ -28,6 +28,7 @@ import os.path
 
 from commoncode.testcase import FileBasedTesting
 from cluecode import copyrights as copyrights_module
+from textcode import analysis
 
 
 class TestTextPreparation(FileBasedTesting):
@@ -101,6 +102,18 @@ class TestTextPreparation(FileBasedTesting):
         result = list(copyrights_module.candidate_lines(lines))
         assert expected == result
 
+    def test_possible_candidate_lines(self):
+        lines = [
+            'import os\n',
+            '# Copyright 2017 nexB\n',
+            'x = 1\n',
+            'written in 1998 &#xA9; \xa9\n',
+            'def foo():\n',
+            'return bytes\n',
+        ]
+        result = copyrights_module.possible_candidate_lines(lines)
+        assert set([1, 3, 5]) == result
+
     def test_is_candidates_should_not_select_line_with_bare_full_year(self):
         line = '2012'
         line, _char_only = copyrights_module.prep_line(line)
@@ -173,6 +186,78 @@ class TestCopyrightDetector(FileBasedTesting):
         results = list(copyrights_module.detect_copyrights(location))
         assert expected == results
 
+    def test_regexp_tagger_tags_with_first_matching_pattern(self):
+        patterns = [
+            (r'^[Cc]opyright$', 'COPY'),
+            (r'^Copy', 'NNP'),
+            (r'^[0-9]+$', 'CD'),
+            (r'^(a)(b)?(c)?$', 'ABC'),
+        ]
+        tagger = copyrights_module.RegexpTagger(patterns)
+        tokens = ['Copyright', 'copyright', 'Copyleft', '2017', 'ac', 'foo']
+        expected = [
+            ('Copyright', 'COPY'),
+            ('copyright', 'COPY'),
+            ('Copyleft', 'NNP'),
+            ('2017', 'CD'),
+            ('ac', 'ABC'),
+            ('foo', None),
+        ]
+        assert expected == tagger.tag(tokens)
+        # memoized tags are the same
+        assert expected == tagger.tag(tokens)
+
+    def test_regexp_tagger_with_many_groups_is_same_as_nltk_tagger(self):
+        from nltk import RegexpTagger
+        tokens = u'''Copyright (c) 2001-2006 by John Doe <jdoe@example.com> and
+            the FSF, Inc. All rights reserved. Written by Jane Doe, 2007.
+            http://example.com/foo_bar today.year'''.split()
+        expected = RegexpTagger(copyrights_module.patterns).tag(tokens)
+        tagger = copyrights_module.RegexpTagger(copyrights_module.patterns)
+        assert len(tagger.combined) > 1
+        assert expected == tagger.tag(tokens)
+
+    def test_chunk_parser_parse_tree(self):
+        tagged = [('Copyright', 'COPY'), ('(c)', 'COPY'), ('2017', 'YR'),
+                  ('nexB', 'NNP'), ('Inc.', 'COMP')]
+        grammar = '''
+            YR-RANGE: {<YR>+}        #10
+            COMPANY: {<NN.*> <COMP>}        #20
+            COPYRIGHT: {<COPY>+ <YR-RANGE> <COMPANY|NAME>}        #30
+        '''
+        chunker = copyrights_module.ChunkParser(grammar, ['COPY', 'YR', 'NNP', 'COMP'])
+        result = chunker.parse(tagged)
+        expected = ('(S (COPYRIGHT Copyright/COPY (c)/COPY (YR-RANGE 2017/YR) '
+                    '(COMPANY nexB/NNP Inc./COMP)))')
+        assert expected == repr(result)
+        assert tagged == result.leaves()
+
+    def test_chunk_parser_is_same_as_nltk_regexp_parser_on_copyrights_test_data(self):
+        from nltk import RegexpParser
+        from nltk.tree import Tree
+
+        def as_tuples(node):
+            if isinstance(node, Tree):
+                return node.label(), [as_tuples(child) for child in node]
+            if isinstance(node, copyrights_module.ParseNode):
+                return node.label, [as_tuples(child) for child in node]
+            return node
+
+        nltk_chunker = RegexpParser(copyrights_module.grammar)
+        detector = copyrights_module.get_detector()
+        test_dir = self.get_test_loc('copyrights')
+        for top, _dirs, files in os.walk(test_dir):
+            for test_file in files:
+                location = os.path.join(top, test_file)
+                lines = analysis.text_lines(location, demarkup=True)
+                for numbered_lines in copyrights_module.candidate_lines(lines):
+                    tagged = detector.tagger.tag(detector.get_tokens(numbered_lines))
+                    if not tagged:
+                        continue
+                    expected = as_tuples(nltk_chunker.parse(list(tagged)))
+                    result = as_tuples(detector.chunker.parse(tagged))
+                    assert expected == result, location
+
 
 def check_detection_with_lines(expected, test_file, what='copyrights', with_line_num=True):
     """
@@ -703,3 +703,51 @@ class TestSearch(FileBasedTesting):
         expected = [('cannot be run in DOS mode.', 1)]
         result = list(finder.find_pattern(test_file, pattern))
         assert expected == result
+
+    def test_find_clues_finds_emails_urls_and_patterns_in_one_pass(self):
+        test_dir = self.get_test_loc('finder/search', copy=True)
+        for test_file in os.listdir(test_dir):
+            location = os.path.join(test_dir, test_file)
+            finders = [
+                finder.emails_finder(),
+                finder.urls_finder(),
+                finder.pattern_finder('Copyright', key='copyrights', unique=True),
+            ]
+            result = finder.find_clues(location, finders)
+            assert list(finder.find_emails(location)) == result['emails']
+            assert list(finder.find_urls(location)) == result['urls']
+            expected = list(finder.find_pattern(location, 'Copyright', unique=True))
+            assert expected == result['copyrights']
+
+    def test_may_contain_literals(self):
+        test_file = self.get_temp_file()
+        with open(test_file, 'wb') as tf:
+            tf.write(b'no clue here\nnot at all\n')
+        assert not finder.may_contain_literals(test_file, finder.URLS_LITERALS)
+        assert not finder.may_contain_literals(test_file, finder.EMAILS_LITERALS)
+        with open(test_file, 'wb') as tf:
+            tf.write(b'see WWW.example.com\n')
+        assert finder.may_contain_literals(test_file, finder.URLS_LITERALS)
+        # wide strings as found in binaries
+        with open(test_file, 'wb') as tf:
+            tf.write(u'\x00\x01http://example.com'.encode('utf-16-le'))
+        assert finder.may_contain_literals(test_file, finder.URLS_LITERALS)
+        with open(test_file, 'wb') as tf:
+            tf.write(b'')
+        assert not finder.may_contain_literals(test_file, finder.URLS_LITERALS)
+
+    def test_find_clues_with_literals_finds_urls_in_binaries(self):
+        test_file = self.get_test_loc('finder/binaries/tor.bin')
+        result = finder.find_clues(test_file, [finder.urls_finder(), finder.emails_finder()])
+        assert (u'https://www.torproject.org/', 25) in result['urls']
+        assert [] == result['emails']
+
+    def test_url_and_host_classification_is_cached(self):
+        finder.is_good_host.cache_clear()
+        assert finder.is_good_host('github.com')
+        assert finder.is_good_host('github.com')
+        assert not finder.is_good_host('localhost')
+        info = finder.cache_info()['is_good_host']
+        assert 1 == info.hits
+        assert 2 == info.misses
+        assert 2 == info.currsize
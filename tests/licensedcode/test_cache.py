@@ -41,76 +41,88 @@ TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 class LicenseIndexCacheTest(FileBasedTesting):
     test_data_dir = TEST_DATA_DIR
 
-    def test_tree_checksum_ignores_some_files_and_directories(self):
+    def test_tree_manifest_is_different_when_file_is_added(self):
         test_dir = self.get_test_loc('cache/tree', copy=True)
-        before = cache.tree_checksum(test_dir)
-        # create some new pyc file and a dir
-        with open(os.path.join(test_dir, 'some.pyc'), 'wb') as pyc:
-            pyc.write('')
-        fileutils.create_dir(os.path.join(test_dir, 'some dir'))
-
-        after = cache.tree_checksum(test_dir)
-        assert before == after
-
+        before = cache.tree_manifest(test_dir)
+        # ensure the directory modification time changes
+        os.utime(test_dir, (0, 0))
         with open(os.path.join(test_dir, 'some.py'), 'wb') as py:
             py.write(' ')
-        after = cache.tree_checksum(test_dir)
+        after = cache.tree_manifest(test_dir)
         assert before != after
 
-        before = after
-        with open(os.path.join(test_dir, 'some.LICENSE'), 'wb') as f:
-            f.write(' ')
-        after = cache.tree_checksum(test_dir)
+    def test_tree_manifest_is_different_when_file_is_removed_from_data_dir(self):
+        test_dir = self.get_test_loc('cache/tree', copy=True)
+        data_dir = self.get_test_loc('cache/data/rules', copy=True)
+        before = cache.tree_manifest(test_dir, [data_dir])
+        os.utime(data_dir, (0, 0))
+        fileutils.delete(os.path.join(data_dir, 'anu-license.RULE'))
+        after = cache.tree_manifest(test_dir, [data_dir])
         assert before != after
 
-        before = after
-        with open(os.path.join(test_dir, 'some.LICENSE~'), 'wb') as f:
-            f.write(' ')
-        after = cache.tree_checksum(test_dir)
+    def test_tree_manifest_is_same_when_nothing_changed(self):
+        test_dir = self.get_test_loc('cache/tree', copy=True)
+        data_dir = self.get_test_loc('cache/data/rules', copy=True)
+        before = cache.tree_manifest(test_dir, [data_dir])
+        after = cache.tree_manifest(test_dir, [data_dir])
         assert before == after
 
-        with open(os.path.join(test_dir, 'some.LICENSE.swp'), 'wb') as f:
+    def test_content_stamp_ignores_some_files(self):
+        test_dir = self.get_test_loc('cache/tree', copy=True)
+        data_dir = self.get_test_loc('cache/data/rules', copy=True)
+        before = cache.content_stamp(test_dir, [data_dir])
+        # create some new pyc file, a non-code file and a dir
+        with open(os.path.join(test_dir, 'some.pyc'), 'wb') as pyc:
+            pyc.write('')
+        with open(os.path.join(test_dir, 'some.txt'), 'wb') as txt:
+            txt.write('')
+        fileutils.create_dir(os.path.join(test_dir, 'some dir'))
+        # and some temp files in the data dir
+        with open(os.path.join(data_dir, 'some.RULE~'), 'wb') as f:
+            f.write(' ')
+        with open(os.path.join(data_dir, 'some.RULE.swp'), 'wb') as f:
             f.write(' ')
-        after = cache.tree_checksum(test_dir)
+
+        after = cache.content_stamp(test_dir, [data_dir])
         assert before == after
 
-    def test_tree_checksum_is_different_when_file_is_added(self):
+    def test_content_stamp_is_different_when_file_is_added(self):
         test_dir = self.get_test_loc('cache/tree', copy=True)
-        before = cache.tree_checksum(test_dir)
+        data_dir = self.get_test_loc('cache/data/rules', copy=True)
+        before = cache.content_stamp(test_dir, [data_dir])
 
         with open(os.path.join(test_dir, 'some.py'), 'wb') as py:
             py.write(' ')
-        after = cache.tree_checksum(test_dir)
+        after = cache.content_stamp(test_dir, [data_dir])
         assert before != after
 
         before = after
-        with open(os.path.join(test_dir, 'some.LICENSE'), 'wb') as f:
+        with open(os.path.join(data_dir, 'some.RULE'), 'wb') as f:
             f.write(' ')
-        after = cache.tree_checksum(test_dir)
+        after = cache.content_stamp(test_dir, [data_dir])
         assert before != after
 
-    def test_tree_checksum_is_different_when_file_is_changed(self):
+    def test_content_stamp_is_different_when_file_is_changed_in_place(self):
         test_dir = self.get_test_loc('cache/tree', copy=True)
-
-        with open(os.path.join(test_dir, 'some.py'), 'wb') as py:
-            py.write(' ')
-        before = cache.tree_checksum(test_dir)
-
-        with open(os.path.join(test_dir, 'some.py'), 'wb') as py:
-            py.write(' asas')
-        after = cache.tree_checksum(test_dir)
+        data_dir = self.get_test_loc('cache/data/rules', copy=True)
+        before = cache.content_stamp(test_dir, [data_dir])
+
+        rule_file = os.path.join(data_dir, 'anu-license.RULE')
+        mtime = os.path.getmtime(rule_file)
+        with open(rule_file, 'ab') as f:
+            f.write(' some text')
+        # modified time stamps do not matter
+        os.utime(rule_file, (mtime, mtime))
+        after = cache.content_stamp(test_dir, [data_dir])
         assert before != after
 
-    def test_tree_checksum_is_different_when_file_is_removed(self):
+    def test_content_stamp_is_different_when_file_is_removed(self):
         test_dir = self.get_test_loc('cache/tree', copy=True)
+        data_dir = self.get_test_loc('cache/data/rules', copy=True)
+        before = cache.content_stamp(test_dir, [data_dir])
 
-        new_file = os.path.join(test_dir, 'some.py')
-        with open(new_file, 'wb') as py:
-            py.write(' ')
-        before = cache.tree_checksum(test_dir)
-
-        fileutils.delete(new_file)
-        after = cache.tree_checksum(test_dir)
+        fileutils.delete(os.path.join(test_dir, 'bla.py'))
+        after = cache.content_stamp(test_dir, [data_dir])
         assert before != after
 
     def test_build_index(self):
@@ -149,26 +161,53 @@ class LicenseIndexCacheTest(FileBasedTesting):
 
         # now add some file in the source tree
         new_file = os.path.join(tree_base_dir, 'some file')
+        os.utime(tree_base_dir, (0, 0))
         with open(new_file, 'wb') as nf:
             nf.write('somthing')
 
-        # when check_consistency is False, the index is not rebuild when
-        # new files are added
+        # when check_consistency is False, the manifest is still checked: it
+        # is stale but the content stamp is not, so the index is not rebuilt
         check_consistency = False
         cache.get_cached_index(cache_dir, check_consistency, timeout,
                                tree_base_dir, licenses_data_dir, rules_data_dir)
-        assert tree_before == open(checksum_file).read()
+        assert tree_before != open(checksum_file).read()
         assert idx_checksum_before == hash.sha1(cache_file)
         assert idx_date_before == date.get_file_mtime(cache_file)
 
-        # when check_consistency is True, the index is rebuilt when new
-        # files are added
-        check_consistency = True
+        # when some code is added the index is rebuilt, even if
+        # check_consistency is False
+        tree_before = open(checksum_file).read()
+        new_file = os.path.join(tree_base_dir, 'some_file.py')
+        os.utime(tree_base_dir, (0, 0))
+        with open(new_file, 'wb') as nf:
+            nf.write('somthing')
+
+        check_consistency = False
         cache.get_cached_index(cache_dir, check_consistency, timeout,
                                tree_base_dir, licenses_data_dir, rules_data_dir)
         assert tree_before != open(checksum_file).read()
         assert idx_date_before != date.get_file_mtime(cache_file)
 
+        # when a rule is modified in place, the manifest is unchanged and the
+        # index is rebuilt only when check_consistency is True
+        tree_before = open(checksum_file).read()
+        idx_checksum_before = hash.sha1(cache_file)
+        rule_file = os.path.join(rules_data_dir, 'anu-license.RULE')
+        with open(rule_file, 'ab') as rf:
+            rf.write(' some more text')
+
+        check_consistency = False
+        cache.get_cached_index(cache_dir, check_consistency, timeout,
+                               tree_base_dir, licenses_data_dir, rules_data_dir)
+        assert tree_before == open(checksum_file).read()
+        assert idx_checksum_before == hash.sha1(cache_file)
+
+        check_consistency = True
+        cache.get_cached_index(cache_dir, check_consistency, timeout,
+                               tree_base_dir, licenses_data_dir, rules_data_dir)
+        assert tree_before == open(checksum_file).read()
+        assert idx_checksum_before != hash.sha1(cache_file)
+
         # now add some ignored file in the source tree
         tree_before = open(checksum_file).read()
         idx_checksum_before = hash.sha1(cache_file)
@@ -181,11 +220,11 @@ class LicenseIndexCacheTest(FileBasedTesting):
         cache.get_cached_index(cache_dir, check_consistency, timeout,
                                tree_base_dir, licenses_data_dir, rules_data_dir)
 
-        assert tree_before == open(checksum_file).read()
         assert idx_checksum_before == hash.sha1(cache_file)
         assert idx_date_before == date.get_file_mtime(cache_file)
 
-        # if the treechecksum file dies the index is rebuilt
+        # if the manifest file dies the index is not rebuilt
+        tree_before = open(checksum_file).read()
         fileutils.delete(checksum_file)
         idx_checksum_before = hash.sha1(cache_file)
 
@@ -194,7 +233,7 @@ class LicenseIndexCacheTest(FileBasedTesting):
                                tree_base_dir, licenses_data_dir, rules_data_dir)
 
         assert tree_before == open(checksum_file).read()
-        assert idx_date_before != date.get_file_mtime(cache_file)
+        assert idx_checksum_before == hash.sha1(cache_file)
 
         # if the index cache file dies the index is rebuilt
         fileutils.delete(cache_file)
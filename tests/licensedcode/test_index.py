@@ -38,6 +38,7 @@ from licensedcode import models
 from licensedcode.match import get_texts
 from licensedcode.query import Query
 from licensedcode import match_seq
+from licensedcode import match_set
 
 TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 
@@ -251,6 +252,20 @@ class TestIndexing(IndexTesting):
         assert expected_low_tids_msets_by_rid == [{idx.tokens_by_tid[tok]: freq for tok, freq in tids_mset.items()}
                                                   for tids_mset in low_tids_msets_by_rid]
 
+    def test_index_built_in_parallel_is_identical_to_serial_build(self):
+        import pickle
+        serial = index.LicenseIndex(self.get_test_rules('index/bsd_templates2'))
+        parallel = index.LicenseIndex(self.get_test_rules('index/bsd_templates2'), processes=2)
+
+        for attribute in index.LicenseIndex.__slots__:
+            serial_value = getattr(serial, attribute)
+            parallel_value = getattr(parallel, attribute)
+            if attribute.endswith('automaton'):
+                # automatons pickles are not stable: compare their content
+                assert sorted(serial_value.items()) == sorted(parallel_value.items())
+            else:
+                assert pickle.dumps(serial_value, 2) == pickle.dumps(parallel_value, 2), attribute
+
     def test_index_fails_on_duplicated_rules(self):
         rule_dir = self.get_test_loc('index/no_duplicated_rule')
         try:
@@ -260,6 +275,21 @@ class TestIndexing(IndexTesting):
             assert u'Duplicate rules' in str(e)
 
 
+    def test_index_has_precomputed_thresholds_of_each_rule(self):
+        rules = self.get_test_rules('index/bsd')
+        negative = models.Rule(_text='not a gpl license')
+        negative.negative = True
+        rules.append(negative)
+        idx = index.LicenseIndex(rules)
+        for rid, rule in enumerate(idx.rules_by_rid):
+            if rule.negative:
+                assert None == idx.thresholds_by_rid[rid]
+                assert None == idx.thresholds_unique_by_rid[rid]
+            else:
+                assert rule.thresholds() == idx.thresholds_by_rid[rid]
+                assert rule.thresholds_unique() == idx.thresholds_unique_by_rid[rid]
+
+
 class TestMatchNoTemplates(IndexTesting):
     test_data_dir = TEST_DATA_DIR
 
@@ -328,6 +358,168 @@ class TestMatchNoTemplates(IndexTesting):
         assert u'licensed [that] under [is] the [that] GPL licensed [or] under [not] the GPL' == qtext
         assert u'licensed under the GPL licensed under the GPL' == itext
 
+    def test_match_finds_a_larger_rule_in_a_query_run_matched_exactly_by_smaller_rules(self):
+        rule1 = models.Rule(licenses=['gpl'], _text='licensed under the GPL version two or later')
+        rule2 = models.Rule(licenses=['mit'], _text='Permission is hereby granted free of charge to any person obtaining a copy')
+        rule3 = models.Rule(licenses=['gpl', 'mit'], _text=rule1.text() + ' and ' + rule2.text())
+        idx = index.LicenseIndex([rule1, rule2, rule3])
+        querys = u"""Permission is hereby granted free of charge to any person any obtaining a copy
+
+
+
+
+            licensed under the GPL version two or later foo Permission is hereby granted free of charge to any person obtaining a copy"""
+
+        qry = Query(query_string=querys, idx=idx)
+        assert 2 == len(qry.query_runs)
+
+        # the second query run is entirely matched exactly by rule1 and rule2
+        # and is still sequence matched to rule3
+        result = idx.match(query_string=querys)
+        assert [rule2, rule3] == [m.rule for m in result]
+        assert [match_seq.MATCH_SEQ, match_seq.MATCH_SEQ] == [m.matcher for m in result]
+
+    def test_match_reuses_cached_sequence_matches_of_identical_query_runs(self):
+        rule = models.Rule(licenses=['mit'], _text='Permission is hereby granted free of charge to any person obtaining a copy')
+        idx = index.LicenseIndex([rule])
+        querys = u'Permission is hereby granted free of charge to any person any obtaining a copy'
+        query_run_cache = idx.query_run_matches_cache
+
+        result1 = idx.match(query_string=querys)
+        assert 0 == query_run_cache.hits
+        assert 1 == query_run_cache.misses
+
+        result2 = idx.match(query_string=querys)
+        assert 1 == query_run_cache.hits
+        assert 1 == query_run_cache.misses
+
+        assert result1 == result2
+        match1 = result1[0]
+        match2 = result2[0]
+        assert match_seq.MATCH_SEQ == match2.matcher
+        assert match1 is not match2
+        assert match1.qspan == match2.qspan
+        assert match1.score() == match2.score()
+        assert (match1.start_line, match1.end_line) == (match2.start_line, match2.end_line)
+
+    def test_match_reuses_cached_sequence_matches_of_identical_query_runs_at_another_start(self):
+        rule = models.Rule(licenses=['mit'], _text='Permission is hereby granted free of charge to any person obtaining a copy')
+        idx = index.LicenseIndex([rule])
+        querys = u'Permission is hereby granted free of charge to any person any obtaining a copy'
+        query_run_cache = idx.query_run_matches_cache
+
+        idx.match(query_string=querys)
+        # the same query run is now the second query run of the query
+        querys2 = u'granted free of charge\n\n\n\n\n\n\n\n' + querys
+        assert 2 == len(Query(query_string=querys2, idx=idx).query_runs)
+        result = idx.match(query_string=querys2)
+        assert 1 == query_run_cache.hits
+        assert Span(4, 13) | Span(15, 17) == result[0].qspan
+        assert 4 == result[0].query_run_start
+        assert 9 == result[0].start_line
+
+        query_run_cache.clear()
+        expected = idx.match(query_string=querys2)
+        assert 0 == query_run_cache.hits
+        assert expected == result
+        assert expected[0].qspan == result[0].qspan
+        assert expected[0].score() == result[0].score()
+
+    def test_match_sequence_of_a_query_run_does_not_depend_on_its_start(self):
+        rule = models.Rule(licenses=['mit'], _text='Permission is hereby granted free of charge to any person obtaining a copy')
+        idx = index.LicenseIndex([rule])
+        querys = u'Permission is hereby granted free of charge to any person any obtaining a copy'
+        prefix = u'granted free of charge to any person obtaining\n\n\n\n\n\n\n\n'
+
+        qry = Query(query_string=prefix + querys, idx=idx)
+        query_run = qry.query_runs[-1]
+        assert 8 == query_run.start
+        candidate = match_set.compute_candidates(query_run, idx, rules_subset=idx.regular_rids | idx.small_rids)[0]
+        result = match_seq.match_sequence(idx, candidate, query_run)
+        assert [Span(8, 17), Span(19, 21)] == [m.qspan for m in result]
+
+    def test_match_collects_match_stats_for_each_phase(self):
+        rule = models.Rule(licenses=['mit'], _text='Permission is hereby granted free of charge to any person obtaining a copy')
+        idx = index.LicenseIndex([rule])
+        querys = u'Permission is hereby granted free of charge to any person any obtaining a copy'
+
+        idx.match(query_string=querys)
+        stats = idx.match_stats.to_dict()
+        assert 1 == stats['queries']
+        assert 1 == stats['query_runs']
+        assert 1 == stats['candidates']
+        assert 1 == stats['seq_calls']
+        assert 1 == stats['seq_matches']
+        assert 0 == stats['exact_matches']
+        assert 0 == stats['discarded_short']
+        assert all(stats[phase + '_time'] >= 0 for phase in index.MatchStats.phases)
+
+        idx.match(query_string=querys)
+        since = idx.match_stats.to_dict(since=stats)
+        assert 1 == since['queries']
+        # the second query run is matched from the query run matches cache
+        assert 0 == since['candidates']
+        assert 0 == since['seq_calls']
+        assert 2 == idx.match_stats.to_dict()['queries']
+
+    def test_match_strings_returns_the_matches_of_each_string(self):
+        rule1 = models.Rule(licenses=['mit'], _text='MIT License')
+        rule2 = models.Rule(licenses=['gpl-2.0'], _text='GNU General Public License version 2')
+        idx = index.LicenseIndex([rule1, rule2])
+        query_strings = ['MIT License', 'GNU General Public License version 2', '', 'foo', 'MIT License']
+
+        results = idx.match_strings(query_strings)
+        assert 5 == len(results)
+        expected = [idx.match(query_string=qs) if qs else [] for qs in query_strings]
+        assert ([[(m.rule, m.qspan, m.score(), m.lines()) for m in ms] for ms in expected]
+                == [[(m.rule, m.qspan, m.score(), m.lines()) for m in ms] for ms in results])
+        assert [] == results[2]
+        assert [] == results[3]
+
+        # repeated strings are matched once and get new match objects
+        assert 1 == idx.query_string_matches_cache.hits
+        assert 3 == idx.query_string_matches_cache.misses
+        assert results[0][0] is not results[4][0]
+        assert 'MIT License' == results[4][0].matched_text()
+
+    def test_match_strings_caches_matches_for_each_min_score(self):
+        rule = models.Rule(licenses=['mit'], _text='Permission is hereby granted free of charge to any person obtaining a copy')
+        idx = index.LicenseIndex([rule])
+        query_string = u'Permission is hereby granted free of charge to any person any obtaining a copy'
+
+        assert [] != idx.match_strings([query_string])[0]
+        assert [] == idx.match_strings([query_string], min_score=100)[0]
+        assert 0 == idx.query_string_matches_cache.hits
+
+    def test_match_strings_cache_is_bounded_and_not_pickled(self):
+        rule = models.Rule(licenses=['mit'], _text='MIT License')
+        idx = index.LicenseIndex([rule])
+        cache = idx.query_string_matches_cache
+        cache.size = 2
+
+        idx.match_strings(['MIT License', 'the MIT License', 'an MIT License'])
+        assert 2 == len(cache.matches_by_key)
+        # the least recently used string was evicted
+        idx.match_strings(['an MIT License', 'MIT License'])
+        assert 1 == cache.hits
+        assert 4 == cache.misses
+
+        loaded = index.LicenseIndex.loads(idx.dumps())
+        assert 2 == loaded.query_string_matches_cache.size
+        assert 0 == len(loaded.query_string_matches_cache.matches_by_key)
+
+    def test_match_with_prefilter_matches_rules_with_only_junk_tokens(self):
+        rule1 = models.Rule(licenses=['gpl'], _text='licensed under the GPL version two or later')
+        rule2 = models.Rule(licenses=['gpl'], _text='the GPL or later version')
+        rule3 = models.Rule(licenses=['gpl-2.0'], _text='version two')
+        idx = index.LicenseIndex([rule1, rule2, rule3])
+        assert idx.len_junk > max(idx.dictionary['version'], idx.dictionary['two'])
+
+        result = idx.match(query_string='the version two')
+        assert 1 == len(result)
+        assert rule3 == result[0].rule
+        assert [] == idx.match(query_string='the version or the version')
+
     def test_match_exact_from_file(self):
         idx = index.LicenseIndex(self.get_test_rules('index/mini'))
         query_loc = self.get_test_loc('index/queryperfect-mini')
@@ -354,6 +546,51 @@ class TestMatchNoTemplates(IndexTesting):
         assert Span(0, 212) == match.qspan
         assert Span(0, 212) == match.ispan
 
+    def test_match_in_windows_returns_the_same_matches_as_a_whole_file_match(self):
+        idx = index.LicenseIndex(self.get_test_rules('index/bsd'))
+        with open(self.get_test_loc('index/querysimple')) as inp:
+            license_text = inp.read()
+        filler = 'some unrelated text line\n' * 30
+        query_loc = self.get_temp_file()
+        with open(query_loc, 'wb') as out:
+            out.write((filler + license_text) * 5 + filler)
+
+        expected = idx.match(location=query_loc)
+        assert 5 == len(expected)
+
+        result = idx._match_windows(query_loc, window_size=2000, overlap=40)
+
+        def summary(matches):
+            return [(m.rule.identifier, m.qspan, m.start_line, m.end_line,
+                     m.score(), m.matched_text()) for m in matches]
+
+        assert summary(expected) == summary(result)
+
+    def test_match_in_windows_merges_the_matches_of_a_license_across_windows(self):
+        text1 = 'redistribution and use in source and binary forms with or without modification are permitted provided that the following conditions are met'
+        text2 = 'neither the name of the copyright holder nor the names of its contributors may be used to endorse or promote products derived from this software'
+        idx = index.LicenseIndex([models.Rule(_text=text1 + '\n' + text2, licenses=['bsd'])])
+
+        def lines(text):
+            words = text.split()
+            return ''.join(' '.join(words[i:i + 4]) + '\n' for i in range(0, len(words), 4))
+
+        filler = 'some unrelated text line\n'
+        query_loc = self.get_temp_file()
+        with open(query_loc, 'wb') as out:
+            out.write(filler * 10 + lines(text1) + filler * 6 + lines(text2) + filler * 10)
+
+        expected = idx.match(location=query_loc)
+        assert 1 == len(expected)
+
+        # each window has a part of the license
+        result = idx._match_windows(query_loc, window_size=260, overlap=2)
+        assert 1 == len(result)
+        match = result[0]
+        assert expected[0].rule == match.rule
+        assert expected[0].qspan == match.qspan
+        assert (11, 29) == (match.start_line, match.end_line)
+
     def test_match_return_correct_offsets(self):
         _text = u'A GPL. A MIT. A LGPL.'
         #         0   1  2   3  4    5
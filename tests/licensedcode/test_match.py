@@ -38,6 +38,7 @@ from licensedcode.models import load_rules
 from licensedcode.spans import Span
 from licensedcode.match import merge_matches
 from licensedcode.match import get_full_matched_text
+from licensedcode.match import get_full_matched_texts
 
 TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 
@@ -640,6 +641,23 @@ class TestLicenseMatchFilter(FileBasedTesting):
         assert sorted([m1, m3]) == sorted(result)
         assert discarded
 
+    def test_filter_matches_keeps_distant_matches_and_filters_contained_matches_after_them(self):
+        r1 = Rule(text_file='r1', licenses=['apache-2.0'])
+        distant = [LicenseMatch(rule=r1, qspan=Span(i * 10, i * 10 + 2), ispan=Span(0, 2))
+                   for i in range(100)]
+        r2 = Rule(text_file='r2', licenses=['gpl'])
+        large = LicenseMatch(rule=r2, qspan=Span(1000, 1020), ispan=Span(0, 20))
+        r3 = Rule(text_file='r3', licenses=['mit'])
+        contained = LicenseMatch(rule=r3, qspan=Span(1005, 1010), ispan=Span(0, 5))
+        # interlaced but not overlapping
+        interlaced = LicenseMatch(rule=r3, qspan=Span(3, 4) | Span(13), ispan=Span(0, 2))
+
+        matches = distant + [contained, large, interlaced]
+        result, discarded = filter_contained_matches(matches)
+        by_qspan = lambda m: (m.qstart, m.qend)
+        assert sorted(distant + [interlaced, large], key=by_qspan) == sorted(result, key=by_qspan)
+        assert [contained] == discarded
+
     def test_filter_matches_handles_interlaced_matches_with_overlap_and_same_license(self):
         rule_dir = self.get_test_loc('match_filter/rules')
         idx = index.LicenseIndex(load_rules(rule_dir))
@@ -761,3 +779,37 @@ class TestCollectLicenseMatchTexts(FileBasedTesting):
             EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE. chabada DAMAGE 12 ABC\n"""
         matched_text = u''.join(get_full_matched_text(match, query_string=querys, idx=idx, highlight_not_matched=u'%s', whole_lines=True))
         assert expected == matched_text
+
+    def test_get_full_matched_texts_for_multiple_matches(self):
+        rule1 = Rule(_text=u'licensed under the GPL version two or later', licenses=['gpl'])
+        rule2 = Rule(_text=u'Permission is hereby granted, free of charge, to any person', licenses=['mit'])
+        idx = index.LicenseIndex([rule1, rule2])
+
+        querys = u'''
+            This is licensed under the GPL version two,
+            or later.
+
+            Permission is hereby granted, free of ALL charge, to any person.
+            And also licensed under the GPL version two or later!
+        '''
+        matches = idx.match(query_string=querys)
+        assert 3 == len(matches)
+
+        expected = [
+            u'licensed under the GPL version two,\n            or later',
+            u'Permission is hereby granted, free of [ALL] charge, to any person',
+            u'licensed under the GPL version two or later',
+        ]
+        result = list(get_full_matched_texts(matches, query_string=querys, idx=idx))
+        assert expected == result
+
+        for match, matched_text in zip(matches, result):
+            assert matched_text == u''.join(get_full_matched_text(match, query_string=querys, idx=idx))
+
+        expected = [
+            u'            This is licensed under the GPL version two,\n            or later.\n',
+            u'            Permission is hereby granted, free of ALL charge, to any person.\n',
+            u'            And also licensed under the GPL version two or later!\n',
+        ]
+        result = list(get_full_matched_texts(matches, query_string=querys, idx=idx, whole_lines=True, highlight_not_matched=u'%s'))
+        assert expected == result
@@ -53,3 +53,22 @@ class TestMatchExact(FileBasedTesting):
         assert 1 == len(matches)
         match = matches[0]
         assert match_aho.MATCH_AHO_EXACT == match.matcher
+
+    def test_automaton_does_not_match_partial_tokens(self):
+        automaton = match_aho.get_automaton()
+        match_aho.add_sequence(automaton, [22068], rid=1)
+        automaton.make_automaton()
+
+        # encoded as two bytes per token id, 22068 is 3456 in hex and would be
+        # falsely matched in the middle of 13312 and 86 encoded as 0034 5600
+        assert [] == list(automaton.iter(match_aho.encode_tids([13312, 86])))
+
+        result = list(automaton.iter(match_aho.encode_tids([13312, 22068, 86])))
+        assert 1 == len(result)
+        _qend, value = result[0]
+        assert set([(1, 0, 0)]) == value
+
+    def test_encode_tids_is_one_code_point_per_token_id(self):
+        tids = [0, 1, 127, 128, 2047, 2048, 15000, 32767]
+        encoded = match_aho.encode_tids(tids)
+        assert tids == [ord(c) for c in encoded.decode('utf-8')]
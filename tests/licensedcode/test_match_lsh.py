@@ -0,0 +1,104 @@
+#
+# Copyright (c) 2017 nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/nexB/scancode-toolkit/
+# The ScanCode software is licensed under the Apache License version 2.0.
+# Data generated with ScanCode require an acknowledgment.
+# ScanCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with ScanCode or any ScanCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with ScanCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  ScanCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  ScanCode is a free software code scanning tool from nexB Inc. and others.
+#  Visit https://github.com/nexB/scancode-toolkit/ for support and download.
+from __future__ import absolute_import
+from __future__ import print_function
+from __future__ import unicode_literals
+
+import os
+
+from intbitset import intbitset
+
+from commoncode.testcase import FileBasedTesting
+
+from licensedcode import index
+from licensedcode import match_lsh
+from licensedcode import models
+
+TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
+
+
+class TestMinHashLSH(FileBasedTesting):
+    test_data_dir = TEST_DATA_DIR
+
+    def test_signature_is_the_same_for_the_same_set(self):
+        lsh = match_lsh.MinHashLSH(100)
+        assert lsh.signature(set([3, 4, 6])) == lsh.signature([6, 4, 3, 3])
+        assert 32 == len(lsh.signature(set([3, 4, 6])))
+
+    def test_signatures_are_the_same_for_the_same_seed(self):
+        lsh1 = match_lsh.MinHashLSH(100)
+        lsh2 = match_lsh.MinHashLSH(100)
+        assert lsh1.signature(range(20, 40)) == lsh2.signature(range(20, 40))
+
+    def test_candidates_returns_similar_rules_only(self):
+        lsh = match_lsh.MinHashLSH(1000)
+        lsh.add(1, set(range(100, 140)))
+        lsh.add(2, set(range(500, 540)))
+        lsh.optimize()
+        assert intbitset([1]) == lsh.candidates(range(100, 140))
+        # similar but not identical
+        assert intbitset([1]) == lsh.candidates(range(102, 138) + [700, 701])
+        assert intbitset() == lsh.candidates(range(800, 840))
+        assert intbitset() == lsh.candidates([])
+
+    def test_candidates_returns_rules_contained_in_a_long_sequence(self):
+        lsh = match_lsh.MinHashLSH(1000)
+        lsh.add(1, set(range(100, 140)))
+        lsh.optimize()
+        tids = range(200, 400) + range(100, 140) + range(600, 800)
+        assert intbitset([1]) == lsh.candidates(tids)
+
+
+class TestMatchWithLSHCandidates(FileBasedTesting):
+    test_data_dir = TEST_DATA_DIR
+
+    def test_match_with_lsh_candidates_returns_the_same_matches(self):
+        base = self.get_test_loc('index/bsd')
+        rules = [models.Rule(text_file=os.path.join(base, license_key), licenses=[license_key])
+                 for license_key in sorted(os.listdir(base))]
+        idx = index.LicenseIndex(rules)
+        # not built unless enabled
+        assert None is idx.lsh_index
+        assert idx.get_lsh_index().rids
+
+        with open(self.get_test_loc('index/querysimple')) as inp:
+            # an approximate match: the exact rule text is not found
+            query_string = inp.read().replace('Redistributions', 'Copies')
+
+        expected = idx.match(query_string=query_string)
+        assert expected
+        idx.query_run_matches_cache.clear()
+
+        use_lsh = index.USE_LSH_CANDIDATES
+        min_length = index.LSH_MIN_QUERY_RUN_LENGTH
+        try:
+            index.USE_LSH_CANDIDATES = True
+            index.LSH_MIN_QUERY_RUN_LENGTH = 1
+            result = idx.match(query_string=query_string)
+        finally:
+            index.USE_LSH_CANDIDATES = use_lsh
+            index.LSH_MIN_QUERY_RUN_LENGTH = min_length
+
+        assert ([(m.rule.identifier, m.qspan) for m in expected]
+                == [(m.rule.identifier, m.qspan) for m in result])
@@ -140,6 +140,26 @@ class TestIndexingPerformance(FileBasedTesting):
         p.sort_stats('time').print_stats(40)
 
 
+class TestCacheValidationPerformance(FileBasedTesting):
+    test_data_dir = TEST_DATA_DIR
+
+    @skip('Use only for local profiling')
+    def test_cache_validation_performance_timing(self):
+        from timeit import timeit
+        from scancode_config import scancode_src_dir
+        from licensedcode.models import licenses_data_dir, rules_data_dir
+        setup = ('from licensedcode import cache;'
+                 'from licensedcode.models import licenses_data_dir, rules_data_dir;'
+                 'data_dirs = [licenses_data_dir, rules_data_dir]')
+        print()
+        print('code tree:', scancode_src_dir)
+        print('data directories:', licenses_data_dir, rules_data_dir)
+        print('tree_manifest: %.2f ms' % (
+            timeit(stmt='cache.tree_manifest(data_dirs=data_dirs)', setup=setup, number=10) / 10 * 1000))
+        print('content_stamp: %.2f ms' % (
+            timeit(stmt='cache.content_stamp(data_dirs=data_dirs)', setup=setup, number=3) / 3 * 1000))
+
+
 class TestTokenizingPerformance(FileBasedTesting):
     test_data_dir = TEST_DATA_DIR
 
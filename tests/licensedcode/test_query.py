@@ -35,6 +35,7 @@ from licensedcode import index
 from licensedcode import models
 from licensedcode.models import Rule
 from licensedcode.query import Query
+from licensedcode.query import query_windows
 
 TEST_DATA_DIR = os.path.join(os.path.dirname(__file__), 'data')
 
@@ -140,6 +141,31 @@ class TestQueryWithSingleRun(IndexTesting):
         result = tks_as_str(qr1.tokens_with_unknowns())
         assert expected == result
 
+    def test_Query_with_prefilter_is_empty_if_no_rule_can_match(self):
+        rules = [
+            Rule(_text='licensed under the GPL version two or later', licenses=['gpl']),
+            Rule(_text='the GPL or later version', licenses=['gpl']),
+            Rule(_text='version two', licenses=['gpl-2.0']),
+        ]
+        idx = index.LicenseIndex(rules)
+        # "version" and "two" are junk tokens and "two" is the rarest
+        assert 'version' not in idx.required_tokens
+        assert 'two' in idx.required_tokens
+
+        querys = 'the version or the version'
+        assert Query(query_string=querys, idx=idx).tokens
+        qry = Query(query_string=querys, idx=idx, prefilter=True)
+        assert [] == qry.tokens
+        assert [] == qry.query_runs
+
+        querys = 'the version two'
+        expected = Query(query_string=querys, idx=idx).tokens
+        assert expected == Query(query_string=querys, idx=idx, prefilter=True).tokens
+
+        querys = 'the version under'
+        expected = Query(query_string=querys, idx=idx).tokens
+        assert expected == Query(query_string=querys, idx=idx, prefilter=True).tokens
+
     def test_QueryRuns_tokens_with_unknowns(self):
         rule_text = 'Redistribution and use in source and binary forms with or without modification are permitted'
         idx = index.LicenseIndex([Rule(_text=rule_text, licenses=['bsd'])])
@@ -578,6 +604,65 @@ class TestQueryWithMultipleRuns(IndexTesting):
         assert irt == qrt
 
 
+class TestQueryWindows(IndexTesting):
+
+    def test_query_windows_positions_and_lines_are_consistent_with_a_whole_query(self):
+        rule_text = 'redistribution and use in source and binary forms are permitted'
+        idx = index.LicenseIndex([Rule(_text=rule_text, licenses=['bsd'])])
+        query_loc = self.get_temp_file()
+        with open(query_loc, 'wb') as out:
+            for i in range(200):
+                out.write('line %(i)d redistribution unknown and use\n' % locals())
+
+        whole = Query(location=query_loc, idx=idx, line_threshold=80)
+        windows = list(query_windows(query_loc, idx, window_size=1000, overlap=10))
+        assert len(windows) > 1
+
+        own_lines = []
+        for qry, start_line, start_pos, own_start, own_end in windows:
+            own_lines.append((own_start, own_end))
+            for pos, tid in enumerate(qry.tokens):
+                assert whole.tokens[pos + start_pos] == tid
+                assert whole.line_by_pos[pos + start_pos] == qry.line_by_pos[pos] + start_line - 1
+
+        # each line is owned by exactly one window
+        assert 1 == own_lines[0][0]
+        assert None == own_lines[-1][1]
+        for (_, previous_end), (start, _) in zip(own_lines, own_lines[1:]):
+            assert previous_end + 1 == start
+
+    def test_query_windows_with_prefilter_are_empty_without_required_tokens(self):
+        rule_text = 'redistribution and use in source and binary forms are permitted'
+        idx = index.LicenseIndex([Rule(_text=rule_text, licenses=['bsd'])])
+        query_loc = self.get_temp_file()
+        with open(query_loc, 'wb') as out:
+            for i in range(100):
+                out.write('line %(i)d source and binary\n' % locals())
+            for i in range(100):
+                out.write('line %(i)d redistribution unknown and use\n' % locals())
+
+        whole = Query(location=query_loc, idx=idx, line_threshold=80)
+        windows = list(query_windows(query_loc, idx, window_size=1000, overlap=10, prefilter=True))
+        assert len(windows) > 2
+        assert not windows[0][0].tokens
+        assert windows[-1][0].tokens
+
+        for qry, start_line, start_pos, _own_start, _own_end in windows:
+            for pos, tid in enumerate(qry.tokens):
+                assert whole.tokens[pos + start_pos] == tid
+                assert whole.line_by_pos[pos + start_pos] == qry.line_by_pos[pos] + start_line - 1
+
+    def test_query_windows_with_overlap_at_the_end_of_the_file_owns_all_lines(self):
+        idx = index.LicenseIndex([Rule(_text='permitted', licenses=['bsd'])])
+        query_loc = self.get_temp_file()
+        with open(query_loc, 'wb') as out:
+            out.write('permitted\n' * 10)
+
+        windows = list(query_windows(query_loc, idx, window_size=100, overlap=4))
+        assert [(1, 8), (9, None)] == [w[3:] for w in windows]
+        assert [(1, 0), (7, 6)] == [w[1:3] for w in windows]
+
+
 class TestQueryWithFullIndex(FileBasedTesting):
     test_data_dir = TEST_DATA_DIR
 
@@ -0,0 +1,164 @@
+#
+# Copyright (c) 2017 nexB Inc. and others. All rights reserved.
+# http://nexb.com and https://github.com/nexB/scancode-toolkit/
+# The ScanCode software is licensed under the Apache License version 2.0.
+# Data generated with ScanCode require an acknowledgment.
+# ScanCode is a trademark of nexB Inc.
+#
+# You may not use this software except in compliance with the License.
+# You may obtain a copy of the License at: http://apache.org/licenses/LICENSE-2.0
+# Unless required by applicable law or agreed to in writing, software distributed
+# under the License is distributed on an "AS IS" BASIS, WITHOUT WARRANTIES OR
+# CONDITIONS OF ANY KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations under the License.
+#
+# When you publish or redistribute any data created with ScanCode or any ScanCode
+# derivative work, you must accompany this data with the following acknowledgment:
+#
+#  Generated with ScanCode and provided on an "AS IS" BASIS, WITHOUT WARRANTIES
+#  OR CONDITIONS OF ANY KIND, either express or implied. No content created from
+#  ScanCode should be considered or used as legal advice. Consult an Attorney
+#  for any legal advice.
+#  ScanCode is a free software code scanning tool from nexB Inc. and others.
+#  Visit https://github.com/nexB/scancode-toolkit/ for support and download.
+
+from __future__ import absolute_import
+from __future__ import print_function
+
+import random
+from unittest import TestCase
+
+from intbitset import intbitset
+
+from licensedcode import spans
+from licensedcode.spans import Span
+
+
+class TestSpan(TestCase):
+
+    def test_Span_from_intbitset_is_a_copy(self):
+        bitset = intbitset([1, 3, 5])
+        span = Span(bitset)
+        bitset.add(7)
+        assert Span([1, 3, 5]) == span
+        assert 7 not in span
+
+    def test_Span_from_contiguous_intbitset_is_a_copy(self):
+        bitset = intbitset([1, 2, 3])
+        span = Span(bitset)
+        bitset.add(4)
+        assert ((1, 3),) == span._ranges
+        assert intbitset([1, 2, 3]) == span._set
+
+    def test_Span_representation_is_ranges_for_contiguous_spans(self):
+        assert ((1, 10),) == Span(1, 10)._ranges
+        assert ((1, 10),) == Span(range(1, 11))._ranges
+        assert ((1, 10),) == Span(intbitset(range(1, 11)))._ranges
+        assert () == Span()._ranges
+        assert () == Span([])._ranges
+        assert None is Span([1, 3])._ranges
+
+    def test_Span_union_of_ranges(self):
+        result = Span(1, 3) | Span(4, 6) | Span(10, 12)
+        assert ((1, 6), (10, 12),) == result._ranges
+        assert Span(1, 6) | Span(10, 12) == result
+
+    def test_Span_intersection_of_ranges(self):
+        result = (Span(1, 5) | Span(8, 12)) & (Span(3, 9) | Span(12, 14))
+        assert ((3, 5), (8, 9), (12, 12),) == result._ranges
+
+    def test_Span_difference_of_ranges(self):
+        result = Span(1, 10).difference(Span(1, 3) | Span(10))
+        assert ((4, 9),) == result._ranges
+        assert Span() == Span(1, 10).difference(Span(0, 11))
+
+    def test_Span_operations_mixing_ranges_and_bitsets(self):
+        ranges = Span(1, 5)
+        bitset = Span([4, 6, 8])
+        assert ranges._ranges is not None
+        assert bitset._ranges is None
+        assert Span([1, 2, 3, 4, 5, 6, 8]) == ranges | bitset
+        assert Span([1, 2, 3, 4, 5, 6, 8]) == bitset | ranges
+        assert Span([4]) == ranges & bitset
+        assert Span([4]) == bitset & ranges
+        assert Span([1, 2, 3, 5]) == ranges.difference(bitset)
+        assert Span([6, 8]) == bitset.difference(ranges)
+        assert Span(4) in ranges
+        assert Span(4) in bitset
+        assert bitset not in ranges
+        assert ranges.issuperset(Span(2, 3))
+        assert not ranges.issuperset(bitset)
+
+    def test_Span_with_more_than_MAX_RANGES_intervals_is_a_bitset(self):
+        items = range(0, (spans.MAX_RANGES + 1) * 3, 3)
+        span = Span(items[0], items[0])
+        for i in items[1:]:
+            span = span | Span(i, i + 1)
+        assert None is span._ranges
+        expected = intbitset([items[0]] + [x for i in items[1:] for x in (i, i + 1)])
+        assert expected == span._set
+        assert len(expected) == len(span)
+        assert list(expected) == list(span)
+
+    def test_Span_with_MAX_RANGES_intervals_is_ranges(self):
+        span = Span()
+        for i in range(spans.MAX_RANGES):
+            span = span | Span(i * 3, i * 3 + 1)
+        assert spans.MAX_RANGES == len(span._ranges)
+
+    def test_Span_operations_are_the_same_as_set_operations(self):
+        rnd = random.Random(42)
+
+        def random_span():
+            items = set()
+            for _ in range(rnd.randint(0, spans.MAX_RANGES + 4)):
+                start = rnd.randint(0, 100)
+                items.update(range(start, start + rnd.randint(1, 6)))
+            # build a span either from ints or by union of ranges
+            if rnd.random() < 0.5:
+                return items, Span(items)
+            span = Span()
+            for i in sorted(items):
+                span = span | Span(i)
+            return items, span
+
+        for _ in range(500):
+            items1, span1 = random_span()
+            items2, span2 = random_span()
+            assert sorted(items1) == list(span1)
+            assert len(items1) == len(span1)
+            assert Span(items1 | items2) == span1 | span2
+            assert Span(items1 & items2) == span1 & span2
+            assert Span(items1 - items2) == span1.difference(span2)
+            assert (items2 <= items1) == (span2 in span1)
+            assert hash(Span(items1)) == hash(span1)
+
+
+class TestRanges(TestCase):
+
+    def test_union_ranges(self):
+        assert [] == spans.union_ranges([])
+        assert [(1, 3)] == spans.union_ranges([(1, 1), (2, 2), (3, 3)])
+        assert [(1, 10)] == spans.union_ranges([(1, 10), (2, 3)])
+        assert [(1, 2), (4, 5)] == spans.union_ranges([(4, 5), (1, 2)])
+        assert [(1, 6)] == spans.union_ranges([(4, 6), (1, 4)])
+
+    def test_intersect_ranges(self):
+        assert [] == spans.intersect_ranges([], [(1, 2)])
+        assert [] == spans.intersect_ranges([(1, 2)], [(3, 4)])
+        assert [(2, 2)] == spans.intersect_ranges([(1, 2)], [(2, 4)])
+        assert [(2, 3), (5, 6)] == spans.intersect_ranges([(1, 10)], [(2, 3), (5, 6)])
+
+    def test_difference_ranges(self):
+        assert [(1, 2)] == spans.difference_ranges([(1, 2)], [])
+        assert [] == spans.difference_ranges([], [(1, 2)])
+        assert [] == spans.difference_ranges([(3, 4)], [(1, 10)])
+        assert [(1, 1), (10, 10)] == spans.difference_ranges([(1, 10)], [(2, 9)])
+        assert [(5, 5)] == spans.difference_ranges([(1, 5), (7, 9)], [(1, 4), (6, 10)])
+
+    def test_contains_int(self):
+        assert not spans.contains_int([], 1)
+        assert spans.contains_int([(1, 1)], 1)
+        assert not spans.contains_int([(1, 2), (4, 5)], 3)
+        assert spans.contains_int([(1, 2), (4, 5)], 5)
+        assert not spans.contains_int([(1, 2), (4, 5)], 6)
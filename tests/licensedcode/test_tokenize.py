@@ -36,6 +36,7 @@ from commoncode.testcase import FileBasedTesting
 
 from licensedcode.tokenize import query_lines
 from licensedcode.tokenize import query_tokenizer
+from licensedcode.tokenize import query_multilines_tokenizer
 from licensedcode.tokenize import word_splitter
 
 from licensedcode.tokenize import rule_tokenizer
@@ -163,6 +164,30 @@ class TestTokenizers(FileBasedTesting):
         disclaimer'''.split()
         assert expected == result
 
+    def test_query_multilines_tokenizer_handles_no_lines(self):
+        assert [] == query_multilines_tokenizer([])
+
+    def test_query_multilines_tokenizer_marks_line_ends(self):
+        lines = [u'', u'abc def', u' ', u'GHI', u'']
+        result = query_multilines_tokenizer(lines)
+        expected = [u'\n', u'abc', u'def', u'\n', u'\n', u'ghi', u'\n', u'\n']
+        assert expected == result
+
+    def test_query_multilines_tokenizer_handles_new_lines_in_lines(self):
+        lines = [u'abc\ndef', u'GHI']
+        result = query_multilines_tokenizer(lines)
+        expected = [u'abc', u'def', u'\n', u'ghi', u'\n']
+        assert expected == result
+
+    def test_query_multilines_tokenizer_is_the_same_as_query_tokenizer_on_lines(self):
+        query_loc = self.get_test_loc('index/querytokens')
+        lines = list(query_lines(location=query_loc))
+        expected = []
+        for line in lines:
+            expected.extend(query_tokenizer(line))
+            expected.append(u'\n')
+        assert expected == query_multilines_tokenizer(lines)
+
     def test_rule_and_query_tokenizer_have_the_same_behavior1(self):
         text , expected = 'MODULE_LICENSE("Dual BSD/GPL");', ['module_license', 'dual', 'bsd', 'gpl']
         assert expected == list(rule_tokenizer(text)) == list(query_tokenizer(text))
@@ -30,10 +30,15 @@ from collections import OrderedDict
 import os
 
 from commoncode.testcase import FileBasedTesting
+from commoncode.testcase import get_test_loc
 
 from scancode import api
 
 
+CLUECODE_TEST_DATA_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(__file__)), 'cluecode', 'data')
+
+
 class TestAPI(FileBasedTesting):
     test_data_dir = os.path.join(os.path.dirname(__file__), 'data')
 
@@ -99,3 +104,14 @@ class TestAPI(FileBasedTesting):
                 (u'start_line', 11), (u'end_line', 11)])
         ])
         assert expected == cops
+
+    def test_get_emails_and_urls_is_the_same_as_get_emails_and_get_urls(self):
+        test_file = get_test_loc('finder/email/thomas.py', CLUECODE_TEST_DATA_DIR)
+        expected_emails = api.get_emails(test_file)
+        expected_urls = api.get_urls(test_file)
+        assert expected_emails['emails']
+        assert expected_urls['urls']
+
+        both = api.get_emails_and_urls(test_file)
+        assert expected_emails['emails'] == both['emails']
+        assert expected_urls['urls'] == both['urls']
@@ -646,7 +646,8 @@ def test_scan_with_timing_json_return_timings_for_each_scanner():
     run_scan_click(args)
     file_results = load_json_result(result_file)['files']
 
-    expected = set(['emails', 'urls', 'licenses', 'copyrights', 'info', 'packages'])
+    # emails and urls are scanned together in a single pass
+    expected = set(['emails+urls', 'licenses', 'copyrights', 'info', 'packages'])
     check_timings(expected, file_results)
 
 
@@ -657,10 +658,31 @@ def test_scan_with_timing_jsonpp_return_timings_for_each_scanner():
             '--package', '--timing', '--verbose', '--json-pp', result_file, test_dir]
     run_scan_click(args)
     file_results = load_json_result(result_file)['files']
-    expected = set(['emails', 'urls', 'licenses', 'copyrights', 'info', 'packages'])
+    # emails and urls are scanned together in a single pass
+    expected = set(['emails+urls', 'licenses', 'copyrights', 'info', 'packages'])
     check_timings(expected, file_results)
 
 
+def test_scan_with_timing_displays_license_query_run_cache_stats():
+    test_dir = test_env.extract_test_tar('timing/basic.tgz')
+    result_file = test_env.get_temp_file('json')
+    args = ['--license', '--timing', '--json', result_file, test_dir]
+    result = run_scan_click(args)
+    assert 'Scanners stats:' in result.output
+    assert 'licenses:query_run_cache_hits:' in result.output
+    assert 'licenses:query_run_cache_misses:' in result.output
+
+
+def test_scan_with_timing_displays_license_matching_phases_stats():
+    test_dir = test_env.extract_test_tar('timing/basic.tgz')
+    result_file = test_env.get_temp_file('json')
+    args = ['--license', '--timing', '--json', result_file, test_dir]
+    result = run_scan_click(args)
+    assert 'licenses:seq_time:' in result.output
+    assert 'licenses:candidates:' in result.output
+    assert 'licenses:discarded_contained:' in result.output
+
+
 def check_timings(expected, file_results):
     for res in file_results:
         scan_timings = res['scan_timings']
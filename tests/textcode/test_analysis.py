@@ -78,3 +78,41 @@ class TestAnalysis(FileBasedTesting):
         for test_file in resource_iter(test_dir, with_dirs=False):
             result = list(text_lines(test_file))
             assert [] == result, 'Should not return text lines:' + test_file
+
+    def test_unicode_text_lines_decodes_lines_as_utf8_or_latin1(self):
+        test_file = self.get_temp_file()
+        with open(test_file, 'wb') as tf:
+            tf.write('caf\xe9 utf8\r\n'.encode('utf-8'))
+            tf.write('caf\xe9 latin1\r'.encode('latin-1'))
+            tf.write(b'a verbatim \\n\n')
+            tf.write(b'no new line')
+        expected = [
+            'caf\xe9 utf8\n',
+            'caf\xe9 latin1\n',
+            'a verbatim  \n',
+            'no new line',
+        ]
+        assert expected == list(unicode_text_lines(test_file))
+
+    def test_text_chunks_are_made_of_whole_lines(self):
+        from io import BytesIO
+        from textcode.analysis import text_chunks
+        f = BytesIO(b'one\r\ntwo\rthree\nfour')
+        expected = [b'one\n', b'two\n', b'three\n', b'four']
+        assert expected == list(text_chunks(f, chunk_size=4))
+
+    def test_text_chunks_joins_a_long_line_and_normalizes_line_endings_across_chunks(self):
+        from io import BytesIO
+        from textcode.analysis import text_chunks
+        data = b'a' * 50 + b'\r\r\n\r' + b'b' * 20 + b'\r\n\n' + b'c' * 30 + b'\r'
+        expected = BytesIO(data).read().replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+        for chunk_size in range(1, 10):
+            chunks = list(text_chunks(BytesIO(data), chunk_size=chunk_size))
+            assert expected == b''.join(chunks)
+            assert all(chunk.endswith(b'\n') for chunk in chunks)
+            assert chunks[0].startswith(b'a' * 50 + b'\n')
+
+    def test_decode_text_decodes_invalid_utf8_lines_as_latin1(self):
+        from textcode.analysis import decode_text
+        data = 'caf\xe9\n'.encode('utf-8') + 'caf\xe9\n'.encode('latin-1') + b'end'
+        assert 'caf\xe9\ncaf\xe9\nend' == decode_text(data)
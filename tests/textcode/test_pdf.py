@@ -107,6 +107,18 @@ Page 1
         expected = apache_fop_expected
         assert expected == result
 
+    def test_get_text_lines_are_cached_in_memory(self):
+        test_file = self.get_test_loc('pdf/pdf.pdf', copy=True)
+        expected = pdf.get_text_lines(test_file)
+        assert (test_file, 5) in pdf._text_lines_cache
+        # the cached lines are not parsed again
+        stat_key, _lines = pdf._text_lines_cache[(test_file, 5)]
+        pdf._text_lines_cache[(test_file, 5)] = stat_key, [b'cached']
+        assert [b'cached'] == pdf.get_text_lines(test_file)
+        # but a modified file is parsed again
+        os.utime(test_file, (0, 0))
+        assert expected == pdf.get_text_lines(test_file)
+
 
 apache_fop_expected = [
     b'This is the page header\n',
@@ -148,3 +148,47 @@ class TestStrings(FileBasedTesting):
             test_file = os.path.join(test_dir, tf)
             expected_file = os.path.join(expec_dir, tf + '.strings')
             self.check_file_strings(test_file, expected_file)
+
+    def test_strings_with_offsets_from_file(self):
+        test_file = self.get_test_loc('strings/basic/main.o')
+        result = list(strings.strings_with_offsets_from_file(test_file))
+        assert (827, u'_setlocale') == result[10]
+
+    def test_strings_with_offsets_from_file_are_offsets_of_cleaned_strings(self):
+        test_file = self.get_temp_file()
+        data = (b'\x01\x02  some ascii\x00\x02'
+                + u'\t  a wide one'.encode('utf-16-le')
+                + b'\x01\x02' + b'xyz' * 3)
+        with open(test_file, 'wb') as tf:
+            tf.write(data)
+        result = list(strings.strings_with_offsets_from_file(test_file))
+        expected = [
+            (4, u'some ascii'),
+            (22, u'a wide one'),
+            (44, u'xyzxyzxyz'),
+        ]
+        assert expected == result
+        assert data[4:].startswith(b'some ascii')
+        assert data[22:].startswith(u'a wide one'.encode('utf-16-le'))
+        assert data[44:].startswith(b'xyzxyzxyz')
+
+    def test_strings_with_offsets_from_file_are_not_split_at_window_boundaries(self):
+        test_file = self.get_test_loc('strings/pe/7-zip-pe-with-unicode.dll')
+        expected = list(strings.strings_with_offsets_from_file(test_file))
+        for window_size in (7, 64, 1000):
+            result = list(strings.strings_with_offsets_from_file(
+                test_file, window_size=window_size))
+            assert expected == result
+
+    def test_strings_with_offsets_from_file_with_max_bytes(self):
+        test_file = self.get_test_loc('strings/elf/shash.i686')
+        expected = list(strings.strings_with_offsets_from_file(test_file))
+        result = list(strings.strings_with_offsets_from_file(test_file, max_bytes=100))
+        assert result
+        assert expected[:len(result)] == result
+        assert len(result) < len(expected)
+
+    def test_strings_with_offsets_from_empty_file(self):
+        test_file = self.get_temp_file()
+        open(test_file, 'wb').close()
+        assert [] == list(strings.strings_with_offsets_from_file(test_file))